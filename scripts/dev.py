@@ -8,11 +8,25 @@
 - 并发启动 wrangler dev 与 vite dev
 - Ctrl+C 优雅退出
 
+以上步骤组成依赖图（见 build_steps），依赖满足的步骤并行执行，例如迁移/种子与 worker、vite 的启动同时进行：
+
+  pnpm_check ─> install ─> prisma_cli ─┬─> migrate ─> seed
+                                       ├─> worker（等 /health 就绪）
+  patch_proxy ─────────────────────────┴─> web（等 5173 就绪）─> open_browser
+
+install / migrate / seed 记录输入文件（锁文件、package.json、schema、migrations、seed 脚本、DATABASE_URL）
+的 sha256 指纹，未变化且产物存在时跳过；指纹存于 node_modules/.cache/dev-bootstrap.json，删除 node_modules
+即全部失效。就绪探测从 50ms 起按 1.5 倍退避到 1s，进程提前退出时立即判定失败。启动完成后打印各步骤耗时。
+
 用法：
   python scripts/dev.py            # 正常全流程
   python scripts/dev.py --skip-install --skip-db  # 跳过安装与数据库
   python scripts/dev.py --no-patch-proxy          # 不修改 Vite 代理
   python scripts/dev.py --no-open                 # 不自动打开浏览器
+  python scripts/dev.py --force                   # 忽略指纹，所有步骤重新执行
+
+worker / web 的输出带 [worker] / [web] 前缀回显，同时写入 logs/worker.log、logs/web.log（JSON 行，
+超过 10MB 轮转为 .gz）；查看历史：python 本地运行版/tools/log_mux.py --log-dir logs tail --proc web --grep error
 """
 
 import argparse
@@ -25,6 +39,9 @@ import signal
 import shutil
 import re
 import json
+import glob
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from urllib import request, error as urlerror
 import webbrowser
 
@@ -32,6 +49,23 @@ ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 WEB_DIR = os.path.join(ROOT, 'apps', 'web')
 WORKER_DIR = os.path.join(ROOT, 'apps', 'worker')
 VITE_CFG = os.path.join(WEB_DIR, 'vite.config.ts')
+WORKER_HEALTH_URL = 'http://127.0.0.1:8787/health'
+WEB_URL = 'http://localhost:5173'
+FINGERPRINT_FILE = os.path.join(ROOT, 'node_modules', '.cache', 'dev-bootstrap.json')
+LOGS_DIR = os.path.join(ROOT, 'logs')
+
+# 子进程输出经 本地运行版/tools/log_mux.py 汇总：按块读取、带进程名回显，并写入 logs/<name>.log（轮转压缩）
+sys.path.insert(0, os.path.join(ROOT, '本地运行版', 'tools'))
+from log_mux import LogMux  # noqa: E402
+
+_log_mux = None
+
+
+def log_mux() -> LogMux:
+    global _log_mux
+    if _log_mux is None:
+        _log_mux = LogMux(LOGS_DIR).start()
+    return _log_mux
 
 
 def ensure_repo_root() -> None:
@@ -50,20 +84,6 @@ def run_cmd(cmd, cwd=None, check=True, env=None) -> int:
     return ret
 
 
-def capture_stream(prefix: str, proc: subprocess.Popen):
-    def reader(stream, is_err=False):
-        for line in iter(stream.readline, b''):
-            try:
-                s = line.decode('utf-8', errors='ignore').rstrip('\n')
-            except Exception:
-                s = str(line)
-            print(f'[{prefix}] {s}')
-        stream.close()
-    threading.Thread(target=reader, args=(proc.stdout,), daemon=True).start()
-    if proc.stderr and proc.stderr is not proc.stdout:
-        threading.Thread(target=reader, args=(proc.stderr, True), daemon=True).start()
-
-
 def start_bg(name: str, cmd: str, cwd=None) -> subprocess.Popen:
     print(f'[START] {name}: {cmd}')
     proc = subprocess.Popen(
@@ -72,9 +92,10 @@ def start_bg(name: str, cmd: str, cwd=None) -> subprocess.Popen:
         shell=True,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
+        # 独立进程组：stop_proc 用 killpg 结束 shell 及其子进程，而不会波及本脚本
+        start_new_session=(os.name != 'nt'),
     )
-    capture_stream(name, proc)
-    return proc
+    return log_mux().attach(name, proc)
 
 
 def stop_proc(proc: subprocess.Popen, name: str):
@@ -99,23 +120,33 @@ def stop_proc(proc: subprocess.Popen, name: str):
                 pass
 
 
-def wait_health(url: str, timeout_sec: int = 40) -> bool:
+def wait_ready(url: str, timeout_sec: float = 40, proc: subprocess.Popen | None = None, check_ok: bool = False) -> bool:
+    """自适应探测 url：间隔从 50ms 起按 1.5 倍增长到 1s；proc 提前退出时立即返回 False。"""
     deadline = time.time() + timeout_sec
+    delay = 0.05
     while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            print(f'[WARN] 进程已退出 (exit={proc.returncode})，停止探测：{url}')
+            return False
         try:
             with request.urlopen(url, timeout=3) as resp:
                 if resp.status == 200:
-                    data = json.loads(resp.read().decode('utf-8', errors='ignore') or '{}')
-                    if data.get('ok') is True:
-                        print(f'[OK] 健康检查通过：{url}')
+                    data = json.loads(resp.read().decode('utf-8', errors='ignore') or '{}') if check_ok else {}
+                    if not check_ok or data.get('ok') is True:
+                        print(f'[OK] 就绪：{url}')
                         return True
         except Exception:
             pass
-        time.sleep(1.0)
-    print(f'[WARN] 健康检查超时：{url}')
+        time.sleep(min(delay, max(0.0, deadline - time.time())))
+        delay = min(delay * 1.5, 1.0)
+    print(f'[WARN] 就绪探测超时：{url}')
     return False
 
 
+def wait_health(url: str, timeout_sec: int = 40, proc: subprocess.Popen | None = None) -> bool:
+    return wait_ready(url, timeout_sec, proc=proc, check_ok=True)
+
+
 def patch_vite_proxy() -> bool:
     """如果 vite.config.ts 没有 dev 代理，则自动插入 server.proxy 配置。返回是否修改。"""
     if not os.path.exists(VITE_CFG):
@@ -190,84 +221,263 @@ def ensure_prisma_cli() -> None:
             sys.exit(1)
 
 
-def main():
-    parser = argparse.ArgumentParser(description='一键启动 Worker + Web (Vite) 开发环境')
-    parser.add_argument('--skip-install', action='store_true', help='跳过 pnpm install')
-    parser.add_argument('--skip-db', action='store_true', help='跳过 Prisma 迁移与种子')
-    parser.add_argument('--no-patch-proxy', action='store_true', help='不自动修改 Vite 代理')
-    parser.add_argument('--no-open', action='store_true', help='不自动打开浏览器')
-    args = parser.parse_args()
+# ---------------- 依赖图 ----------------
 
-    ensure_repo_root()
+class Fingerprints:
+    """步骤输入指纹：{step: sha256}。步骤成功后才记录。"""
 
-    # 基础检查
-    try:
-        subprocess.check_call('pnpm -v', shell=True, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception:
-        print('[FATAL] 未检测到 pnpm，请先安装：npm i -g pnpm')
-        sys.exit(1)
+    def __init__(self, path: str = FINGERPRINT_FILE, force: bool = False):
+        self.path = path
+        self.force = force
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.steps = json.load(f).get('steps', {})
+        except (OSError, ValueError):
+            self.steps = {}
+
+    @staticmethod
+    def compute(patterns, extra: str = '') -> str:
+        h = hashlib.sha256(extra.encode('utf-8'))
+        files = sorted({f for pat in patterns for f in glob.glob(os.path.join(ROOT, pat), recursive=True) if os.path.isfile(f)})
+        for path in files:
+            h.update(os.path.relpath(path, ROOT).replace(os.sep, '/').encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        return h.hexdigest()
+
+    def unchanged(self, step: str, digest: str) -> bool:
+        return not self.force and self.steps.get(step) == digest
+
+    def record(self, step: str, digest: str) -> None:
+        with self.lock:
+            self.steps[step] = digest
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.tmp-{os.getpid()}'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'steps': self.steps}, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+class Step:
+    """依赖图中的一个步骤。
+
+    action() 返回 False 表示失败（fatal=True 时中止启动）；inputs 非空时按指纹跳过，
+    output 为必须存在的产物（如 node_modules），不存在时即使指纹相同也会执行。
+    """
+
+    def __init__(self, name, action, deps=(), inputs=None, extra='', output=None, fatal=True, skip=None):
+        self.name = name
+        self.action = action
+        self.deps = tuple(deps)
+        self.inputs = inputs
+        self.extra = extra
+        self.output = output
+        self.fatal = fatal
+        self.skip = skip  # 非空时为跳过原因（命令行参数）
+        self.status = 'pending'
+        self.started = None
+        self.finished = None
+
+
+def run_graph(steps, fingerprints: Fingerprints, max_workers: int = 4) -> bool:
+    """按依赖并行执行步骤；返回是否没有致命失败。"""
+    by_name = {step.name: step for step in steps}
+    t0 = time.time()
+
+    def execute(step):
+        step.started = time.time()
+        try:
+            if step.skip:
+                step.status = f'skip ({step.skip})'
+                return
+            digest = None
+            if step.inputs:
+                digest = fingerprints.compute(step.inputs, step.extra)
+                if fingerprints.unchanged(step.name, digest) and (step.output is None or os.path.exists(step.output)):
+                    step.status = 'cached'
+                    print(f'[SKIP] {step.name}：输入未变化')
+                    return
+            ok = step.action()
+            if ok is False:
+                step.status = 'failed'
+                return
+            step.status = 'ok'
+            if step.inputs:
+                # 重新计算：pnpm install 可能改写锁文件
+                fingerprints.record(step.name, fingerprints.compute(step.inputs, step.extra))
+        except SystemExit as exc:  # run_cmd / ensure_prisma_cli 失败时调用 sys.exit
+            step.status = f'failed (exit={exc.code})'
+        except Exception as exc:
+            step.status = f'failed ({exc})'
+        finally:
+            step.finished = time.time()
+
+    pending = dict(by_name)
+    running = {}
+    aborted = False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name, step in list(pending.items()):
+                dep_states = [by_name[d].status for d in step.deps]
+                if any(st.startswith('failed') or st.startswith('blocked') for st in dep_states) or aborted:
+                    step.status = 'blocked'
+                    step.started = step.finished = time.time()
+                    del pending[name]
+                elif all(st == 'ok' or st == 'cached' or st.startswith('skip') for st in dep_states):
+                    running[pool.submit(execute, step)] = step
+                    del pending[name]
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                if step.status.startswith('failed'):
+                    print(f'[ERROR] 步骤失败：{step.name} — {step.status}')
+                    aborted = aborted or step.fatal
+
+    print_timings(steps, t0)
+    return not any(step.fatal and step.status.startswith(('failed', 'blocked')) for step in steps)
+
+
+def print_timings(steps, t0: float) -> None:
+    print('\n[TIMING] 启动步骤耗时（起点/耗时为秒）')
+    print(f'  {"step":<14}{"status":<28}{"start":>8}{"took":>8}')
+    for step in sorted(steps, key=lambda s: s.started or float('inf')):
+        start = f'{step.started - t0:8.2f}' if step.started else f'{"-":>8}'
+        took = f'{step.finished - step.started:8.2f}' if step.started and step.finished else f'{"-":>8}'
+        print(f'  {step.name:<14}{step.status:<28}{start}{took}')
+    print(f'  {"total":<14}{"":<28}{"":>8}{time.time() - t0:8.2f}\n')
+
+
+def build_steps(args, db_url, procs: dict):
+    env_db = os.environ.copy()
+    if db_url:
+        env_db['DATABASE_URL'] = db_url
+    db_key = hashlib.sha256((db_url or '').encode('utf-8')).hexdigest()
+    migrations = ['apps/worker/prisma/schema.prisma', 'apps/worker/prisma/migrations/**/*']
 
-    if not args.skip_install:
+    def pnpm_check():
+        try:
+            subprocess.check_call('pnpm -v', shell=True, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception:
+            print('[FATAL] 未检测到 pnpm，请先安装：npm i -g pnpm')
+            return False
+
+    def install():
         # 批准 Prisma 相关依赖的构建脚本并安装依赖
         run_cmd('pnpm --yes approve-builds prisma @prisma/client @prisma/engines', cwd=ROOT, check=False)
         run_cmd('pnpm install', cwd=ROOT)
 
-    # 确保 prisma CLI 可用
-    ensure_prisma_cli()
+    def prisma_cli():
+        local_bin = os.path.join(WORKER_DIR, 'node_modules', '.bin', 'prisma.cmd' if os.name == 'nt' else 'prisma')
+        if os.path.exists(local_bin):
+            return
+        ensure_prisma_cli()
 
-    db_url = read_wrangler_database_url() or os.environ.get('DATABASE_URL')
-
-    if not args.skip_db:
-        if not db_url:
-            print('[FATAL] 未找到 DATABASE_URL。请在 apps/worker/wrangler.jsonc 的 vars 中配置，或设置环境变量 DATABASE_URL 后重试。')
-            sys.exit(1)
-        env_db = os.environ.copy()
-        env_db['DATABASE_URL'] = db_url
+    def migrate():
         run_cmd('pnpm --filter worker exec prisma migrate deploy', cwd=ROOT, env=env_db)
+
+    def seed():
         run_cmd('pnpm --filter worker exec prisma db seed', cwd=ROOT, env=env_db)
 
-    if not args.no_patch_proxy:
+    def patch_proxy():
         patch_vite_proxy()
 
-    # 启动后端
-    proc_worker = start_bg('worker', 'pnpm --filter worker dev', cwd=ROOT)
-    try:
-        wait_health('http://127.0.0.1:8787/health', timeout_sec=45)
-    except Exception:
-        pass
+    def start_worker():
+        procs['worker'] = start_bg('worker', 'pnpm --filter worker dev', cwd=ROOT)
+        # 与原流程一致：健康检查超时只告警，不中止
+        wait_health(WORKER_HEALTH_URL, timeout_sec=45, proc=procs['worker'])
+        return procs['worker'].poll() is None
 
-    # 启动前端
-    proc_web = start_bg('web', 'pnpm --filter web dev', cwd=ROOT)
+    def start_web():
+        procs['web'] = start_bg('web', 'pnpm --filter web dev', cwd=ROOT)
+        wait_ready(WEB_URL, timeout_sec=45, proc=procs['web'])
+        return procs['web'].poll() is None
 
-    # 尝试打开浏览器
-    if not args.no_open:
-        time.sleep(2)
+    def open_browser():
         try:
-            webbrowser.open('http://localhost:5173')
+            webbrowser.open(WEB_URL)
         except Exception:
             pass
 
-    print('[INFO] 正在运行。按 Ctrl+C 结束。')
+    return [
+        Step('pnpm_check', pnpm_check),
+        Step(
+            'install',
+            install,
+            deps=['pnpm_check'],
+            inputs=['package.json', 'pnpm-lock.yaml', 'pnpm-workspace.yaml', 'apps/*/package.json', 'packages/*/package.json'],
+            output=os.path.join(ROOT, 'node_modules'),
+            skip='--skip-install' if args.skip_install else None,
+        ),
+        Step('prisma_cli', prisma_cli, deps=['install']),
+        Step(
+            'migrate',
+            migrate,
+            deps=['prisma_cli'],
+            inputs=migrations,
+            extra=db_key,
+            skip='--skip-db' if args.skip_db else None,
+        ),
+        Step(
+            'seed',
+            seed,
+            deps=['migrate'],
+            inputs=migrations + ['apps/worker/prisma/seed.mjs'],
+            extra=db_key,
+            skip='--skip-db' if args.skip_db else None,
+        ),
+        Step('patch_proxy', patch_proxy, skip='--no-patch-proxy' if args.no_patch_proxy else None),
+        Step('worker', start_worker, deps=['prisma_cli']),
+        Step('web', start_web, deps=['prisma_cli', 'patch_proxy']),
+        Step('open_browser', open_browser, deps=['web'], fatal=False, skip='--no-open' if args.no_open else None),
+    ]
 
-    # 等待并托管子进程生命周期
+
+def main():
+    parser = argparse.ArgumentParser(description='一键启动 Worker + Web (Vite) 开发环境')
+    parser.add_argument('--skip-install', action='store_true', help='跳过 pnpm install')
+    parser.add_argument('--skip-db', action='store_true', help='跳过 Prisma 迁移与种子')
+    parser.add_argument('--no-patch-proxy', action='store_true', help='不自动修改 Vite 代理')
+    parser.add_argument('--no-open', action='store_true', help='不自动打开浏览器')
+    parser.add_argument('--force', action='store_true', help='忽略输入指纹，重新执行安装、迁移与种子')
+    args = parser.parse_args()
+
+    ensure_repo_root()
+
+    db_url = read_wrangler_database_url() or os.environ.get('DATABASE_URL')
+    if not args.skip_db and not db_url:
+        print('[FATAL] 未找到 DATABASE_URL。请在 apps/worker/wrangler.jsonc 的 vars 中配置，或设置环境变量 DATABASE_URL 后重试。')
+        sys.exit(1)
+
+    procs: dict = {}
     try:
+        if not run_graph(build_steps(args, db_url, procs), Fingerprints(force=args.force)):
+            print('[FATAL] 启动失败，见上方步骤耗时表。')
+            return 1
+
+        print('[INFO] 正在运行。按 Ctrl+C 结束。')
+
+        # 等待并托管子进程生命周期
         while True:
             time.sleep(1.0)
             # 任一子进程退出则提示
-            if proc_worker.poll() is not None:
-                print('[ERROR] worker 进程已退出。')
-                break
-            if proc_web.poll() is not None:
-                print('[ERROR] web 进程已退出。')
-                break
+            for name, proc in procs.items():
+                if proc.poll() is not None:
+                    print(f'[ERROR] {name} 进程已退出。')
+                    return 1
     except KeyboardInterrupt:
         print('\n[INFO] 收到中断信号，正在清理...')
+        return 0
     finally:
-        stop_proc(proc_web, 'web')
-        stop_proc(proc_worker, 'worker')
+        stop_proc(procs.get('web'), 'web')
+        stop_proc(procs.get('worker'), 'worker')
+        if _log_mux is not None:
+            _log_mux.close()
         print('[DONE] 已退出。')
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
 
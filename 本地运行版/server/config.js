@@ -3,7 +3,7 @@ import { fileURLToPath } from 'node:url'
 
 const __dirname = path.dirname(fileURLToPath(import.meta.url))
 export const ROOT_DIR = path.resolve(__dirname, '..')
-export const DATA_DIR = path.join(ROOT_DIR, 'data')
+export const DATA_DIR = process.env.DATA_DIR ? path.resolve(process.env.DATA_DIR) : path.join(ROOT_DIR, 'data')
 export const LOGS_DIR = path.join(ROOT_DIR, 'logs')
 
 export const PORT = Number(process.env.PORT || 8080)
@@ -1,6 +1,6 @@
 import path from 'node:path'
 import { DATA_DIR } from '../config.js'
-import { readJson, writeJson, listFiles } from '../utils/file-store.js'
+import { readJson, writeJson, listFiles, removeFile, withFileLock } from '../utils/file-store.js'
 
 const USERS_FILE = path.join(DATA_DIR, 'users.json')
 const ORGS_FILE = path.join(DATA_DIR, 'org_units.json')
@@ -109,33 +109,148 @@ export async function getAuditLogs() {
   return loadCollection(AUDIT_LOG_FILE)
 }
 
+// Audit log and suggestions are appended by every instance in cluster mode (start_local.py --instances),
+// so their read-modify-write runs under the cross-process file lock
+let auditQueue = Promise.resolve()
+
 export async function appendAuditLog(entry) {
-  const data = await loadCollection(AUDIT_LOG_FILE)
-  const now = new Date().toISOString()
-  const id = ++data.meta.lastId
-  data.items.push({ id, createdAt: now, ...entry })
-  await saveCollection(AUDIT_LOG_FILE, data)
+  const next = auditQueue.then(() =>
+    withFileLock(AUDIT_LOG_FILE, async () => {
+      const data = await loadCollection(AUDIT_LOG_FILE)
+      const now = new Date().toISOString()
+      const id = ++data.meta.lastId
+      data.items.push({ id, createdAt: now, ...entry })
+      await saveCollection(AUDIT_LOG_FILE, data)
+    }),
+  )
+  auditQueue = next.catch(() => {})
+  return next
+}
+
+// --- Work items ---
+//
+// Two layouts per user, chosen by the presence of user/<id>/manifest.json:
+//   user/<id>.json                      single collection (default for new users)
+//   user/<id>/<yyyy-mm>.json + manifest one collection per workDate month, written by
+//                                       tools/reshard_work_items.py; items without a valid
+//                                       workDate live in the "undated" partition
+// The manifest records { count, minDate, maxDate } per partition so reads and writes only
+// touch the months involved.
+
+const WORK_ITEMS_MANIFEST = 'manifest.json'
+const UNDATED_PARTITION = 'undated'
+
+const emptyWorkItemCollection = () => ({ meta: { lastId: 0 }, items: [] })
+
+function workItemFile(userId) {
+  return path.join(WORK_ITEMS_USER_DIR, `${userId}.json`)
+}
+
+function partitionDir(userId) {
+  return path.join(WORK_ITEMS_USER_DIR, String(userId))
+}
+
+function partitionFile(userId, key) {
+  return path.join(partitionDir(userId), `${key}.json`)
+}
+
+function partitionKey(workDate) {
+  return typeof workDate === 'string' && /^\d{4}-\d{2}-\d{2}$/.test(workDate) ? workDate.slice(0, 7) : UNDATED_PARTITION
+}
+
+async function loadWorkItemManifest(userId) {
+  return readJson(path.join(partitionDir(userId), WORK_ITEMS_MANIFEST), null)
+}
+
+async function loadPartition(userId, key) {
+  return readJson(partitionFile(userId, key), emptyWorkItemCollection())
+}
+
+function partitionKeys(manifest) {
+  return Object.keys(manifest.partitions || {}).sort()
+}
+
+// Persist changed partitions first and the manifest last; empty partitions are removed.
+async function savePartitions(userId, manifest, changed) {
+  manifest.partitions = manifest.partitions || {}
+  for (const [key, collection] of changed) {
+    const file = partitionFile(userId, key)
+    if (!collection.items.length) {
+      await removeFile(file)
+      delete manifest.partitions[key]
+      continue
+    }
+    await writeJson(file, collection)
+    const dates = collection.items.map((item) => item.workDate).filter((d) => typeof d === 'string').sort()
+    manifest.partitions[key] = {
+      count: collection.items.length,
+      minDate: dates.length ? dates[0] : null,
+      maxDate: dates.length ? dates[dates.length - 1] : null,
+    }
+  }
+  await writeJson(path.join(partitionDir(userId), WORK_ITEMS_MANIFEST), manifest)
+}
+
+// Locate an item in a partitioned store, newest month first (edits are usually recent).
+async function findInPartitions(userId, manifest, recordId) {
+  for (const key of partitionKeys(manifest).reverse()) {
+    const collection = await loadPartition(userId, key)
+    const idx = collection.items.findIndex((item) => Number(item.id) === Number(recordId))
+    if (idx !== -1) return { key, collection, idx }
+  }
+  return null
 }
 
 async function loadWorkItemCollection(userId) {
-  const file = path.join(WORK_ITEMS_USER_DIR, `${userId}.json`)
-  return readJson(file, { meta: { lastId: 0 }, items: [] })
+  return readJson(workItemFile(userId), emptyWorkItemCollection())
 }
 
 async function saveWorkItemCollection(userId, data) {
-  const file = path.join(WORK_ITEMS_USER_DIR, `${userId}.json`)
-  await writeJson(file, data)
+  await writeJson(workItemFile(userId), data)
+}
+
+// Same lock as tools/id_allocator.py, which leases whole id blocks by advancing lastId
+let idQueue = Promise.resolve()
+
+function nextWorkItemId() {
+  const next = idQueue.then(() =>
+    withFileLock(WORK_ITEMS_META, async () => {
+      const meta = await readJson(WORK_ITEMS_META, { lastId: 0 })
+      meta.lastId = Number(meta.lastId || 0) + 1
+      await writeJson(WORK_ITEMS_META, meta)
+      return meta.lastId
+    }),
+  )
+  idQueue = next.catch(() => {})
+  return next
+}
+
+async function workItemLockTarget(userId) {
+  return (await loadWorkItemManifest(userId)) ? path.join(partitionDir(userId), WORK_ITEMS_MANIFEST) : workItemFile(userId)
+}
+
+// Per-user read-modify-write lock: with start_local.py --instances several server processes share
+// DATA_DIR, and the tools (UserStore.lock) hold the same `<file>.lock` (the manifest for partitioned users).
+// tools/reshard_work_items.py switches the layout while holding both locks, so re-check once locked
+async function withWorkItemLock(userId, fn) {
+  for (;;) {
+    const target = await workItemLockTarget(userId)
+    const result = await withFileLock(target, async () =>
+      target === (await workItemLockTarget(userId)) ? { value: await fn() } : null
+    )
+    if (result) return result.value
+  }
 }
 
-async function nextWorkItemId() {
-  const meta = await readJson(WORK_ITEMS_META, { lastId: 0 })
-  meta.lastId = Number(meta.lastId || 0) + 1
-  await writeJson(WORK_ITEMS_META, meta)
-  return meta.lastId
+export async function addWorkItem(userId, payload) {
+  return withWorkItemLock(userId, () => insertWorkItem(userId, payload))
 }
 
-export async function addWorkItem(userId, payload) {
-  const collection = await loadWorkItemCollection(userId)
+async function insertWorkItem(userId, payload) {
+  const manifest = await loadWorkItemManifest(userId)
+  const collection = manifest
+    ? await loadPartition(userId, partitionKey(payload.workDate))
+    : await loadWorkItemCollection(userId)
   const id = await nextWorkItemId()
   const now = new Date().toISOString()
   const record = {
@@ -147,11 +262,46 @@ export async function addWorkItem(userId, payload) {
   }
   collection.meta.lastId = Math.max(collection.meta.lastId || 0, id)
   collection.items.push(record)
-  await saveWorkItemCollection(userId, collection)
+  if (manifest) {
+    manifest.meta = { ...manifest.meta, lastId: Math.max(manifest.meta?.lastId || 0, id) }
+    await savePartitions(userId, manifest, new Map([[partitionKey(record.workDate), collection]]))
+  } else {
+    await saveWorkItemCollection(userId, collection)
+  }
   return record
 }
 
 export async function updateWorkItem(userId, recordId, patch) {
+  return withWorkItemLock(userId, () => patchWorkItem(userId, recordId, patch))
+}
+
+async function patchWorkItem(userId, recordId, patch) {
+  const manifest = await loadWorkItemManifest(userId)
+  if (manifest) {
+    const found = await findInPartitions(userId, manifest, recordId)
+    if (!found) return null
+    const { key, collection, idx } = found
+    const updated = {
+      ...collection.items[idx],
+      ...patch,
+      updatedAt: new Date().toISOString(),
+    }
+    const changed = new Map([[key, collection]])
+    const targetKey = partitionKey(updated.workDate)
+    if (targetKey === key) {
+      collection.items[idx] = updated
+    } else {
+      // workDate moved to another month: move the item to that partition
+      collection.items.splice(idx, 1)
+      const target = await loadPartition(userId, targetKey)
+      target.meta.lastId = Math.max(target.meta.lastId || 0, Number(updated.id) || 0)
+      target.items.push(updated)
+      changed.set(targetKey, target)
+    }
+    await savePartitions(userId, manifest, changed)
+    return updated
+  }
+
   const collection = await loadWorkItemCollection(userId)
   const idx = collection.items.findIndex((item) => Number(item.id) === Number(recordId))
   if (idx === -1) return null
@@ -165,7 +315,21 @@ export async function updateWorkItem(userId, recordId, patch) {
   await saveWorkItemCollection(userId, collection)
   return updated
 }
+
 export async function removeWorkItem(userId, recordId) {
+  return withWorkItemLock(userId, () => deleteWorkItem(userId, recordId))
+}
+
+async function deleteWorkItem(userId, recordId) {
+  const manifest = await loadWorkItemManifest(userId)
+  if (manifest) {
+    const found = await findInPartitions(userId, manifest, recordId)
+    if (!found) return false
+    found.collection.items.splice(found.idx, 1)
+    await savePartitions(userId, manifest, new Map([[found.key, found.collection]]))
+    return true
+  }
+
   const collection = await loadWorkItemCollection(userId)
   const before = collection.items.length
   collection.items = collection.items.filter((item) => Number(item.id) !== Number(recordId))
@@ -174,12 +338,56 @@ export async function removeWorkItem(userId, recordId) {
   return true
 }
 
+export async function listAllWorkItemsForUser(userId) {
+  const manifest = await loadWorkItemManifest(userId)
+  if (!manifest) return (await loadWorkItemCollection(userId)).items
+  const items = []
+  for (const key of partitionKeys(manifest)) {
+    items.push(...(await loadPartition(userId, key)).items)
+  }
+  return items
+}
+
+export async function clearWorkItemsForUser(userId) {
+  return withWorkItemLock(userId, () => resetWorkItems(userId))
+}
+
+async function resetWorkItems(userId) {
+  const manifest = await loadWorkItemManifest(userId)
+  if (!manifest) {
+    await saveWorkItemCollection(userId, emptyWorkItemCollection())
+    return
+  }
+  const changed = new Map(partitionKeys(manifest).map((key) => [key, emptyWorkItemCollection()]))
+  manifest.meta = { lastId: 0 }
+  await savePartitions(userId, manifest, changed)
+}
+
+export async function listWorkItemUserIds() {
+  const ids = new Set()
+  for (const name of await listFiles(WORK_ITEMS_USER_DIR)) {
+    const id = Number(name.endsWith('.json') ? name.slice(0, -5) : name)
+    if (Number.isInteger(id)) ids.add(id)
+  }
+  return [...ids].sort((a, b) => a - b)
+}
 
 export async function listWorkItemsForUsers(userIds, { startDate, endDate }) {
   const result = []
   for (const id of userIds) {
-    const collection = await loadWorkItemCollection(id)
-    for (const item of collection.items) {
+    const manifest = await loadWorkItemManifest(id)
+    let items
+    if (manifest) {
+      items = []
+      for (const key of partitionKeys(manifest)) {
+        const info = manifest.partitions[key]
+        if (key !== UNDATED_PARTITION && (info.maxDate < startDate || info.minDate > endDate)) continue
+        items.push(...(await loadPartition(id, key)).items)
+      }
+    } else {
+      items = (await loadWorkItemCollection(id)).items
+    }
+    for (const item of items) {
       if (item.workDate >= startDate && item.workDate <= endDate) {
         result.push(item)
       }
@@ -199,12 +407,9 @@ export async function listWorkItemsPaginated(userIds, { startDate, endDate, limi
 }
 
 export async function getAllWorkItems() {
-  const files = await listFiles(WORK_ITEMS_USER_DIR)
   const items = []
-  for (const file of files) {
-    if (!file.endsWith('.json')) continue
-    const collection = await loadWorkItemCollection(path.basename(file, '.json'))
-    items.push(...collection.items)
+  for (const id of await listWorkItemUserIds()) {
+    items.push(...(await listAllWorkItemsForUser(id)))
   }
   return items
 }
@@ -220,15 +425,21 @@ export async function saveSuggestions(data) {
 }
 
 export async function replaceSuggestions(updater) {
-  const data = await getSuggestions()
-  const result = await updater(data)
-  if (result !== false) {
-    await saveSuggestions(data)
-  }
-  return data
+  return withFileLock(SUGGESTIONS_FILE, async () => {
+    const data = await getSuggestions()
+    const result = await updater(data)
+    if (result !== false) {
+      await saveSuggestions(data)
+    }
+    return data
+  })
 }
 
 export async function addSuggestion(userId, content) {
+  return withFileLock(SUGGESTIONS_FILE, () => appendSuggestion(userId, content))
+}
+
+async function appendSuggestion(userId, content) {
   const data = await getSuggestions()
   const now = new Date().toISOString()
   const id = ++data.meta.lastId
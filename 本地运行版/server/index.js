@@ -42,6 +42,13 @@ const app = express()
 const JWT_SECRET = getJwtSecret()
 
 app.use(express.json({ limit: '2mb' }))
+
+// Liveness probe for the start_local.py supervisor; registered before morgan so probes stay out of the log
+app.get('/api/health', (req, res) => {
+  res.setHeader('Cache-Control', 'no-store')
+  res.json({ ok: true, pid: process.pid, uptime: Math.round(process.uptime()), rss: process.memoryUsage.rss() })
+})
+
 app.use(morgan('dev'))
 
 app.use(async (req, res, next) => {
@@ -83,6 +90,15 @@ async function recordAudit(entry) {
   await appendAuditLog(entry)
 }
 
+// tools/cluster_proxy.py --cache-reports asks for the audit entry so it can append the same
+// record when it later serves this response from its cache (the request never reaches us then).
+async function recordReportAudit(req, res, entry) {
+  await recordAudit(entry)
+  if (req.get('X-Report-Cache-Audit') === '1') {
+    res.set('X-Audit-Entry', encodeURIComponent(JSON.stringify(entry)))
+  }
+}
+
 async function suggestionRateLimited(userId) {
   const data = await getSuggestions()
   const since = Date.now() - 60 * 60_000
@@ -318,7 +334,7 @@ app.get('/api/reports/weekly', authenticate, canRead, async (req, res) => {
   const from = toISODate(range.start)
   const to = toISODate(range.end)
   const result = await weeklyAggregate(req.user.sub, scope, { from, to })
-  await recordAudit({
+  await recordReportAudit(req, res, {
     actorUserId: req.user.sub,
     action: 'report_weekly',
     objectType: 'work_item',
@@ -349,7 +365,7 @@ app.get('/api/reports/daily-overview', authenticate, async (req, res) => {
   }
   try {
     const overview = await buildDailyOverview(req.user.sub, scope, dateStr)
-    await recordAudit({
+    await recordReportAudit(req, res, {
       actorUserId: req.user.sub,
       action: 'report_daily_overview',
       objectType: 'work_item',
@@ -369,7 +385,7 @@ app.get('/api/reports/weekly-overview', authenticate, async (req, res) => {
   const to = toISODate(range.end)
   try {
     const overview = await buildWeeklyOverview(req.user.sub, scope, { from, to })
-    await recordAudit({
+    await recordReportAudit(req, res, {
       actorUserId: req.user.sub,
       action: 'report_weekly_overview',
       objectType: 'work_item',
@@ -1,13 +1,12 @@
 import path from 'node:path'
 
 import { DATA_DIR } from '../config.js'
-import { readJson, writeJson, listFiles } from '../utils/file-store.js'
+import { withFileLock, writeJson } from '../utils/file-store.js'
 import { listUsers, getPrimaryOrgId } from './domain.js'
-import { addWorkItem } from '../data/store.js'
+import { addWorkItem, clearWorkItemsForUser, listAllWorkItemsForUser, listWorkItemUserIds } from '../data/store.js'
 import { parseISODate, toISODate } from '../utils/datetime.js'
 
 const WORK_ITEMS_DIR = path.join(DATA_DIR, 'work_items')
-const USER_WORK_DIR = path.join(WORK_ITEMS_DIR, 'user')
 const GLOBAL_META_PATH = path.join(WORK_ITEMS_DIR, 'meta.json')
 const SAMPLE_PREFIX = '【示例】'
 
@@ -57,9 +56,7 @@ export async function generateSampleWorkData({ startDate, endDate }) {
   for (const user of users) {
     const userId = Number(user.id)
     if (!Number.isFinite(userId)) continue
-    const userFile = path.join(USER_WORK_DIR, `${userId}.json`)
-    const data = await readJson(userFile, { meta: { lastId: 0 }, items: [] })
-    const items = Array.isArray(data.items) ? data.items : []
+    const items = await listAllWorkItemsForUser(userId)
     const sampleKeys = new Set(
       items
         .filter((item) => typeof item?.title === 'string' && item.title.startsWith(SAMPLE_PREFIX))
@@ -112,22 +109,18 @@ export async function clearAllWorkItems() {
   const activeIds = users.map((user) => Number(user.id)).filter((id) => Number.isFinite(id))
   let cleared = 0
   for (const userId of activeIds) {
-    const filePath = path.join(USER_WORK_DIR, `${userId}.json`)
-    await writeJson(filePath, { meta: { lastId: 0 }, items: [] })
+    await clearWorkItemsForUser(userId)
     cleared += 1
   }
 
-  const extraFiles = await listFiles(USER_WORK_DIR)
-  for (const name of extraFiles) {
-    if (!name.endsWith('.json')) continue
-    const userId = Number(name.replace(/\.json$/, ''))
+  for (const userId of await listWorkItemUserIds()) {
     if (!activeIds.includes(userId)) {
-      const filePath = path.join(USER_WORK_DIR, name)
-      await writeJson(filePath, { meta: { lastId: 0 }, items: [] })
+      await clearWorkItemsForUser(userId)
       cleared += 1
     }
   }
 
-  await writeJson(GLOBAL_META_PATH, { lastId: 0 })
+  // Same meta.json.lock as nextWorkItemId and tools/id_allocator.py, so a concurrent allocation is not overwritten
+  await withFileLock(GLOBAL_META_PATH, () => writeJson(GLOBAL_META_PATH, { lastId: 0 }))
   return { cleared, processedUsers: activeIds.length }
 }
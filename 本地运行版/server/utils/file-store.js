@@ -23,7 +23,8 @@ export async function writeJson(fullPath, payload) {
   const dir = path.dirname(fullPath)
   await ensureDir(dir)
   const json = JSON.stringify(payload, null, 2)
-  const tmp = `${fullPath}.tmp-${Date.now()}`
+  // pid keeps tmp names unique when several server instances share DATA_DIR
+  const tmp = `${fullPath}.tmp-${process.pid}-${Date.now()}`
   const prev = writeQueue.get(fullPath) || Promise.resolve()
   const next = prev.then(async () => {
     await fs.writeFile(tmp, json, 'utf8')
@@ -53,6 +54,40 @@ export async function writeJson(fullPath, payload) {
   return next
 }
 
+// Advisory lock shared with tools/json_writer.py file_lock: `<file>.lock` created with O_EXCL,
+// treated as stale after staleMs
+export async function withFileLock(fullPath, fn, { timeoutMs = 10000, staleMs = 30000, pollMs = 50 } = {}) {
+  const lock = `${fullPath}.lock`
+  await ensureDir(path.dirname(fullPath))
+  const deadline = Date.now() + timeoutMs
+  for (;;) {
+    try {
+      await fs.writeFile(lock, JSON.stringify({ pid: process.pid, at: Date.now() / 1000 }), { flag: 'wx' })
+      break
+    } catch (err) {
+      if (err.code === 'ENOENT') {
+        // Directory removed while waiting (tools/reshard_work_items.py merge drops the partition directory)
+        await ensureDir(path.dirname(lock))
+        continue
+      }
+      if (err.code !== 'EEXIST') throw err
+      const stat = await fs.stat(lock).catch(() => null)
+      if (!stat) continue
+      if (Date.now() - stat.mtimeMs > staleMs) {
+        await fs.unlink(lock).catch(() => {})
+        continue
+      }
+      if (Date.now() >= deadline) throw new Error(`${lock} is held for more than ${timeoutMs}ms`)
+      await delay(pollMs)
+    }
+  }
+  try {
+    return await fn()
+  } finally {
+    await fs.unlink(lock).catch(() => {})
+  }
+}
+
 export async function readText(fullPath, fallback = '') {
   try {
     return await fs.readFile(fullPath, 'utf8')
@@ -68,6 +103,22 @@ export async function writeText(fullPath, content) {
   await fs.writeFile(fullPath, content, 'utf8')
 }
 
+export async function removeFile(fullPath) {
+  // Queue behind pending writes to the same path so a late rename cannot resurrect the file
+  const prev = writeQueue.get(fullPath) || Promise.resolve()
+  const next = prev.then(async () => {
+    try {
+      await fs.unlink(fullPath)
+      return true
+    } catch (err) {
+      if (err.code === 'ENOENT') return false
+      throw err
+    }
+  })
+  writeQueue.set(fullPath, next.catch(() => {}))
+  return next
+}
+
 export async function listFiles(fullPath) {
   try {
     return await fs.readdir(fullPath)
@@ -4,22 +4,32 @@
 This helper performs the following steps:
 
 1. 检查 `node` / `npm` 是否可用。
-2. 若缺少 `node_modules/`，自动执行 `npm install`（可通过参数强制重新安装）。
-3. 若缺少 `web/node_modules/`，自动执行 `npm install --prefix web`。
-4. 若缺少 `web/dist/`，自动执行 `npm run build --prefix web`（可强制/跳过）。
+2. 若缺少 `node_modules/` 或 `package.json` / `package-lock.json` 有变化，执行 `npm install`（可通过参数强制重新安装）。
+3. 若缺少 `web/node_modules/` 或 web 的 package 文件有变化，执行 `npm install --prefix web`（与第 2 步并行）。
+4. 若缺少 `web/dist/` 或前端源码（web/src、shared/src、构建配置等）有变化，执行 `npm run build --prefix web`（可强制/跳过）。
 5. 启动 `npm start`，并在端口被占用时尝试自动杀掉占用进程。
 
+第 2–4 步按输入文件内容的 sha256 判断是否需要重跑，指纹记录在 `.cache/build_fingerprints.json`，
+步骤成功后才更新；文件的 (mtime, size) 未变时直接复用上次的摘要，不必重读。
+
 示例：
 
     python start_local.py
     python start_local.py --force-build
     python start_local.py --skip-build --port 9090
+    python start_local.py --skip-build --watch-data   # 同时维护 data/indexes/ 派生索引
+    python start_local.py --skip-build --supervise    # 健康探测 + 自动重启，状态见 http://127.0.0.1:<port+100>/
+    python start_local.py --skip-build --instances 4 --sticky   # 4 个实例 + 本地负载均衡代理
+    python start_local.py --skip-build --cache-reports          # 代理缓存报表接口，data/ 变化时失效
+    python start_local.py bench --users 500 --concurrency 32
+    python start_local.py logs tail --proc server-8080 --grep ERROR   # 查看 logs/ 下捕获的子进程输出
 
 """
 
 from __future__ import annotations
 
 import argparse
+import atexit
 import os
 import platform
 import shutil
@@ -27,8 +37,11 @@ import signal
 import socket
 import subprocess
 import sys
+import threading
 import time
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -41,15 +54,121 @@ except Exception:
 
 
 def run_ui(args: argparse.Namespace) -> int:
-    """Launch a minimal PyQt5 UI to manage local/tunnel start."""
+    """Launch a minimal PyQt5 UI to manage local/tunnel start.
+
+    Install/build, server start-up and shutdown run in a TaskRunner thread, so the window stays responsive;
+    their output (print and LOG_MUX echo) is appended to the log view in batches every 100 ms.
+    While starting, the stop button cancels: running npm steps get SIGTERM and are not fingerprinted.
+    """
+    from PyQt5 import QtCore  # type: ignore
+
     app = QtWidgets.QApplication(sys.argv)
 
+    class UiLogBuffer:
+        """File-like stdout replacement: keeps writing to the console and queues text for the log view.
+
+        Any thread may write; the GUI thread drains it on a timer, so bursts of output become one append.
+        """
+
+        def __init__(self, console) -> None:
+            self.console = console
+            self.pending: list[str] = []
+            self.partial = ""
+            self._lock = threading.Lock()
+
+        def write(self, text: str) -> int:
+            if self.console is not None:
+                self.console.write(text)
+            with self._lock:
+                self.pending.append(text)
+            return len(text)
+
+        def flush(self) -> None:
+            if self.console is not None:
+                self.console.flush()
+
+        def isatty(self) -> bool:
+            return False
+
+        def drain(self, max_lines: int) -> tuple[list[str], int]:
+            """Complete lines written since the last drain (at most the last max_lines) and how many were dropped."""
+            with self._lock:
+                text = self.partial + "".join(self.pending)
+                self.pending = []
+            lines = text.split("\n")
+            self.partial = lines.pop()
+            dropped = max(0, len(lines) - max_lines)
+            return lines[dropped:], dropped
+
+    class TaskRunner(QtCore.QThread):
+        """Runs fn(task) off the GUI thread. progress/done are queued signals, so slots run on the GUI thread."""
+
+        progress = QtCore.pyqtSignal(int, int, str)
+        done = QtCore.pyqtSignal(object)
+
+        def __init__(self, fn, parent=None) -> None:
+            super().__init__(parent)
+            self.fn = fn
+            self.cancel_event = threading.Event()
+            self.handles: dict = {}  # processes started so far; handed back even when the task fails
+            self.status = "ok"
+            self.error: Optional[str] = None
+
+        def step(self, index: int, total: int, label: str) -> None:
+            if self.cancel_event.is_set():
+                raise RunCancelled(label)
+            print(f"[{index}/{total}] {label}")
+            self.progress.emit(index, total, label)
+
+        def cancel(self) -> None:
+            self.cancel_event.set()
+            # RUNS.cancel waits for npm to exit; keep that wait off the GUI thread
+            threading.Thread(target=RUNS.cancel, name="cancel-runs", daemon=True).start()
+
+        def run(self) -> None:
+            try:
+                self.fn(self)
+            except RunCancelled:
+                self.status = "cancelled"
+            except subprocess.CalledProcessError as e:
+                self.status, self.error = "failed", str(e)
+            except SystemExit:
+                # ensure_port_available / ensure_tool print the reason before exiting
+                self.status, self.error = "failed", "启动中止，原因见上方日志"
+            except Exception as e:
+                self.status, self.error = "failed", f"{type(e).__name__}: {e}"
+            if self.cancel_event.is_set() and self.status != "ok":
+                self.status = "cancelled"
+            self.done.emit(self)
+
     class MainWindow(QtWidgets.QWidget):
         def __init__(self):
             super().__init__()
             self.setWindowTitle("本地启动与内网穿透")
             self.server_proc: Optional[subprocess.Popen] = None
             self.ngrok_proc: Optional[subprocess.Popen] = None
+            self.watcher_proc: Optional[subprocess.Popen] = None
+            self.supervisor = None
+            self.proxy = None
+            self.cluster_members: list = []
+            self.cluster_port = 0
+            self._supervisor_state: Optional[str] = None
+            self._reported_exits: set[str] = set()
+            self.supervisorTimer = QtCore.QTimer(self)
+            self.supervisorTimer.setInterval(1000)
+            self.supervisorTimer.timeout.connect(self.poll_supervisor)
+            self.runner: Optional[TaskRunner] = None
+            if LOG_MUX is None:
+                start_log_mux(log_dir=None)
+            # print() from any thread and LOG_MUX echo land in logBuffer; logTimer appends them in batches
+            self.logBuffer = UiLogBuffer(sys.stdout)
+            sys.stdout = self.logBuffer
+            if LOG_MUX is not None:
+                LOG_MUX.out = self.logBuffer
+            self.logTimer = QtCore.QTimer(self)
+            self.logTimer.setInterval(100)
+            self.logTimer.timeout.connect(self.drain_log)
+            self.logTimer.start()
 
             # Widgets
             self.mode = QtWidgets.QComboBox()
@@ -97,6 +216,20 @@ def run_ui(args: argparse.Namespace) -> int:
             self.skipBuild = QtWidgets.QCheckBox("跳过前端构建 (--skip-build)")
             self.skipBuild.setChecked(bool(args.skip_build))
 
+            self.watchData = QtWidgets.QCheckBox("实时维护派生索引 (--watch-data)")
+            self.watchData.setChecked(bool(args.watch_data))
+
+            self.supervise = QtWidgets.QCheckBox("守护模式：健康探测 + 自动重启 (--supervise)")
+            self.supervise.setChecked(bool(args.supervise))
+
+            self.instances = QtWidgets.QSpinBox()
+            self.instances.setRange(1, 64)
+            self.instances.setValue(resolve_instances(args.instances))
+            self.sticky = QtWidgets.QCheckBox("集群会话粘滞 (--sticky)")
+            self.sticky.setChecked(bool(args.sticky))
+            self.cacheReports = QtWidgets.QCheckBox("缓存报表接口 (--cache-reports)")
+            self.cacheReports.setChecked(bool(args.cache_reports))
+
             self.startBtn = QtWidgets.QPushButton("启动")
             self.stopBtn = QtWidgets.QPushButton("停止")
             self.stopBtn.setEnabled(False)
@@ -109,8 +242,14 @@ def run_ui(args: argparse.Namespace) -> int:
             self.openLocal = QtWidgets.QPushButton("打开本地")
             self.openPublic = QtWidgets.QPushButton("打开公网")
 
+            self.progress = QtWidgets.QProgressBar()
+            self.progress.setRange(0, 1)
+            self.progress.setValue(0)
+            self.progress.setFormat("空闲")
+
             self.log = QtWidgets.QPlainTextEdit()
             self.log.setReadOnly(True)
+            self.log.setMaximumBlockCount(LOG_VIEW_LINES)
 
             # Layout
             form = QtWidgets.QFormLayout()
@@ -123,6 +262,11 @@ def run_ui(args: argparse.Namespace) -> int:
             form.addRow(self.forceInstallWeb)
             form.addRow(self.forceBuild)
             form.addRow(self.skipBuild)
+            form.addRow(self.watchData)
+            form.addRow(self.supervise)
+            form.addRow("实例数 (--instances)", self.instances)
+            form.addRow(self.sticky)
+            form.addRow(self.cacheReports)
 
             btns = QtWidgets.QHBoxLayout()
             btns.addWidget(self.startBtn)
@@ -135,6 +279,7 @@ def run_ui(args: argparse.Namespace) -> int:
             v = QtWidgets.QVBoxLayout(self)
             v.addLayout(form)
             v.addLayout(btns)
+            v.addWidget(self.progress)
             v.addWidget(QtWidgets.QLabel("本地地址 / 公网地址"))
             v.addWidget(self.localUrl)
             v.addWidget(self.publicUrl)
@@ -149,8 +294,33 @@ def run_ui(args: argparse.Namespace) -> int:
             self.openPublic.clicked.connect(lambda: self.open_url(self.publicUrl.text()))
 
         def append_log(self, text: str) -> None:
+            self.drain_log()  # keep ordering with output already queued by workers
             self.log.appendPlainText(text)
 
+        def drain_log(self) -> None:
+            lines, dropped = self.logBuffer.drain(LOG_VIEW_LINES)
+            if dropped:
+                self.log.appendPlainText(f"...（输出过快，省略 {dropped} 行，完整内容见 logs/）")
+            if lines:
+                self.log.appendPlainText("\n".join(lines))
+
+        def set_busy(self, busy: bool) -> None:
+            """While a task runs, Start is disabled and Stop cancels it."""
+            if busy:
+                self.startBtn.setEnabled(False)
+                self.stopBtn.setEnabled(True)
+            self.stopBtn.setText("取消" if busy else "停止")
+
+        def has_processes(self) -> bool:
+            return any(
+                (self.server_proc, self.ngrok_proc, self.watcher_proc, self.supervisor, self.proxy, self.cluster_members)
+            )
+
+        def on_progress(self, index: int, total: int, label: str) -> None:
+            self.progress.setRange(0, total)
+            self.progress.setValue(index - 1)
+            self.progress.setFormat(f"{index}/{total} {label}")
+
         def open_url(self, url: str) -> None:
             if not url:
                 return
@@ -169,66 +339,219 @@ def run_ui(args: argparse.Namespace) -> int:
             self.startBtn.setEnabled(False)
             self.stopBtn.setEnabled(True)
 
-            # Prepare options
-            port = int(self.port.value())
-            mode = self.mode.currentText().lower()
-            token = self.token.text().strip() or None
-            domain = self.domain.text().strip() or None
-            region = self.region.text().strip() or None
+            # Widgets are only read here; the worker gets a plain dict
+            opts = {
+                "port": int(self.port.value()),
+                "mode": self.mode.currentText().lower(),
+                "token": self.token.text().strip() or None,
+                "domain": self.domain.text().strip() or None,
+                "region": self.region.text().strip() or None,
+                "force_install": self.forceInstall.isChecked(),
+                "force_install_web": self.forceInstallWeb.isChecked(),
+                "force_build": self.forceBuild.isChecked(),
+                "skip_build": self.skipBuild.isChecked(),
+                "watch_data": self.watchData.isChecked(),
+                "supervise": self.supervise.isChecked(),
+                "instances": self.instances.value(),
+                "sticky": self.sticky.isChecked(),
+                "cache_reports": self.cacheReports.isChecked(),
+            }
+            RUNS.reset()
+            self.run_task(lambda task: self.start_sequence(task, opts), self.on_start_done)
+
+        def run_task(self, fn, on_done) -> None:
+            self.runner = TaskRunner(fn, self)
+            self.runner.progress.connect(self.on_progress)
+            self.runner.done.connect(on_done)
+            self.set_busy(True)
+            self.runner.start()
+
+        @staticmethod
+        def start_sequence(task: TaskRunner, opts: dict) -> None:
+            """Runs on the worker thread: no widget access, results go into task.handles."""
+            port = opts["port"]
+            task.handles["port"] = port
+            steps = ["安装依赖 / 构建前端", "启动服务"]
+            if opts["watch_data"]:
+                steps.append("启动数据监视")
+            steps.append("等待端口就绪")
+            if opts["mode"] == "ngrok":
+                steps.append("启动 ngrok")
+            counter = iter(range(1, len(steps) + 1))
+
+            def step(label: str) -> None:
+                task.step(next(counter), len(steps), label)
+
+            step(steps[0])
+            prepare_node_runtime(
+                force_install=opts["force_install"],
+                force_install_web=opts["force_install_web"],
+                force_build=opts["force_build"],
+                skip_build=opts["skip_build"],
+            )
 
-            # Install/build as requested
-            try:
-                maybe_install_server(self.forceInstall.isChecked())
-                maybe_install_web(self.forceInstallWeb.isChecked())
-                maybe_build_web(self.forceBuild.isChecked(), self.skipBuild.isChecked())
-            except subprocess.CalledProcessError as e:
-                self.append_log(f"依赖/构建失败: {e}")
-                self.startBtn.setEnabled(True)
-                self.stopBtn.setEnabled(False)
-                return
+            step("启动服务")
+            if opts["instances"] > 1 or opts["cache_reports"]:
+                n = opts["instances"]
+                task.handles["proxy"], task.handles["cluster_members"] = start_cluster_background(
+                    port,
+                    n,
+                    sticky=opts["sticky"],
+                    supervise=opts["supervise"],
+                    cache_reports=opts["cache_reports"],
+                    cache_ttl=args.cache_ttl,
+                )
+                print(f"集群已启动：{n} 个实例 (端口 {port + 1}-{port + n})，状态: /__proxy/status")
+            elif opts["supervise"]:
+                # Supervisor runs in its own thread; the UI only reads snapshot() from poll_supervisor
+                supervisor = make_supervisor(port, status_port=port + 100)
+                supervisor.start_thread()
+                task.handles["supervisor"] = supervisor
+                print(f"守护模式已启动，状态: http://127.0.0.1:{port + 100}/ ，等待服务就绪...")
+            else:
+                task.handles["server_proc"] = start_server_background(port)
+                print(f"Node 服务已启动 (pid={task.handles['server_proc'].pid})，等待端口就绪...")
 
-            # Start server
-            try:
-                self.server_proc = start_server_background(port)
-                self.append_log(f"Node 服务已启动 (pid={self.server_proc.pid})，等待端口就绪...")
-            except Exception as e:
-                self.append_log(f"启动服务失败: {e}")
-                self.startBtn.setEnabled(True)
-                self.stopBtn.setEnabled(False)
-                return
+            if opts["watch_data"]:
+                step("启动数据监视")
+                try:
+                    task.handles["watcher_proc"] = start_data_watcher_background()
+                    print(f"数据监视已启动 (pid={task.handles['watcher_proc'].pid})")
+                except Exception as e:
+                    print(f"启动数据监视失败: {e}")
 
-            if not wait_for_port(port, timeout=45):
-                self.append_log("端口未在预期时间内打开。")
+            step("等待端口就绪")
+            if not wait_for_port(port, timeout=45, cancel=task.cancel_event):
+                if task.cancel_event.is_set():
+                    raise RunCancelled("wait_for_port")
+                print("端口未在预期时间内打开。")
                 return
+            task.handles["local_url"] = f"http://localhost:{port}"
+            print(f"本地地址: {task.handles['local_url']}")
 
-            local_url = f"http://localhost:{port}"
-            self.localUrl.setText(local_url)
-            self.append_log(f"本地地址: {local_url}")
-
-            # Start ngrok if needed
-            if mode == "ngrok":
+            if opts["mode"] == "ngrok":
+                step("启动 ngrok")
                 try:
-                    ngrok_config_add_authtoken(token)
-                    self.ngrok_proc, public_url = start_ngrok_http(port, domain=domain, region=region)
-                    if domain:
-                        self.publicUrl.setText(public_url)
-                        self.append_log(f"公网地址: {public_url}")
+                    ngrok_config_add_authtoken(opts["token"])
+                    task.handles["ngrok_proc"], public_url = start_ngrok_http(
+                        port, domain=opts["domain"], region=opts["region"]
+                    )
+                    if opts["domain"]:
+                        task.handles["public_url"] = public_url
+                        print(f"公网地址: {public_url}")
                     else:
-                        self.append_log("ngrok 将分配临时域名，请查看控制台窗口。")
+                        print("ngrok 将分配临时域名，请查看控制台窗口。")
+                except RunCancelled:
+                    raise
                 except Exception as e:
-                    self.append_log(f"启动 ngrok 失败: {e}")
+                    print(f"启动 ngrok 失败: {e}")
+
+        def adopt(self, handles: dict) -> None:
+            self.server_proc = handles.get("server_proc")
+            self.watcher_proc = handles.get("watcher_proc")
+            self.ngrok_proc = handles.get("ngrok_proc")
+            self.proxy = handles.get("proxy")
+            self.cluster_members = handles.get("cluster_members", [])
+            self.cluster_port = handles.get("port", 0)
+            self.supervisor = handles.get("supervisor")
+            if self.supervisor is not None or self.cluster_members:
+                self._supervisor_state = None
+                self._reported_exits = set()
+                self.supervisorTimer.start()
+            self.localUrl.setText(handles.get("local_url", ""))
+            self.publicUrl.setText(handles.get("public_url", ""))
+
+        def on_start_done(self, task: TaskRunner) -> None:
+            self.runner = None
+            self.adopt(task.handles)
+            self.progress.setValue(self.progress.maximum())
+            self.set_busy(False)
+            if task.status == "ok":
+                self.progress.setFormat("已启动" if task.handles.get("local_url") else "已启动（端口未就绪）")
+                return
+            self.append_log("已取消启动，正在清理..." if task.status == "cancelled" else f"启动失败: {task.error}")
+            self.progress.setFormat("已取消" if task.status == "cancelled" else "失败")
+            self.on_stop()
 
-        def on_stop(self) -> None:
+        def teardown(self) -> None:
+            """Stop everything this window started; blocking, so normally run through run_task."""
+            stop_cluster(self.proxy, self.cluster_members)
+            if self.supervisor is not None:
+                self.supervisor.stop()
             terminate_process(self.ngrok_proc, name="ngrok")
             terminate_process(self.server_proc, name="node server")
-            self.ngrok_proc = None
-            self.server_proc = None
-            self.append_log("已停止。")
+            terminate_process(self.watcher_proc, name="data watcher")
+
+        def stop_sequence(self, task: TaskRunner) -> None:
+            task.step(1, 1, "停止服务")
+            self.teardown()
+
+        def forget_processes(self) -> None:
+            self.supervisorTimer.stop()
+            self.proxy, self.cluster_members, self.supervisor = None, [], None
+            self.ngrok_proc = self.server_proc = self.watcher_proc = None
+            self.localUrl.clear()
+            self.publicUrl.clear()
+
+        def poll_supervisor(self) -> None:
+            for name, code in exited_members(self.cluster_port, self.cluster_members):
+                if name not in self._reported_exits:
+                    self._reported_exits.add(name)
+                    self.append_log(f"[集群] {name} 已退出 (code={code})，未启用守护模式，不会自动重启。")
+            if self.supervisor is None:
+                return
+            snap = self.supervisor.snapshot()
+            if snap["state"] == self._supervisor_state:
+                return
+            self._supervisor_state = snap["state"]
+            detail = f"pid={snap['pid']}" if snap["pid"] else f"restarts={snap['restarts']} lastExit={snap['lastExit']}"
+            self.append_log(f"[守护] {snap['state']} {detail}")
+
+        def on_stop(self) -> None:
+            if self.runner is not None:
+                # Still starting: cancel; on_start_done then calls on_stop again to clean up
+                self.append_log("正在取消...")
+                self.stopBtn.setEnabled(False)
+                self.runner.cancel()
+                return
+            if not self.has_processes():
+                self.progress.setRange(0, 1)
+                self.startBtn.setEnabled(True)
+                self.stopBtn.setEnabled(False)
+                return
+            self.append_log("正在停止...")
+            self.run_task(self.stop_sequence, self.on_stop_done)
+            self.stopBtn.setEnabled(False)
+
+        def on_stop_done(self, task: TaskRunner) -> None:
+            self.runner = None
+            self.forget_processes()
+            self.append_log("已停止。" if task.status == "ok" else f"停止时出错: {task.error}")
+            self.progress.setRange(0, 1)
+            self.progress.setValue(0)
+            self.progress.setFormat("空闲")
+            self.set_busy(False)
             self.startBtn.setEnabled(True)
             self.stopBtn.setEnabled(False)
 
         def closeEvent(self, event):  # noqa: N802
-            self.on_stop()
+            stopping = False
+            if self.runner is not None:
+                runner, self.runner = self.runner, None
+                runner.done.disconnect()
+                stopping = runner.fn == self.stop_sequence
+                if not stopping:
+                    runner.cancel()
+                runner.wait()
+                if runner.handles:
+                    self.adopt(runner.handles)
+            if not stopping:
+                self.teardown()
+            self.forget_processes()
+            self.logTimer.stop()
+            sys.stdout = self.logBuffer.console
+            if LOG_MUX is not None:
+                LOG_MUX.out = self.logBuffer.console
             super().closeEvent(event)
 
     win = MainWindow()
@@ -238,8 +561,16 @@ def run_ui(args: argparse.Namespace) -> int:
 
 ROOT = Path(__file__).resolve().parent
 WEB_DIR = ROOT / "web"
+# tools/*.py are imported lazily by the subcommands below; put their directory on sys.path once
+TOOLS_DIR = str(ROOT / "tools")
+if TOOLS_DIR not in sys.path:
+    sys.path.insert(0, TOOLS_DIR)
 TOOLS: dict[str, str] = {}
 NGROK_TOKEN_FILE = ROOT / "内网穿透token.json"
+# tools/log_mux.py LogMux set up by main(); None means children inherit the console as before
+LOG_MUX = None
+# Lines kept in the UI log view; older lines are dropped (logs/ keeps everything)
+LOG_VIEW_LINES = 5000
 
 
 def ensure_tool(name: str) -> None:
@@ -259,11 +590,61 @@ def resolve_cmd(cmd: list[str]) -> list[str]:
     return cmd
 
 
-def run(cmd: list[str], *, cwd: Path | None = None, check: bool = True) -> subprocess.CompletedProcess:
+class RunCancelled(Exception):
+    """run() was refused or its child killed because RUNS.cancel() was called."""
+
+
+class ChildRuns:
+    """Children of run() that are still running, so the UI can cancel an install/build in progress."""
+
+    def __init__(self) -> None:
+        self.procs: set[subprocess.Popen] = set()
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, name: str, cmd: list[str], **popen_kwargs) -> subprocess.Popen:
+        with self._lock:
+            if self.cancelled.is_set():
+                raise RunCancelled(" ".join(cmd))
+            proc = spawn(name, cmd, **popen_kwargs)
+            self.procs.add(proc)
+            return proc
+
+    def finish(self, proc: subprocess.Popen) -> None:
+        with self._lock:
+            self.procs.discard(proc)
+
+    def cancel(self, timeout: float = 5.0) -> None:
+        """Refuse new runs and stop the running ones (SIGTERM, then SIGKILL after timeout) so npm can clean up."""
+        with self._lock:
+            self.cancelled.set()
+            pids = [proc.pid for proc in self.procs if proc.poll() is None]
+        kill_processes(pids, timeout=timeout)
+
+    def reset(self) -> None:
+        self.cancelled.clear()
+
+
+RUNS = ChildRuns()
+
+
+def run(
+    cmd: list[str], *, cwd: Path | None = None, check: bool = True, name: Optional[str] = None
+) -> subprocess.CompletedProcess:
+    """Run cmd to completion; output goes through LOG_MUX as `name` (default: the program name)."""
     cwd = cwd or ROOT
     full_cmd = resolve_cmd(cmd)
     print(f"\n==> {' '.join(full_cmd)} (cwd={cwd})")
-    return subprocess.run(full_cmd, cwd=cwd, check=check)
+    proc = RUNS.start(name or Path(full_cmd[0]).stem, full_cmd, cwd=cwd)
+    try:
+        returncode = proc.wait()
+    finally:
+        RUNS.finish(proc)
+    if RUNS.cancelled.is_set() and returncode != 0:
+        raise RunCancelled(" ".join(full_cmd))
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, full_cmd)
+    return subprocess.CompletedProcess(full_cmd, returncode)
 
 
 def load_local_ngrok_token() -> Optional[str]:
@@ -297,24 +678,135 @@ def load_local_ngrok_token() -> Optional[str]:
         return None
 
 
-def maybe_install_server(force: bool) -> None:
-    if force or not (ROOT / "node_modules").exists():
-        run(["npm", "install"])
+FINGERPRINT_FILE = ROOT / ".cache" / "build_fingerprints.json"
+SKIP_DIRS = {"node_modules", "dist", ".git", "__pycache__"}
+
+# step -> (output that must exist, input globs relative to ROOT)
+BUILD_STEPS: dict[str, tuple[Path, tuple[str, ...]]] = {
+    "install_server": (ROOT / "node_modules", ("package.json", "package-lock.json")),
+    "install_web": (WEB_DIR / "node_modules", ("web/package.json", "web/package-lock.json")),
+    "build_web": (
+        WEB_DIR / "dist",
+        (
+            "web/package-lock.json",
+            "web/index.html",
+            "web/vite.config.ts",
+            "web/tsconfig*.json",
+            "web/src/**/*",
+            "web/public/**/*",
+            "shared/package.json",
+            "shared/tsconfig.json",
+            "shared/src/**/*",
+            "tsconfig.base.json",
+        ),
+    ),
+}
 
 
-def maybe_install_web(force: bool) -> None:
-    if force or not (WEB_DIR / "node_modules").exists():
-        run(["npm", "install", "--prefix", "web"])
+class BuildFingerprints:
+    """Content fingerprints of each BUILD_STEPS input set, persisted in FINGERPRINT_FILE."""
 
+    def __init__(self, path: Path = FINGERPRINT_FILE) -> None:
+        self.path = path
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            payload = {}
+        self.steps: dict[str, str] = payload.get("steps", {})
+        # rel -> [mtime_ns, size, sha256]: lets unchanged files skip re-hashing
+        self.files: dict[str, list] = payload.get("files", {})
+        self._lock = threading.Lock()  # installs run in parallel threads sharing this object
+
+    def _inputs(self, patterns: tuple[str, ...]) -> list[Path]:
+        found: set[Path] = set()
+        for pattern in patterns:
+            for path in ROOT.glob(pattern):
+                rel_parts = path.relative_to(ROOT).parts
+                if path.is_file() and not SKIP_DIRS.intersection(rel_parts):
+                    found.add(path)
+        return sorted(found)
+
+    def _file_digest(self, path: Path) -> str:
+        rel = path.relative_to(ROOT).as_posix()
+        st = path.stat()
+        cached = self.files.get(rel)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.files[rel] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def compute(self, step: str) -> str:
+        h = hashlib.sha256()
+        for path in self._inputs(BUILD_STEPS[step][1]):
+            h.update(path.relative_to(ROOT).as_posix().encode("utf-8") + b"\0")
+            h.update(self._file_digest(path).encode("ascii") + b"\n")
+        return h.hexdigest()
+
+    def reason(self, step: str, digest: str) -> Optional[str]:
+        """Why `step` has to run, or None when its output is present and inputs are unchanged."""
+        output = BUILD_STEPS[step][0]
+        if not output.exists():
+            return f"{output.relative_to(ROOT).as_posix()} 不存在"
+        if self.steps.get(step) is None:
+            return "没有指纹记录"
+        if self.steps[step] != digest:
+            return "输入文件有变化"
+        return None
 
-def maybe_build_web(force: bool, skip: bool) -> None:
+    def record(self, step: str, digest: str) -> None:
+        with self._lock:
+            self.steps[step] = digest
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.tmp-{os.getpid()}")
+            tmp.write_text(json.dumps({"steps": self.steps, "files": self.files}, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def _run_step(fingerprints: BuildFingerprints, step: str, cmd: list[str], force: bool) -> None:
+    digest = fingerprints.compute(step)
+    reason = "强制" if force else fingerprints.reason(step, digest)
+    if reason is None:
+        print(f"[SKIP] {' '.join(cmd)}：输入未变化。")
+        return
+    print(f"[INFO] {' '.join(cmd)}（{reason}）")
+    run(cmd, name=step)
+    # Recompute after the step: npm install may rewrite package-lock.json
+    fingerprints.record(step, fingerprints.compute(step))
+
+
+def maybe_install_server(force: bool, fingerprints: Optional[BuildFingerprints] = None) -> None:
+    _run_step(fingerprints or BuildFingerprints(), "install_server", ["npm", "install"], force)
+
+
+def maybe_install_web(force: bool, fingerprints: Optional[BuildFingerprints] = None) -> None:
+    _run_step(fingerprints or BuildFingerprints(), "install_web", ["npm", "install", "--prefix", "web"], force)
+
+
+def maybe_build_web(force: bool, skip: bool, fingerprints: Optional[BuildFingerprints] = None) -> None:
     if skip:
         print("跳过前端构建（--skip-build）。")
         return
-    if force or not (WEB_DIR / "dist").exists():
-        run(["npm", "run", "build", "--prefix", "web"])
-    else:
-        print("web/dist 已存在，若需重新构建请使用 --force-build。")
+    _run_step(fingerprints or BuildFingerprints(), "build_web", ["npm", "run", "build", "--prefix", "web"], force)
+
+
+def prepare_node_runtime(*, force_install: bool, force_install_web: bool, force_build: bool, skip_build: bool) -> None:
+    """Install server and web dependencies concurrently, then build the web frontend, each only when needed."""
+    fingerprints = BuildFingerprints()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        jobs = [
+            pool.submit(maybe_install_server, force_install, fingerprints),
+            pool.submit(maybe_install_web, force_install_web, fingerprints),
+        ]
+        for job in jobs:
+            job.result()  # re-raises CalledProcessError from either install
+    # 依赖重新安装过也要重新构建：build_web 的输入包含 web/package-lock.json
+    maybe_build_web(force_build, skip_build, fingerprints)
 
 
 def port_in_use(port: int) -> bool:
@@ -327,9 +819,21 @@ def port_in_use(port: int) -> bool:
     return False
 
 
+def _proc_inspect():
+    """tools/proc_inspect.py（Linux 且有 /proc/net/tcp 时），否则 None。"""
+    if platform.system().lower() != "linux":
+        return None
+    import proc_inspect
+
+    return proc_inspect if proc_inspect.available() else None
+
+
 def find_pids_for_port(port: int) -> list[int]:
     system = platform.system().lower()
     pids: set[int] = set()
+    inspector = _proc_inspect()
+    if inspector is not None:
+        return inspector.listening_pids(port)
     try:
         if system == "windows":
             output = subprocess.check_output(
@@ -376,9 +880,16 @@ def find_pids_for_port(port: int) -> list[int]:
     return sorted(pids)
 
 
-def kill_processes(pids: list[int]) -> None:
+def kill_processes(pids: list[int], *, timeout: float = 2.0) -> None:
+    """结束 pids（含子进程）。Linux 上 SIGTERM 后最多等 timeout 秒再 SIGKILL；其它平台只发信号不等待。"""
     if not pids:
         return
+    inspector = _proc_inspect()
+    if inspector is not None:
+        left = inspector.terminate_tree(pids, timeout=timeout)
+        if left:
+            print(f"[WARN] 进程 {left} 在 SIGKILL 后仍未退出。")
+        return
     system = platform.system().lower()
     for pid in pids:
         try:
@@ -403,43 +914,221 @@ def ensure_port_available(port: int, *, auto_kill: bool = True, wait: float = 2.
         print(f"[ERROR] 端口 {port} 已被占用，无法自动释放。占用进程: {pids or '未知'}")
         sys.exit(1)
     print(f"[INFO] 端口 {port} 被进程 {pids} 占用，尝试强制结束...")
-    kill_processes(pids)
-    time.sleep(wait)
+    kill_processes(pids, timeout=wait)
+    if _proc_inspect() is None:
+        time.sleep(wait)
     if port_in_use(port):
         print(f"[ERROR] 无法释放端口 {port}，请手动结束占用进程后重试。")
         sys.exit(1)
     print(f"[INFO] 已成功释放端口 {port}。")
 
 
-def start_server(port: int) -> int:
+def start_server(
+    port: int,
+    *,
+    watch_data: bool = False,
+    supervise: bool = False,
+    status_port: Optional[int] = None,
+    instances: int = 1,
+    sticky: bool = False,
+    cache_reports: bool = False,
+    cache_ttl: float = 300.0,
+) -> int:
     print("\n=== Starting local server (Ctrl+C to stop) ===")
     ensure_port_available(port)
+    watcher_proc = None
+    proxy, members = None, []
     try:
+        if instances > 1 or cache_reports:
+            if watch_data:
+                watcher_proc = start_data_watcher_background()
+            proxy, members = start_cluster_background(
+                port,
+                instances,
+                sticky=sticky,
+                supervise=supervise,
+                cache_reports=cache_reports,
+                cache_ttl=cache_ttl,
+                on_event=print,
+            )
+            print(f"[READY] Local: http://localhost:{port}  ({instances} instance(s), status: /__proxy/status)")
+            signal.signal(signal.SIGTERM, lambda *_: proxy.stop())
+            while proxy.join(0.5):
+                exited = next(iter(exited_members(port, members)), None)
+                if exited is not None:
+                    # 与单实例一致：Node 退出即结束（需要自动重启请加 --supervise）
+                    print(f"[ERROR] {exited[0]} exited with code {exited[1]}; stopping the cluster.")
+                    return exited[1] or 1
+            return 0
+        if supervise:
+            if watch_data:
+                watcher_proc = start_data_watcher_background()
+            supervisor = make_supervisor(port, status_port=status_port, on_event=print)
+            signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+            return supervisor.run()
         cmd = resolve_cmd(["npm", "start"])
         env = os.environ.copy()
         env.setdefault("PORT", str(port))
-        process = subprocess.Popen(cmd, cwd=ROOT, env=env)
+        if watch_data:
+            watcher_proc = start_data_watcher_background()
+        process = spawn(f"server-{env['PORT']}", cmd, cwd=ROOT, env=env)
         process.wait()
         return process.returncode or 0
     except KeyboardInterrupt:
         print("\nServer interrupted by user.")
         return 0
+    finally:
+        stop_cluster(proxy, members)
+        terminate_process(watcher_proc, name="data watcher")
+
 
+def spawn(name: str, cmd: list[str], **popen_kwargs) -> subprocess.Popen:
+    """Popen that routes stdout/stderr through LOG_MUX (tagged as `name`) unless the caller redirects output."""
+    if LOG_MUX is not None and "stdout" not in popen_kwargs:
+        return LOG_MUX.spawn(name, cmd, **popen_kwargs)
+    return subprocess.Popen(cmd, **popen_kwargs)
 
-def start_server_background(port: int) -> subprocess.Popen:
-    """Start the Node server as a background process and return the Popen handle."""
+
+def start_log_mux(log_dir: Optional[Path] = ROOT / "logs"):
+    """Capture child output into logs/<name>.log (rotating, gzip) and echo it tagged on the console.
+
+    log_dir=None only echoes (the UI uses this with --no-log-capture to still see child output).
+    """
+    global LOG_MUX
+    from log_mux import LogMux
+
+    LOG_MUX = LogMux(log_dir).start()
+    atexit.register(LOG_MUX.close)
+    return LOG_MUX
+
+
+def start_server_background(
+    port: int,
+    *,
+    extra_env: Optional[dict[str, str]] = None,
+    log_path: Optional[Path] = None,
+    quiet: bool = False,
+) -> subprocess.Popen:
+    """Start the Node server as a background process and return the Popen handle.
+
+    extra_env 覆盖环境变量（如 DATA_DIR）；log_path 把输出追加到文件，quiet 则直接丢弃。
+    """
     ensure_port_available(port)
     cmd = resolve_cmd(["npm", "start"])
     env = os.environ.copy()
     env.setdefault("PORT", str(port))
-    process = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    if extra_env:
+        env.update(extra_env)
+    if log_path is not None:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "ab") as log:
+            return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if quiet:
+        return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process = spawn(f"server-{env['PORT']}", cmd, cwd=ROOT, env=env)
     return process
 
 
-def wait_for_port(port: int, host: str = "127.0.0.1", timeout: float = 30.0, interval: float = 0.5) -> bool:
-    """Wait until the TCP port is open (listening)."""
+def make_supervisor(port: int, *, status_port: Optional[int] = None, on_event=None):
+    """Build a tools/supervisor.py Supervisor that (re)starts `npm start` on port."""
+    from supervisor import Supervisor, kill_tree
+
+    def kill(proc: subprocess.Popen) -> None:
+        if platform.system().lower() == "windows":
+            terminate_process(proc, name="node server")
+        else:
+            kill_tree(proc)
+
+    return Supervisor(
+        lambda: start_server_background(port, extra_env={"PORT": str(port)}),
+        port=port,
+        kill=kill,
+        status_port=status_port,
+        on_event=on_event,
+    )
+
+
+def start_cluster_background(
+    port: int,
+    instances: int,
+    *,
+    sticky: bool = False,
+    supervise: bool = False,
+    cache_reports: bool = False,
+    cache_ttl: float = 300.0,
+    on_event=None,
+):
+    """Start `instances` servers on port+1..port+N (sharing DATA_DIR) behind tools/cluster_proxy.py on port.
+
+    supervise=True 时每个实例由各自的 Supervisor 线程守护；cache_reports=True 时代理挂上
+    tools/report_cache.py 缓存报表接口（instances 可以为 1）。返回 (proxy, members)，交给 stop_cluster 停止。
+    """
+    from cluster_proxy import ClusterProxy
+    from report_cache import ReportCache
+
+    ensure_port_available(port)
+    backends = [port + i for i in range(1, instances + 1)]
+    members: list = []
+    for backend_port in backends:
+        if supervise:
+            member = make_supervisor(backend_port, on_event=on_event)
+            member.start_thread()
+        else:
+            member = start_server_background(backend_port, extra_env={"PORT": str(backend_port)})
+        members.append(member)
+    cache = ReportCache(ttl=cache_ttl, on_event=on_event) if cache_reports else None
+    proxy = ClusterProxy(backends, port=port, sticky=sticky, cache=cache, on_event=on_event)
+    proxy.start_thread()
+    proxy.ready.wait(10)
+    return proxy, members
+
+
+def exited_members(port: int, members: list) -> list[tuple[str, int]]:
+    """(description, exit code) of each unsupervised cluster member whose `npm start` has exited.
+
+    Supervised members are Supervisor objects that restart their server themselves.
+    """
+    return [
+        (f"Node instance on port {port + offset} (pid={member.pid})", member.returncode)
+        for offset, member in enumerate(members, start=1)
+        if isinstance(member, subprocess.Popen) and member.poll() is not None
+    ]
+
+
+def stop_cluster(proxy, members: list) -> None:
+    if proxy is not None:
+        proxy.stop()
+    for member in members:
+        if isinstance(member, subprocess.Popen):
+            terminate_process(member, name="node server")
+        else:
+            member.stop()
+
+
+def resolve_instances(value: int) -> int:
+    """--instances 0 表示按 CPU 核数。"""
+    return value if value > 0 else (os.cpu_count() or 1)
+
+
+def start_data_watcher_background(*, extra_env: Optional[dict[str, str]] = None) -> subprocess.Popen:
+    """Start tools/data_watcher.py watch, which keeps data/indexes/ up to date while the server runs."""
+    env = os.environ.copy()
+    if extra_env:
+        env.update(extra_env)
+    cmd = [sys.executable, str(ROOT / "tools" / "data_watcher.py"), "watch", "--quiet"]
+    return spawn("data-watcher", cmd, cwd=ROOT, env=env)
+
+
+def wait_for_port(
+    port: int,
+    host: str = "127.0.0.1",
+    timeout: float = 30.0,
+    interval: float = 0.5,
+    cancel: Optional[threading.Event] = None,
+) -> bool:
+    """Wait until the TCP port is open (listening); gives up early once `cancel` is set."""
     deadline = time.time() + timeout
-    while time.time() < deadline:
+    while time.time() < deadline and not (cancel is not None and cancel.is_set()):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             s.settimeout(interval)
             try:
@@ -447,7 +1136,10 @@ def wait_for_port(port: int, host: str = "127.0.0.1", timeout: float = 30.0, int
                 return True
             except OSError:
                 pass
-        time.sleep(interval)
+        if cancel is not None:
+            cancel.wait(interval)
+        else:
+            time.sleep(interval)
     return False
 
 
@@ -479,34 +1171,82 @@ def start_ngrok_http(port: int, domain: Optional[str] = None, region: Optional[s
     return proc, public_url
 
 
-def terminate_process(proc: Optional[subprocess.Popen], *, name: str = "process") -> None:
+def terminate_process(proc: Optional[subprocess.Popen], *, name: str = "process", timeout: float = 5.0) -> None:
+    """Stop proc and its children (node under `npm start`): on Linux the whole tree gets SIGTERM, then SIGKILL after timeout."""
     if not proc:
         return
     if proc.poll() is not None:
         return
     system = platform.system().lower()
+    inspect = _proc_inspect()
     try:
         if system == "windows":
             subprocess.run(["taskkill", "/PID", str(proc.pid), "/F", "/T"], check=False,
                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elif inspect is not None:
+            left = inspect.terminate_tree([proc.pid], timeout=timeout)
+            if left:
+                print(f"[WARN] {name}: pids {left} still alive after SIGKILL.")
+            proc.wait(timeout=timeout)
         else:
             proc.terminate()
             try:
-                proc.wait(timeout=5)
+                proc.wait(timeout=timeout)
             except subprocess.TimeoutExpired:
                 proc.kill()
     except Exception:
         print(f"[WARN] Failed to terminate {name} (pid={getattr(proc, 'pid', '?')}).")
 
 
-def run_with_ngrok_cli(port: int, *, token: Optional[str], domain: Optional[str], region: Optional[str]) -> int:
-    """Start Node server and ngrok tunnel; keep running until either exits or interrupted."""
+def run_with_ngrok_cli(
+    port: int,
+    *,
+    token: Optional[str],
+    domain: Optional[str],
+    region: Optional[str],
+    watch_data: bool = False,
+    supervise: bool = False,
+    status_port: Optional[int] = None,
+    instances: int = 1,
+    sticky: bool = False,
+    cache_reports: bool = False,
+    cache_ttl: float = 300.0,
+) -> int:
+    """Start Node server and ngrok tunnel; keep running until either exits or interrupted.
+
+    supervise=True 时服务交给 tools/supervisor.py 守护（崩溃/挂起自动重启），此处只在 ngrok 退出时结束；
+    instances>1 或 cache_reports 时隧道指向 tools/cluster_proxy.py 的对外端口。
+    """
     print("\n=== Starting local server with ngrok tunnel (Ctrl+C to stop) ===")
     server_proc = None
     ngrok_proc = None
+    watcher_proc = None
+    supervisor = None
+    proxy, members = None, []
     try:
-        server_proc = start_server_background(port)
-        print(f"[INFO] Node server started (pid={server_proc.pid}), waiting for port {port}...")
+        if instances > 1 or cache_reports:
+            proxy, members = start_cluster_background(
+                port,
+                instances,
+                sticky=sticky,
+                supervise=supervise,
+                cache_reports=cache_reports,
+                cache_ttl=cache_ttl,
+                on_event=print,
+            )
+        elif supervise:
+            supervisor = make_supervisor(port, status_port=status_port, on_event=print)
+            supervisor.start_thread()
+        else:
+            server_proc = start_server_background(port)
+        if watch_data:
+            watcher_proc = start_data_watcher_background()
+        if proxy is not None:
+            print(f"[INFO] {instances} instance(s) started behind the proxy, waiting for port {port}...")
+        elif supervisor is not None:
+            print(f"[INFO] Supervisor started (status: http://127.0.0.1:{status_port}/), waiting for port {port}...")
+        else:
+            print(f"[INFO] Node server started (pid={server_proc.pid}), waiting for port {port}...")
         ok = wait_for_port(port, timeout=45)
         if not ok:
             print(f"[ERROR] Server port {port} did not open in time.")
@@ -522,11 +1262,15 @@ def run_with_ngrok_cli(port: int, *, token: Optional[str], domain: Optional[str]
 
         # Wait for either process to exit
         while True:
-            rc_server = server_proc.poll()
+            rc_server = server_proc.poll() if server_proc is not None else None
             rc_ngrok = ngrok_proc.poll()
             if rc_server is not None:
                 print(f"[INFO] Node server exited with code {rc_server}.")
                 return rc_server or 0
+            exited = next(iter(exited_members(port, members)), None)
+            if exited is not None:
+                print(f"[ERROR] {exited[0]} exited with code {exited[1]}; stopping the cluster.")
+                return exited[1] or 1
             if rc_ngrok is not None:
                 print(f"[INFO] ngrok exited with code {rc_ngrok}.")
                 return rc_ngrok or 0
@@ -535,8 +1279,61 @@ def run_with_ngrok_cli(port: int, *, token: Optional[str], domain: Optional[str]
         print("\nInterrupted by user.")
         return 0
     finally:
+        if supervisor is not None:
+            supervisor.stop()
+        stop_cluster(proxy, members)
         terminate_process(ngrok_proc, name="ngrok")
         terminate_process(server_proc, name="node server")
+        terminate_process(watcher_proc, name="data watcher")
+
+
+def run_bench(argv: list[str]) -> int:
+    """`python start_local.py bench ...`：用合成数据启动服务并压测，参数见 tools/bench_server.py。"""
+    import asyncio
+
+    import bench_server
+
+    opts = bench_server.parse_args(argv)
+    ensure_tool("node")
+    ensure_tool("npm")
+    maybe_install_server(False)
+
+    baseline = None
+    if opts.compare is not None:
+        baseline = json.loads(opts.compare.read_text(encoding="utf-8"))
+
+    data_dir, temporary = bench_server.prepare_data_dir(opts)
+    server_proc = None
+    try:
+        server_proc = start_server_background(
+            opts.port,
+            extra_env={"PORT": str(opts.port), "DATA_DIR": str(data_dir)},
+            log_path=opts.server_log,
+            quiet=True,
+        )
+        print(f"[INFO] Node server started (pid={server_proc.pid}), waiting for port {opts.port}...")
+        if not wait_for_port(opts.port, timeout=45):
+            print(f"[ERROR] Server port {opts.port} did not open in time.")
+            return 1
+        accounts = bench_server.load_accounts(data_dir)
+        if not accounts:
+            print(f"[ERROR] {data_dir}/users.json 中没有可登录的账号。")
+            return 1
+        results = asyncio.run(bench_server.run_all(opts, accounts))
+    except KeyboardInterrupt:
+        print("\nInterrupted by user.")
+        return 130
+    finally:
+        terminate_process(server_proc, name="node server")
+        bench_server.cleanup_data_dir(data_dir, temporary)
+
+    print()
+    for line in bench_server.format_results(results, baseline):
+        print(line)
+    if opts.out is not None:
+        bench_server.write_results(opts.out, opts, results)
+        print(f"[INFO] 结果已写入 {opts.out}")
+    return 1 if any(r.errors for r in results) else 0
 
 
 def parse_args() -> argparse.Namespace:
@@ -592,6 +1389,49 @@ def parse_args() -> argparse.Namespace:
         default=os.environ.get("NGROK_REGION"),
         help="ngrok 区域（留空与参考 start.py 一致）",
     )
+    parser.add_argument(
+        "--watch-data",
+        action="store_true",
+        help="在服务旁运行 tools/data_watcher.py，实时维护 data/indexes/ 下的派生索引",
+    )
+    parser.add_argument(
+        "--supervise",
+        action="store_true",
+        help="守护模式：HTTP 健康探测，崩溃或挂起时按退避自动重启，并采样进程 CPU/RSS/fd（见 tools/supervisor.py）",
+    )
+    parser.add_argument(
+        "--status-port",
+        type=int,
+        default=None,
+        help="守护模式状态接口端口（默认 --port + 100，0 表示不开启）；事件与采样另写入 logs/supervisor.log",
+    )
+    parser.add_argument(
+        "--instances",
+        type=int,
+        default=1,
+        help="集群模式：在 port+1..port+N 启动 N 个实例共享 data/，对外端口由 tools/cluster_proxy.py 负载均衡（0 = CPU 核数）",
+    )
+    parser.add_argument(
+        "--sticky",
+        action="store_true",
+        help="集群模式下按登录令牌 / 客户端 IP 固定实例",
+    )
+    parser.add_argument(
+        "--cache-reports",
+        action="store_true",
+        help="在对外端口前放 tools/cluster_proxy.py 并缓存报表 GET 响应（按令牌 sub + 查询串，data/ 变化时失效）",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=300.0,
+        help="报表缓存 TTL 秒数（默认 300）",
+    )
+    parser.add_argument(
+        "--no-log-capture",
+        action="store_true",
+        help="子进程直接输出到控制台，不经 tools/log_mux.py 写入 logs/",
+    )
     parser.add_argument(
         "--ui",
         action="store_true",
@@ -601,31 +1441,38 @@ def parse_args() -> argparse.Namespace:
 
 
 def main() -> int:
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        return run_bench(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "logs":
+        import log_mux
+
+        return log_mux.main(sys.argv[2:])
+
     args = parse_args()
+    if not args.no_log_capture:
+        start_log_mux()
 
     ensure_tool("node")
     ensure_tool("npm")
 
-    maybe_install_server(args.force_install)
-    maybe_install_web(args.force_install_web)
-    maybe_build_web(args.force_build, args.skip_build)
-
-    # Default: 无参数启动时直接显示 PyQt5 界面
-    if len(sys.argv) <= 1:
+    # UI 模式（无参数启动或 --ui）：安装/构建在界面的后台任务里执行，窗口不会卡住
+    if len(sys.argv) <= 1 or getattr(args, "ui", False):
         if not _PYQT5_AVAILABLE:
-            print("[ERROR] PyQt5 未安装，无法使用 UI 模式。请先 pip install PyQt5。")
+            flag = "UI" if len(sys.argv) <= 1 else "--ui"
+            print(f"[ERROR] PyQt5 未安装，无法使用 {flag} 模式。请先 pip install PyQt5。")
             return 1
         return run_ui(args)
 
-    # UI mode
-    if getattr(args, "ui", False):
-        if not _PYQT5_AVAILABLE:
-            print("[ERROR] PyQt5 未安装，无法使用 --ui 模式。请先 pip install PyQt5。")
-            return 1
-        return run_ui(args)
+    prepare_node_runtime(
+        force_install=args.force_install,
+        force_install_web=args.force_install_web,
+        force_build=args.force_build,
+        skip_build=args.skip_build,
+    )
 
     # CLI mode
     tunnel = (args.tunnel or "off").lower()
+    status_port = args.port + 100 if args.status_port is None else args.status_port
     if tunnel == "ngrok":
         _effective_token = args.tunnel_token or load_local_ngrok_token() or os.environ.get("NGROK_AUTHTOKEN")
         return run_with_ngrok_cli(
@@ -633,9 +1480,25 @@ def main() -> int:
             token=_effective_token,
             domain=args.tunnel_domain,
             region=args.tunnel_region,
+            watch_data=args.watch_data,
+            supervise=args.supervise,
+            status_port=status_port,
+            instances=resolve_instances(args.instances),
+            sticky=args.sticky,
+            cache_reports=args.cache_reports,
+            cache_ttl=args.cache_ttl,
         )
     else:
-        return start_server(args.port)
+        return start_server(
+            args.port,
+            watch_data=args.watch_data,
+            supervise=args.supervise,
+            status_port=status_port,
+            instances=resolve_instances(args.instances),
+            sticky=args.sticky,
+            cache_reports=args.cache_reports,
+            cache_ttl=args.cache_ttl,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线统计：一次性把 data/work_items/user/*.json 读入 NumPy 列式数组，按组织子树计算日报/周报指标。
+
+口径与 server/services/overview.js 一致：
+- 只统计启用（active !== false）的用户；主属组织取截止日（日报为当天，区间为结束日）生效的 isPrimary 记录，
+  多条时 startDate 最大者优先；
+- 非 plan 类型计为完成项（完成数、完成时长、typeCounts），plan 计为计划；
+- 日报：当天完成项 + 次日计划，当天无完成项记为缺报；
+- 区间：逐日统计，无完成项的日期计入 missingDays；
+- 指标沿组织链向上汇总到每一级祖先；没有主属组织的用户汇总到根组织。
+  组织汇总另外给出 missingUserDays（子树内所有用户缺报天数之和）。
+
+列：creatorId、orgId、workDate（自 1970-01-01 起的天数）、类型编码、durationMinutes；
+汇总通过 bincount 与「用户 × 组织」汇总矩阵的矩阵乘法完成，不再逐条、逐人循环。
+
+用法
+  python tools/analytics.py daily --date 2025-10-10
+  python tools/analytics.py range --from 2025-10-01 --to 2025-10-31 --org 4
+  python tools/analytics.py month 2025-10 --json --out 2025-10.json
+  python tools/analytics.py quarter 2025Q4
+
+依赖：numpy（pip install numpy）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # type: ignore
+    _NUMPY_AVAILABLE = True
+except Exception:
+    np = None  # type: ignore
+    _NUMPY_AVAILABLE = False
+
+from data_store import DataStore, OrgUnitsCollection, to_int
+from interval_index import MembershipIndex
+from org_closure import OrgClosure
+
+TYPE_CODES = ("done", "progress", "temp", "assist", "plan")
+COMPLETED_TYPES = TYPE_CODES[:4]
+TYPE_INDEX = {code: i for i, code in enumerate(TYPE_CODES)}
+PLAN = TYPE_INDEX["plan"]
+UNKNOWN_TYPE = len(TYPE_CODES)
+EPOCH = date(1970, 1, 1)
+UNASSIGNED_ORG = -1
+
+
+def day_ordinal(iso: str) -> int:
+    return (date.fromisoformat(iso) - EPOCH).days
+
+
+def ordinal_to_iso(ordinal: int) -> str:
+    return (EPOCH + timedelta(days=int(ordinal))).isoformat()
+
+
+def _number(value: float) -> Any:
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class WorkItemColumns:
+    """所有工作项的列式视图（每列一个 NumPy 数组，行序即文件读取顺序）。"""
+
+    __slots__ = ("creator_id", "org_id", "work_day", "type_code", "duration_minutes", "skipped")
+
+    def __init__(self, creator_id, org_id, work_day, type_code, duration_minutes, skipped: int = 0) -> None:
+        self.creator_id = creator_id
+        self.org_id = org_id
+        self.work_day = work_day
+        self.type_code = type_code
+        self.duration_minutes = duration_minutes
+        self.skipped = skipped
+
+    def __len__(self) -> int:
+        return int(self.creator_id.shape[0])
+
+    @classmethod
+    def load(cls, store: DataStore) -> "WorkItemColumns":
+        creators: List[int] = []
+        orgs: List[int] = []
+        days: List[int] = []
+        types: List[int] = []
+        minutes: List[float] = []
+        skipped = 0
+        for file_user_id, collection in store.iter_work_item_collections():
+            for item in collection.get("items", []):
+                work_date = item.get("workDate")
+                try:
+                    day = day_ordinal(work_date)
+                except (TypeError, ValueError):
+                    skipped += 1
+                    continue
+                creator = to_int(item.get("creatorId"))
+                org = to_int(item.get("orgId"))
+                creators.append(creator if creator is not None else file_user_id)
+                orgs.append(org if org is not None else UNASSIGNED_ORG)
+                days.append(day)
+                types.append(TYPE_INDEX.get(item.get("type"), UNKNOWN_TYPE))
+                duration = item.get("durationMinutes")
+                try:
+                    minutes.append(float(duration) if duration is not None else 0.0)
+                except (TypeError, ValueError):
+                    minutes.append(0.0)
+        return cls(
+            np.array(creators, dtype=np.int64),
+            np.array(orgs, dtype=np.int64),
+            np.array(days, dtype=np.int32),
+            np.array(types, dtype=np.int8),
+            np.array(minutes, dtype=np.float64),
+            skipped,
+        )
+
+
+class OrgTree:
+    """组织树：祖先链（含自身）与根节点，语义同 overview.js 的 buildOrgLookup；链取自 org_closure 索引。"""
+
+    def __init__(self, orgs: OrgUnitsCollection, closure: OrgClosure) -> None:
+        self.orgs = orgs
+        self.closure = closure
+        self.ids: List[int] = sorted(closure.nodes)
+        self.index: Dict[int, int] = {oid: i for i, oid in enumerate(self.ids)}
+        self.roots: List[int] = closure.roots
+
+    def chain(self, org_id: Optional[int]) -> List[int]:
+        return self.closure.ancestors(org_id)
+
+
+class Analytics:
+    def __init__(self, store: Optional[DataStore] = None) -> None:
+        if not _NUMPY_AVAILABLE:
+            raise RuntimeError("numpy 未安装，请先 pip install numpy")
+        self.store = store or DataStore()
+        self.columns = WorkItemColumns.load(self.store)
+        self.tree = OrgTree(self.store.org_units, OrgClosure.ensure(self.store))
+        self.memberships = MembershipIndex(self.store.memberships)
+
+    # --- 用户与汇总矩阵 ---
+
+    def _users(
+        self, as_of: str, org_id: Optional[int], *, unknown_to_roots: bool
+    ) -> Tuple[List[Any], List[Optional[int]], "np.ndarray"]:
+        """返回 (用户记录, 主属组织, 汇总矩阵)；矩阵 [i, j] 表示第 i 个用户计入 tree.ids[j]。
+
+        主属组织不在 org_units 中时：日报汇总到根组织（unknown_to_roots），周报不汇总，与 overview.js 相同。
+        """
+        users = sorted((u for u in self.store.users if u.id is not None and u.active), key=lambda u: (u.name, u.id))
+        primary = self.memberships.primary_orgs_at(as_of, [u.id for u in users])
+        org_ids = [primary[u.id] for u in users]
+        chains = []
+        for oid in org_ids:
+            chain = self.tree.chain(oid)
+            chains.append(chain if chain or (oid is not None and not unknown_to_roots) else self.tree.roots)
+        if org_id is not None:
+            keep = [i for i, chain in enumerate(chains) if org_id in chain]
+            users = [users[i] for i in keep]
+            org_ids = [org_ids[i] for i in keep]
+            chains = [chains[i] for i in keep]
+        rollup = np.zeros((len(users), len(self.tree.ids)), dtype=np.int64)
+        for row, chain in enumerate(chains):
+            for oid in chain:
+                rollup[row, self.tree.index[oid]] = 1
+        return users, org_ids, rollup
+
+    def _per_day(self, user_ids: Sequence[int], start: int, days: int) -> Dict[str, "np.ndarray"]:
+        """按 (用户, 日期) 汇总：completed/minutes/plans 为 (n, days)，types 为 (n, 类型数)。"""
+        n = len(user_ids)
+        cols = self.columns
+        ids = np.asarray(user_ids, dtype=np.int64)
+        empty = {
+            "completed": np.zeros((n, days), dtype=np.int64),
+            "minutes": np.zeros((n, days), dtype=np.float64),
+            "plans": np.zeros((n, days), dtype=np.int64),
+            "types": np.zeros((n, len(COMPLETED_TYPES)), dtype=np.int64),
+        }
+        if n == 0 or len(cols) == 0:
+            return empty
+
+        order = np.argsort(ids, kind="stable")
+        pos = np.searchsorted(ids, cols.creator_id, sorter=order)
+        pos = np.clip(pos, 0, n - 1)
+        row = order[pos]
+        offset = cols.work_day.astype(np.int64) - start
+        selected = (ids[row] == cols.creator_id) & (offset >= 0) & (offset < days)
+        row, offset = row[selected], offset[selected]
+        type_code = cols.type_code[selected].astype(np.int64)
+        minutes = cols.duration_minutes[selected]
+
+        is_plan = type_code == PLAN
+        done = ~is_plan
+        cell = row * days + offset
+        size = n * days
+        width = UNKNOWN_TYPE + 1
+        return {
+            "completed": np.bincount(cell[done], minlength=size).reshape(n, days),
+            "minutes": np.bincount(cell[done], weights=minutes[done], minlength=size).reshape(n, days),
+            "plans": np.bincount(cell[is_plan], minlength=size).reshape(n, days),
+            "types": np.bincount(row * width + type_code, minlength=n * width).reshape(n, width)[:, : len(COMPLETED_TYPES)],
+        }
+
+    def _org_rows(self, rollup: "np.ndarray", metrics: Dict[str, "np.ndarray"], build) -> List[Dict[str, Any]]:
+        user_count = rollup.sum(axis=0)
+        totals = {key: rollup.T @ value for key, value in metrics.items()}
+        rows = []
+        for j, oid in enumerate(self.tree.ids):
+            if user_count[j] == 0:
+                continue
+            org = self.tree.orgs.by_id[oid]
+            rows.append({
+                "orgId": oid,
+                "parentId": org.parent_id,
+                "name": org.name or "未分配组织",
+                **build(int(user_count[j]), {key: value[j] for key, value in totals.items()}),
+            })
+        rows.sort(key=lambda r: (r["parentId"] if r["parentId"] is not None else -1, r["name"]))
+        return rows
+
+    def _org_name(self, org_id: Optional[int]) -> Optional[str]:
+        org = self.tree.orgs.get(org_id) if org_id is not None else None
+        return org.name if org is not None else None
+
+    # --- 报表 ---
+
+    def daily(self, day: str, *, org_id: Optional[int] = None) -> Dict[str, Any]:
+        start = day_ordinal(day)
+        next_day = ordinal_to_iso(start + 1)
+        users, org_ids, rollup = self._users(day, org_id, unknown_to_roots=True)
+        grid = self._per_day([u.id for u in users], start, 2)
+
+        completed = grid["completed"][:, 0]
+        minutes = grid["minutes"][:, 0]
+        plans = grid["plans"][:, 1]
+        per_user = {
+            "completedUsers": (completed > 0).astype(np.int64),
+            "completedCount": completed,
+            "completedMinutes": minutes,
+            "planUsers": (plans > 0).astype(np.int64),
+            "planCount": plans,
+            "missingUsers": (completed == 0).astype(np.int64),
+        }
+
+        def build(user_count: int, sums: Dict[str, Any]) -> Dict[str, Any]:
+            return {"metrics": {"userCount": user_count, **{key: _number(value) for key, value in sums.items()}}}
+
+        return {
+            "ok": True,
+            "date": day,
+            "nextDate": next_day,
+            "scope": "all" if org_id is None else f"org:{org_id}",
+            "totals": build(len(users), {key: value.sum() for key, value in per_user.items()})["metrics"],
+            "users": [
+                {
+                    "userId": user.id,
+                    "name": user.name or None,
+                    "orgId": oid,
+                    "orgName": self._org_name(oid),
+                    "metrics": {
+                        "completedCount": int(completed[i]),
+                        "completedMinutes": _number(minutes[i]),
+                        "planCount": int(plans[i]),
+                        "hasPlan": bool(plans[i] > 0),
+                        "missing": bool(completed[i] == 0),
+                    },
+                }
+                for i, (user, oid) in enumerate(zip(users, org_ids))
+            ],
+            "orgs": self._org_rows(rollup, per_user, build),
+        }
+
+    def range(self, start_day: str, end_day: str, *, org_id: Optional[int] = None) -> Dict[str, Any]:
+        start, end = day_ordinal(start_day), day_ordinal(end_day)
+        if start > end:
+            raise ValueError("invalid range")
+        days = end - start + 1
+        users, org_ids, rollup = self._users(end_day, org_id, unknown_to_roots=False)
+        grid = self._per_day([u.id for u in users], start, days)
+
+        completed = grid["completed"].sum(axis=1)
+        minutes = grid["minutes"].sum(axis=1)
+        plans = grid["plans"].sum(axis=1)
+        missing = grid["completed"] == 0
+        per_user = {
+            "completedUsers": (completed > 0).astype(np.int64),
+            "planUsers": (plans > 0).astype(np.int64),
+            "completedCount": completed,
+            "completedMinutes": minutes,
+            "planCount": plans,
+            "missingUserDays": missing.sum(axis=1),
+            "types": grid["types"],
+        }
+
+        def build(user_count: int, sums: Dict[str, Any]) -> Dict[str, Any]:
+            types = sums.pop("types")
+            summary = {"userCount": user_count, **{key: _number(value) for key, value in sums.items()}}
+            summary["typeCounts"] = {code: int(types[k]) for k, code in enumerate(COMPLETED_TYPES)}
+            return {"summary": summary}
+
+        return {
+            "ok": True,
+            "range": {"start": start_day, "end": end_day},
+            "scope": "all" if org_id is None else f"org:{org_id}",
+            "totals": build(len(users), {key: value.sum(axis=0) for key, value in per_user.items()})["summary"],
+            "users": [
+                {
+                    "userId": user.id,
+                    "name": user.name or None,
+                    "employeeNo": user.employee_no,
+                    "orgId": oid,
+                    "orgName": self._org_name(oid),
+                    "summary": {
+                        "completedCount": int(completed[i]),
+                        "completedMinutes": _number(minutes[i]),
+                        "typeCounts": {code: int(grid["types"][i, k]) for k, code in enumerate(COMPLETED_TYPES)},
+                        "planCount": int(plans[i]),
+                        "missingDays": [ordinal_to_iso(start + d) for d in np.flatnonzero(missing[i])],
+                    },
+                }
+                for i, (user, oid) in enumerate(zip(users, org_ids))
+            ],
+            "orgs": self._org_rows(rollup, per_user, build),
+        }
+
+
+def month_range(value: str) -> Tuple[str, str]:
+    first = date.fromisoformat(f"{value}-01")
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.isoformat(), (following - timedelta(days=1)).isoformat()
+
+
+def quarter_range(value: str) -> Tuple[str, str]:
+    match = re.fullmatch(r"(\d{4})-?[Qq]([1-4])", value.strip())
+    if not match:
+        raise ValueError("季度格式应为 2025Q4")
+    year, quarter = int(match.group(1)), int(match.group(2))
+    start, _ = month_range(f"{year}-{quarter * 3 - 2:02d}")
+    _, end = month_range(f"{year}-{quarter * 3:02d}")
+    return start, end
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    if "date" in report:
+        print(f"日报 {report['date']}（计划取 {report['nextDate']}），范围 {report['scope']}")
+        header = f"{'组织':<16}{'人数':>6}{'已填':>6}{'缺报':>6}{'完成项':>8}{'时长(分)':>10}{'有计划':>8}"
+        rows = [(o["name"], o["metrics"]) for o in report["orgs"]] + [("合计", report["totals"])]
+        print(header)
+        for name, m in rows:
+            print(
+                f"{name:<16}{m['userCount']:>6}{m['completedUsers']:>6}{m['missingUsers']:>6}"
+                f"{m['completedCount']:>8}{m['completedMinutes']:>10}{m['planUsers']:>8}"
+            )
+        return
+    rng = report["range"]
+    print(f"区间 {rng['start']} ~ {rng['end']}，范围 {report['scope']}")
+    header = f"{'组织':<16}{'人数':>6}{'已填':>6}{'缺报人天':>8}{'完成项':>8}{'时长(分)':>10}  done/progress/temp/assist"
+    rows = [(o["name"], o["summary"]) for o in report["orgs"]] + [("合计", report["totals"])]
+    print(header)
+    for name, s in rows:
+        types = "/".join(str(s["typeCounts"][code]) for code in COMPLETED_TYPES)
+        print(
+            f"{name:<16}{s['userCount']:>6}{s['completedUsers']:>6}{s['missingUserDays']:>8}"
+            f"{s['completedCount']:>8}{s['completedMinutes']:>10}  {types}"
+        )
+
+
+def _valid_day(value: str) -> str:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("日期必须为 YYYY-MM-DD")
+    return value
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--org", type=int, default=None, help="只统计该组织子树内的用户")
+    common.add_argument("--json", action="store_true", help="输出完整 JSON")
+    common.add_argument("--out", type=Path, default=None, help="把 JSON 写入文件")
+
+    parser = argparse.ArgumentParser(description="按组织子树离线统计工作项")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("daily", parents=[common], help="日报口径")
+    p.add_argument("--date", type=_valid_day, default=date.today().isoformat())
+    p = sub.add_parser("range", parents=[common], help="任意日期区间（周报口径）")
+    p.add_argument("--from", dest="start", type=_valid_day, required=True)
+    p.add_argument("--to", dest="end", type=_valid_day, required=True)
+    p = sub.add_parser("month", parents=[common], help="整月，如 2025-10")
+    p.add_argument("month")
+    p = sub.add_parser("quarter", parents=[common], help="整季度，如 2025Q4")
+    p.add_argument("quarter")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if not _NUMPY_AVAILABLE:
+        print("[ERROR] numpy 未安装，无法使用离线统计。请先 pip install numpy。")
+        return 1
+    try:
+        if args.command == "month":
+            start, end = month_range(args.month)
+        elif args.command == "quarter":
+            start, end = quarter_range(args.quarter)
+        elif args.command == "range":
+            start, end = args.start, args.end
+        else:
+            start = end = args.date
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    analytics = Analytics()
+    try:
+        report = analytics.daily(start, org_id=args.org) if args.command == "daily" else analytics.range(start, end, org_id=args.org)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    if args.out:
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"[INFO] 已写入 {args.out}")
+    if args.json and not args.out:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif not args.json:
+        print_report(report)
+    if analytics.columns.skipped:
+        print(f"[WARN] 跳过 {analytics.columns.skipped} 条 workDate 无效的工作项")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+审计日志归档：把 data/audit_logs.json 中较早的记录滚动到按日期分区的压缩段文件，
+只在 audit_logs.json 中保留最近几天的「热」窗口。
+
+server 每次登录、查询、报表都会整份读写 audit_logs.json，loginRateLimited 也会全量扫描它；
+热窗口越小，这些请求越快。meta.lastId 原样保留，server 继续自增分配 id。
+
+段文件：data/audit_archive/YYYY-MM/YYYY-MM-DD.jsonl.gz（每行一条 JSON，按 createdAt 的 UTC 日期分区）。
+段文件整体原子重写；中途中断后重跑会按 id 去重，不会重复归档。
+
+用法
+  python tools/audit_archive.py compact --keep-days 7 [--dry-run]
+  python tools/audit_archive.py query --from 2025-10-01 --to 2025-10-10 --actor 2 --action login
+  python tools/audit_archive.py query --from 2025-10-01 --json > logs.jsonl
+  python tools/audit_archive.py stats
+
+注意：server 对 audit_logs.json 是「读-改-写」，建议在访问低谷执行 compact；
+写回前会确认文件在计算期间未被改动，否则重新读取后再试。
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from data_store import DATA_DIR, read_collection
+from json_writer import atomic_write, file_lock, write_json
+
+AUDIT_FILE = DATA_DIR / "audit_logs.json"
+ARCHIVE_DIR = DATA_DIR / "audit_archive"
+MAX_ATTEMPTS = 3
+
+Entry = Dict[str, Any]
+
+
+def entry_day(entry: Entry) -> Optional[str]:
+    created = entry.get("createdAt")
+    if not isinstance(created, str) or len(created) < 10:
+        return None
+    day = created[:10]
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        return None
+    return day
+
+
+def segment_path(day: str, archive_dir: Path = ARCHIVE_DIR) -> Path:
+    return archive_dir / day[:7] / f"{day}.jsonl.gz"
+
+
+def iter_segment(path: Path) -> Iterator[Entry]:
+    """逐行解压读取段文件，不把整个段载入内存。"""
+    try:
+        fh = gzip.open(path, "rt", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_segment_paths(archive_dir: Path, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Tuple[str, Path]]:
+    """按日期顺序产出 (day, path)，只包含与 [start, end] 重叠的段。"""
+    if not archive_dir.exists():
+        return
+    for month_dir in sorted(p for p in archive_dir.iterdir() if p.is_dir()):
+        month = month_dir.name
+        if (start and month < start[:7]) or (end and month > end[:7]):
+            continue
+        for path in sorted(month_dir.glob("*.jsonl.gz")):
+            day = path.name[:10]
+            if (start and day < start) or (end and day > end):
+                continue
+            yield day, path
+
+
+def _write_segment(path: Path, entries: List[Entry]) -> None:
+    with atomic_write(path, "wb") as raw:
+        with gzip.GzipFile(filename=path.name[:-3], mode="wb", fileobj=raw, compresslevel=9, mtime=0) as gz:
+            text = io.TextIOWrapper(gz, encoding="utf-8", newline="\n")
+            for entry in entries:
+                text.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+                text.write("\n")
+            text.flush()
+            text.detach()
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def compact(
+    *,
+    keep_days: int,
+    audit_file: Path = AUDIT_FILE,
+    archive_dir: Path = ARCHIVE_DIR,
+    today: Optional[date] = None,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """把 createdAt 早于 (today - keep_days) 的记录移入段文件，返回统计。"""
+    cutoff = ((today or datetime.now(timezone.utc).date()) - timedelta(days=keep_days)).isoformat()
+    for _attempt in range(MAX_ATTEMPTS):
+        before = _stat_key(audit_file)
+        data = read_collection(audit_file)
+        hot: List[Entry] = []
+        cold: Dict[str, List[Entry]] = {}
+        for entry in data["items"]:
+            day = entry_day(entry)
+            if day is not None and day < cutoff:
+                cold.setdefault(day, []).append(entry)
+            else:
+                hot.append(entry)
+        stats = {"archived": sum(len(v) for v in cold.values()), "kept": len(hot), "segments": len(cold)}
+        if dry_run or not cold:
+            return stats
+
+        # 先写段文件，再缩短热文件：中途中断最多留下重复，下次按 id 去重
+        for day, entries in sorted(cold.items()):
+            path = segment_path(day, archive_dir)
+            existing = list(iter_segment(path))
+            seen = {e.get("id") for e in existing}
+            fresh = [e for e in entries if e.get("id") not in seen]
+            if fresh:
+                merged = existing + fresh
+                merged.sort(key=lambda e: (e.get("createdAt") or "", e.get("id") or 0))
+                _write_segment(path, merged)
+
+        with file_lock(audit_file):
+            if _stat_key(audit_file) != before:
+                continue  # server 在此期间写过，重新读取
+            write_json(audit_file, {**data, "items": hot}, lock=False)
+        return stats
+    raise RuntimeError(f"{audit_file} 持续被改写，{MAX_ATTEMPTS} 次尝试均未完成，请在访问低谷重试")
+
+
+def iter_entries(
+    *,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    predicate: Optional[Callable[[Entry], bool]] = None,
+    audit_file: Path = AUDIT_FILE,
+    archive_dir: Path = ARCHIVE_DIR,
+) -> Iterator[Entry]:
+    """先按日期顺序惰性扫描段文件，再扫描热文件；同一 id 只产出一次。"""
+    archived_days: Set[str] = set()
+    for day, path in iter_segment_paths(archive_dir, start, end):
+        archived_days.add(day)
+        for entry in iter_segment(path):
+            if predicate is None or predicate(entry):
+                yield entry
+
+    segment_ids: Dict[str, Set[Any]] = {}
+    for entry in read_collection(audit_file)["items"]:
+        day = entry_day(entry)
+        if day is not None and ((start and day < start) or (end and day > end)):
+            continue
+        if day in archived_days:
+            # compact 中断时热文件里可能还留着已归档的记录
+            if day not in segment_ids:
+                segment_ids[day] = {e.get("id") for e in iter_segment(segment_path(day, archive_dir))}
+            if entry.get("id") in segment_ids[day]:
+                continue
+        if predicate is None or predicate(entry):
+            yield entry
+
+
+def _build_predicate(args: argparse.Namespace) -> Callable[[Entry], bool]:
+    def predicate(entry: Entry) -> bool:
+        if args.actor is not None and entry.get("actorUserId") != args.actor:
+            return False
+        if args.action and entry.get("action") != args.action:
+            return False
+        if args.object_type and entry.get("objectType") != args.object_type:
+            return False
+        return True
+
+    return predicate
+
+
+def _valid_day(value: str) -> str:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("日期必须为 YYYY-MM-DD")
+    return value
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="审计日志归档与查询")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("compact", help="把较早的记录移入按日期分区的压缩段文件")
+    p.add_argument("--keep-days", type=int, default=7, help="audit_logs.json 中保留最近 N 天（默认 7）")
+    p.add_argument("--dry-run", action="store_true", help="只统计，不写文件")
+
+    p = sub.add_parser("query", help="按条件查询（段文件 + 热文件）")
+    p.add_argument("--from", dest="start", type=_valid_day, default=None)
+    p.add_argument("--to", dest="end", type=_valid_day, default=None)
+    p.add_argument("--actor", type=int, default=None, help="actorUserId")
+    p.add_argument("--action", default=None)
+    p.add_argument("--object-type", default=None)
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--json", action="store_true", help="以 JSON Lines 输出")
+
+    sub.add_parser("stats", help="按月份统计段文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.command == "compact":
+        stats = compact(keep_days=args.keep_days, dry_run=args.dry_run)
+        prefix = "[dry-run] " if args.dry_run else ""
+        print(f"{prefix}归档 {stats['archived']} 条到 {stats['segments']} 个日期段，audit_logs.json 保留 {stats['kept']} 条。")
+        return 0
+
+    if args.command == "query":
+        count = 0
+        for entry in iter_entries(start=args.start, end=args.end, predicate=_build_predicate(args)):
+            if args.json:
+                sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            else:
+                detail = f" detail={json.dumps(entry['detail'], ensure_ascii=False)}" if entry.get("detail") is not None else ""
+                print(
+                    f"{entry.get('createdAt', '?')}  #{entry.get('id')} actor={entry.get('actorUserId')} "
+                    f"action={entry.get('action')} objectType={entry.get('objectType')}{detail}"
+                )
+            count += 1
+            if args.limit is not None and count >= args.limit:
+                break
+        if not args.json:
+            print(f"共 {count} 条。")
+        return 0
+
+    if args.command == "stats":
+        months: Dict[str, List[int]] = {}
+        for day, path in iter_segment_paths(ARCHIVE_DIR):
+            bucket = months.setdefault(day[:7], [0, 0, 0])
+            bucket[0] += 1
+            bucket[1] += sum(1 for _ in iter_segment(path))
+            bucket[2] += os.path.getsize(path)
+        for month, (segments, entries, size) in sorted(months.items()):
+            print(f"{month}  段 {segments:>3}  记录 {entries:>7}  {size / 1024:.1f} KB")
+        hot = read_collection(AUDIT_FILE)
+        print(f"audit_logs.json  记录 {len(hot['items'])}  lastId {hot['meta'].get('lastId')}")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
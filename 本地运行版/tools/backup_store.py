@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tools/ 共用的去重备份仓库，替代每次整份复制的 `*.bak_YYYYMMDD_HHMMSS`。
+
+存储结构（默认在 `backups/`，不占用 data/ 卷）：
+- `index.json`：`{ meta: { lastId }, items: [快照...], objects: { sha256: {...} } }`；
+- `objects/ab/cdef...`：按内容 sha256 寻址、zlib 压缩的对象。
+  对象可以是完整内容，也可以是相对同一文件上一份快照的行级增量（delta 链，长度有上限）。
+  内容相同的快照只登记一次，不再产生新对象。
+
+用法
+  python tools/backup_store.py snapshot data/user_org_memberships.json --note "调整前"
+  python tools/backup_store.py list [--source data/user_org_memberships.json]
+  python tools/backup_store.py restore 12 [--to /tmp/restore.json]
+  python tools/backup_store.py prune --keep-last 20 --keep-days 30
+  python tools/backup_store.py import-legacy --delete   # 收编 data/ 下已有的 .bak_ 文件
+  python tools/backup_store.py verify
+  python tools/backup_store.py stats
+
+在其它脚本中：
+  from backup_store import snapshot_file, snapshot_files
+  snapshot_file(path, note="membership_batch")
+  snapshot_files(paths, note="import_work_items")   # 多个文件，index.json 只写一次
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import marshal
+import re
+import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from data_store import DATA_DIR, ROOT, read_collection
+from json_writer import file_lock, write_bytes, write_json
+
+PACK_DIR = ROOT / "backups"
+MAX_CHAIN = 16
+# 超过该大小的文件不尝试行级 delta，直接存完整压缩内容
+MAX_DELTA_SOURCE = 8 * 1024 * 1024
+# index.json 的读-改-写持有 index.json.lock；大文件的 delta 与压缩也在锁内完成
+INDEX_LOCK_TIMEOUT = 60.0
+LEGACY_PATTERN = re.compile(r"^(?P<source>.+)\.bak_(?P<ts>\d{8}_\d{6})$")
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _make_delta(base: bytes, content: bytes) -> bytes:
+    """行级 delta，线性时间：以 base 中只出现一次的行为锚点，向后延伸连续相同的行。
+
+    `},` 之类的重复行只会作为延伸的一部分被复制，不作为锚点；找不到锚点的行以字面量保存。
+    结果不一定最短，但对「改了几条记录」的 JSON 与 SequenceMatcher 相差无几。
+    """
+    base_lines = base.splitlines(keepends=True)
+    new_lines = content.splitlines(keepends=True)
+    anchors: Dict[bytes, int] = {}
+    for i, line in enumerate(base_lines):
+        anchors[line] = -1 if line in anchors else i
+    ops: List[Any] = []
+    literal: List[bytes] = []
+    j, cursor = 0, -1  # cursor：上一段复制在 base 中的结尾，优先从这里继续
+    while j < len(new_lines):
+        line = new_lines[j]
+        if 0 <= cursor < len(base_lines) and base_lines[cursor] == line:
+            start = cursor
+        else:
+            start = anchors.get(line, -1)
+        if start < 0:
+            literal.append(line)
+            j += 1
+            cursor = -1
+            continue
+        end = start
+        while end < len(base_lines) and j < len(new_lines) and base_lines[end] == new_lines[j]:
+            end += 1
+            j += 1
+        if literal:
+            ops.append(b"".join(literal))
+            literal = []
+        if ops and isinstance(ops[-1], tuple) and ops[-1][1] == start:
+            ops[-1] = (ops[-1][0], end)
+        else:
+            ops.append((start, end))
+        cursor = end
+    if literal:
+        ops.append(b"".join(literal))
+    return marshal.dumps(ops)
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    base_lines = base.splitlines(keepends=True)
+    out: List[bytes] = []
+    for op in marshal.loads(delta):
+        if isinstance(op, bytes):
+            out.append(op)
+        else:
+            out.extend(base_lines[op[0]:op[1]])
+    return b"".join(out)
+
+
+class BackupStore:
+    def __init__(self, pack_dir: Path = PACK_DIR) -> None:
+        self.pack_dir = Path(pack_dir)
+        self.index_path = self.pack_dir / "index.json"
+        self.reload()
+
+    def reload(self) -> None:
+        self.index = read_collection(self.index_path)
+        self.index.setdefault("objects", {})
+
+    @property
+    def snapshots(self) -> List[Dict[str, Any]]:
+        return self.index["items"]
+
+    @property
+    def objects(self) -> Dict[str, Dict[str, Any]]:
+        return self.index["objects"]
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """持有 index.json.lock 完成一次读-改-写：先重读最新索引（合并其它进程的登记），正常结束时写回。"""
+        with file_lock(self.index_path, timeout=INDEX_LOCK_TIMEOUT):
+            self.reload()
+            yield
+            write_json(self.index_path, self.index, lock=False)
+
+    def _object_path(self, sha: str) -> Path:
+        return self.pack_dir / "objects" / sha[:2] / sha[2:]
+
+    def _write_object(self, sha: str, blob: bytes) -> None:
+        write_bytes(self._object_path(sha), blob)
+
+    def read_object(self, sha: str) -> bytes:
+        """还原对象内容（沿 delta 链回溯），并校验 sha256。"""
+        chain = []
+        cursor: Optional[str] = sha
+        while cursor is not None:
+            info = self.objects.get(cursor)
+            if info is None:
+                raise KeyError(f"object {cursor} missing from index")
+            chain.append((cursor, info))
+            cursor = info.get("base")
+        content = b""
+        for obj_sha, info in reversed(chain):
+            blob = zlib.decompress(self._object_path(obj_sha).read_bytes())
+            content = blob if info["kind"] == "full" else _apply_delta(content, blob)
+        if hashlib.sha256(content).hexdigest() != sha:
+            raise ValueError(f"object {sha} failed checksum")
+        return content
+
+    @staticmethod
+    def source_key(path: Path) -> str:
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(ROOT).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    @staticmethod
+    def _order(entry: Dict[str, Any]) -> tuple:
+        # 按 createdAt 排序而不是 id：import-legacy 收编的旧备份 id 较大但时间更早
+        return entry["createdAt"], int(entry["id"])
+
+    def latest(self, source: str, *, before: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """source 最近的一份快照；给出 before 时只看 createdAt 不晚于它的。"""
+        entries = [e for e in self.snapshots if e["source"] == source and (before is None or e["createdAt"] <= before)]
+        return max(entries, key=self._order, default=None)
+
+    def _store_object(self, sha: str, content: bytes, base_sha: Optional[str]) -> None:
+        if sha in self.objects:
+            return
+        full_blob = zlib.compress(content, 9)
+        kind, blob, base, depth = "full", full_blob, None, 0
+        base_info = self.objects.get(base_sha) if base_sha else None
+        if base_info is not None and base_info["depth"] < MAX_CHAIN and len(content) <= MAX_DELTA_SOURCE:
+            delta_blob = zlib.compress(_make_delta(self.read_object(base_sha), content), 9)
+            if len(delta_blob) < len(full_blob) // 2:
+                kind, blob, base, depth = "delta", delta_blob, base_sha, base_info["depth"] + 1
+        self._write_object(sha, blob)
+        self.objects[sha] = {"kind": kind, "base": base, "depth": depth, "size": len(content), "stored": len(blob)}
+
+    def snapshot(self, path: Path, *, note: str = "", created_at: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """为文件登记一份快照；与该文件最近一份快照内容相同时直接返回那一份。文件不存在返回 None。"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        content = path.read_bytes()
+        with self._locked():
+            return self._register(self.source_key(path), content, note=note, created_at=created_at)
+
+    def snapshot_many(self, paths: List[Path], *, note: str = "") -> List[Dict[str, Any]]:
+        """批量登记快照，index.json 只写一次；不存在的文件跳过。"""
+        existing = [Path(path) for path in paths if Path(path).exists()]
+        if not existing:
+            return []
+        with self._locked():
+            return [self._register(self.source_key(path), path.read_bytes(), note=note, created_at=None) for path in existing]
+
+    def _register(self, source: str, content: bytes, *, note: str, created_at: Optional[str]) -> Dict[str, Any]:
+        sha = hashlib.sha256(content).hexdigest()
+        previous = self.latest(source, before=created_at)
+        if previous is not None and previous["sha256"] == sha:
+            return previous
+        self._store_object(sha, content, previous["sha256"] if previous else None)
+        meta = self.index["meta"]
+        meta["lastId"] = int(meta.get("lastId") or 0) + 1
+        entry = {
+            "id": meta["lastId"],
+            "source": source,
+            "sha256": sha,
+            "size": len(content),
+            "createdAt": created_at or utc_now_iso(),
+            "note": note,
+        }
+        self.snapshots.append(entry)
+        return entry
+
+    def get(self, snapshot_id: int) -> Dict[str, Any]:
+        for entry in self.snapshots:
+            if int(entry["id"]) == int(snapshot_id):
+                return entry
+        raise KeyError(f"snapshot #{snapshot_id} not found")
+
+    def restore(self, snapshot_id: int, target: Optional[Path] = None) -> Path:
+        entry = self.get(snapshot_id)
+        content = self.read_object(entry["sha256"])
+        dest = Path(target) if target else ROOT / entry["source"]
+        if target is None and dest.exists():
+            # 覆盖前先给当前内容留一份快照，restore 本身也可以撤销
+            self.snapshot(dest, note=f"before restore #{snapshot_id}")
+        write_bytes(dest, content)
+        return dest
+
+    def prune(self, *, keep_last: int, keep_days: Optional[int], source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按文件分别保留最近 keep_last 份及 keep_days 天内的快照，其余删除并回收对象。"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=keep_days) if keep_days is not None else None
+        with self._locked():
+            return self._prune(keep_last=keep_last, cutoff=cutoff, source=source)
+
+    def _prune(self, *, keep_last: int, cutoff: Optional[datetime], source: Optional[str]) -> List[Dict[str, Any]]:
+        by_source: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self.snapshots:
+            by_source.setdefault(entry["source"], []).append(entry)
+        removed = []
+        kept_ids: Set[int] = set()
+        for src, entries in by_source.items():
+            entries.sort(key=self._order)
+            for pos, entry in enumerate(entries):
+                recent = pos >= len(entries) - max(1, keep_last)
+                fresh = cutoff is not None and _parse_iso(entry["createdAt"]) >= cutoff
+                if (source is not None and src != source) or recent or fresh:
+                    kept_ids.add(int(entry["id"]))
+                else:
+                    removed.append(entry)
+        if removed:
+            self.index["items"] = [e for e in self.snapshots if int(e["id"]) in kept_ids]
+            self._gc()
+        return removed
+
+    def gc(self) -> int:
+        """删除不再被任何快照（含 delta 链上的基底）引用的对象。"""
+        with self._locked():
+            return self._gc()
+
+    def _gc(self) -> int:
+        live: Set[str] = set()
+        for entry in self.snapshots:
+            cursor: Optional[str] = entry["sha256"]
+            while cursor is not None and cursor not in live:
+                live.add(cursor)
+                cursor = self.objects.get(cursor, {}).get("base")
+        dead = [sha for sha in self.objects if sha not in live]
+        for sha in dead:
+            self.objects.pop(sha)
+            try:
+                self._object_path(sha).unlink()
+            except FileNotFoundError:
+                pass
+        return len(dead)
+
+    def verify(self) -> List[str]:
+        problems = []
+        for entry in self.snapshots:
+            try:
+                self.read_object(entry["sha256"])
+            except (KeyError, ValueError, OSError, zlib.error) as e:
+                problems.append(f"#{entry['id']} {entry['source']}: {e}")
+        return problems
+
+    def import_legacy(self, directory: Path, *, delete: bool = False) -> List[Path]:
+        """按时间顺序收编 `<file>.bak_YYYYMMDD_HHMMSS`，createdAt 取自文件名。
+
+        可重复执行：(source, sha256, createdAt) 已登记的文件不再登记（仍会计入返回值，--delete 时一并删除）。
+        """
+        found = []
+        for path in directory.iterdir():
+            match = LEGACY_PATTERN.match(path.name)
+            if match and path.is_file():
+                found.append((match.group("ts"), match.group("source"), path))
+        imported = []
+        with self._locked():
+            known = {(e["source"], e["sha256"], e["createdAt"]) for e in self.snapshots}
+            for ts, source_name, path in sorted(found):
+                local = datetime.strptime(ts, "%Y%m%d_%H%M%S").astimezone()
+                created_at = local.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+                source = self.source_key(path.with_name(source_name))
+                content = path.read_bytes()
+                if (source, hashlib.sha256(content).hexdigest(), created_at) not in known:
+                    self._register(source, content, note=f"legacy {path.name}", created_at=created_at)
+                imported.append(path)
+        if delete:
+            for path in imported:
+                path.unlink()
+        return imported
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "snapshots": len(self.snapshots),
+            "objects": len(self.objects),
+            "deltaObjects": sum(1 for o in self.objects.values() if o["kind"] == "delta"),
+            "logicalBytes": sum(int(e["size"]) for e in self.snapshots),
+            "storedBytes": sum(int(o["stored"]) for o in self.objects.values()),
+        }
+
+
+def snapshot_file(path: Path, *, note: str = "") -> Optional[Dict[str, Any]]:
+    """供其它工具在覆盖写入前调用。"""
+    return BackupStore().snapshot(path, note=note)
+
+
+def snapshot_files(paths: List[Path], *, note: str = "") -> List[Dict[str, Any]]:
+    """一次覆盖写入多个文件前调用。"""
+    return BackupStore().snapshot_many(paths, note=note)
+
+
+def _format_size(n: int) -> str:
+    return f"{n / 1024:.1f} KB" if n >= 1024 else f"{n} B"
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="去重备份仓库（backups/）")
+    parser.add_argument("--pack-dir", type=Path, default=PACK_DIR, help="仓库目录（默认 backups/）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("snapshot", help="为文件登记快照")
+    p.add_argument("files", nargs="+", type=Path)
+    p.add_argument("--note", default="")
+
+    p = sub.add_parser("list", help="列出快照")
+    p.add_argument("--source", type=Path, default=None)
+
+    p = sub.add_parser("restore", help="还原快照（默认覆盖原文件，覆盖前自动快照当前内容）")
+    p.add_argument("id", type=int)
+    p.add_argument("--to", type=Path, default=None)
+
+    p = sub.add_parser("prune", help="按保留策略清理快照并回收对象")
+    p.add_argument("--keep-last", type=int, default=20, help="每个文件至少保留最近 N 份（默认 20）")
+    p.add_argument("--keep-days", type=int, default=30, help="保留最近 N 天内的全部快照（默认 30）")
+    p.add_argument("--source", type=Path, default=None, help="只清理该文件的快照")
+
+    p = sub.add_parser("import-legacy", help="收编 data/ 下已有的 *.bak_YYYYMMDD_HHMMSS 文件")
+    p.add_argument("--dir", type=Path, default=DATA_DIR)
+    p.add_argument("--delete", action="store_true", help="收编成功后删除原 .bak_ 文件")
+
+    sub.add_parser("verify", help="还原所有快照并校验 sha256")
+    sub.add_parser("stats", help="统计逻辑大小与实际占用")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = BackupStore(args.pack_dir)
+
+    if args.command == "snapshot":
+        for path in args.files:
+            entry = store.snapshot(path, note=args.note)
+            if entry is None:
+                print(f"[WARN] {path} 不存在，已跳过。")
+            else:
+                print(f"[snapshot] #{entry['id']} {entry['source']} ({_format_size(entry['size'])}, {entry['sha256'][:12]})")
+        return 0
+
+    if args.command == "list":
+        source = store.source_key(args.source) if args.source else None
+        for entry in store.snapshots:
+            if source and entry["source"] != source:
+                continue
+            kind = store.objects.get(entry["sha256"], {}).get("kind", "?")
+            note = f"  {entry['note']}" if entry.get("note") else ""
+            print(f"#{entry['id']:<5} {entry['createdAt']}  {entry['source']}  {_format_size(entry['size'])}  {kind}{note}")
+        return 0
+
+    if args.command == "restore":
+        dest = store.restore(args.id, args.to)
+        print(f"[INFO] 已将快照 #{args.id} 还原到 {dest}")
+        return 0
+
+    if args.command == "prune":
+        source = store.source_key(args.source) if args.source else None
+        removed = store.prune(keep_last=args.keep_last, keep_days=args.keep_days, source=source)
+        for entry in removed:
+            print(f"[pruned] #{entry['id']} {entry['createdAt']} {entry['source']}")
+        print(f"Completed. Removed {len(removed)} snapshots.")
+        return 0
+
+    if args.command == "import-legacy":
+        imported = store.import_legacy(args.dir, delete=args.delete)
+        for path in imported:
+            print(f"[imported] {path.name}{' (deleted)' if args.delete else ''}")
+        print(f"Completed. Imported {len(imported)} legacy backups.")
+        return 0
+
+    if args.command == "verify":
+        problems = store.verify()
+        for line in problems:
+            print(f"[ERROR] {line}")
+        print("OK" if not problems else f"{len(problems)} snapshots failed verification.")
+        return 1 if problems else 0
+
+    if args.command == "stats":
+        stats = store.stats()
+        print(
+            f"快照 {stats['snapshots']} 份，对象 {stats['objects']} 个（delta {stats['deltaObjects']}），"
+            f"逻辑大小 {_format_size(stats['logicalBytes'])}，实际占用 {_format_size(stats['storedBytes'])}"
+        )
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
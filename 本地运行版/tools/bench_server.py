@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 Node 服务的压测与延迟基准（由 `python start_local.py bench` 调用）。
+
+流程：
+1. 用 gen_dataset 在临时目录生成合成数据（组织树、用户、任职历史、近 M 个月的工作项），
+   通过环境变量 DATA_DIR 交给 server；
+2. start_local.start_server_background 启动服务，wait_for_port 等待就绪；
+3. 用 asyncio 原生 HTTP/1.1 长连接客户端并发压测以下接口，每个接口单独一轮：
+   POST /api/auth/login、GET /api/work-items、GET /api/reports/daily-overview、GET /api/reports/weekly-overview；
+4. 输出每个接口的 p50/p95/p99 延迟、吞吐与错误数，可另存 JSON，并与上一次结果对比。
+
+合成用户没有 passwordHash，server 对其登录不校验密码；压测只使用启用状态的账号。
+压测会向临时数据目录写入审计日志；不允许指向正式的 data/ 目录。
+
+用法
+  python start_local.py bench
+  python start_local.py bench --users 1000 --months 12 --concurrency 32 --requests 1000
+  python start_local.py bench --data-dir /tmp/data-10k   # 复用 gen_dataset 生成好的目录
+  python start_local.py bench --out bench-before.json
+  python start_local.py bench --compare bench-before.json --out bench-after.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from data_store import DATA_DIR, read_collection
+from gen_dataset import generate
+
+ENDPOINTS = ("login", "work-items", "daily-overview", "weekly-overview")
+
+
+# --- HTTP 客户端 ---
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    """单条 HTTP/1.1 keep-alive 连接；断开后自动重连。"""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, target: str, *, body: Optional[bytes] = None, token: Optional[str] = None) -> Tuple[int, bytes]:
+        for attempt in range(2):
+            if self.writer is None:
+                await self._connect()
+            head = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+            if token:
+                head.append(f"Authorization: Bearer {token}")
+            if body is not None:
+                head += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+            try:
+                self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + (body or b""))
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+        raise HttpError("unreachable")
+
+    async def _read_response(self) -> Tuple[int, bytes]:
+        assert self.reader is not None
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                parts.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            payload = b"".join(parts)
+        else:
+            payload = await self.reader.readexactly(int(headers.get("content-length", "0")))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, payload
+
+
+# --- 压测 ---
+
+@dataclass
+class EndpointResult:
+    name: str
+    requests: int
+    errors: int
+    seconds: float
+    latencies_ms: List[float] = field(default_factory=list, repr=False)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies_ms:
+            return float("nan")
+        ordered = sorted(self.latencies_ms)
+        rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+        return ordered[rank]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.requests / self.seconds, 1) if self.seconds else 0.0,
+            "p50": round(self.percentile(50), 2),
+            "p95": round(self.percentile(95), 2),
+            "p99": round(self.percentile(99), 2),
+            "mean": round(statistics.fmean(self.latencies_ms), 2) if self.latencies_ms else None,
+            "max": round(max(self.latencies_ms), 2) if self.latencies_ms else None,
+        }
+
+
+def _targets(today: date, week_start: date) -> Dict[str, Tuple[str, str]]:
+    week = {"from": week_start.isoformat(), "to": (week_start + timedelta(days=6)).isoformat(), "scope": "subtree"}
+    return {
+        "work-items": ("GET", "/api/work-items?" + urlencode({**week, "limit": 50})),
+        "daily-overview": ("GET", "/api/reports/daily-overview?" + urlencode({"date": today.isoformat(), "scope": "subtree"})),
+        "weekly-overview": ("GET", "/api/reports/weekly-overview?" + urlencode(week)),
+    }
+
+
+async def _login(conn: Connection, employee_no: str) -> Tuple[int, Optional[str]]:
+    status, payload = await conn.request("POST", "/api/auth/login", body=json.dumps({"employeeNo": employee_no, "password": ""}).encode("utf-8"))
+    token = json.loads(payload).get("token") if status == 200 else None
+    return status, token
+
+
+async def run_endpoint(name: str, *, host: str, port: int, accounts: List[str], requests: int, concurrency: int, seed: int) -> EndpointResult:
+    today = date.today()
+    method, target = _targets(today, today - timedelta(days=today.weekday())).get(name, ("POST", "/api/auth/login"))
+    rng = random.Random(seed)
+    result = EndpointResult(name, requests=0, errors=0, seconds=0.0)
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        conn = Connection(host, port)
+        token = None
+        try:
+            if name != "login":
+                status, token = await _login(conn, rng.choice(accounts))
+                if token is None:
+                    raise HttpError(f"login failed with HTTP {status}")
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    if name == "login":
+                        status, _ = await _login(conn, rng.choice(accounts))
+                    else:
+                        status, _ = await conn.request(method, target, token=token)
+                except (OSError, asyncio.IncompleteReadError, HttpError):
+                    status = 0
+                result.latencies_ms.append((time.perf_counter() - started) * 1000)
+                result.requests += 1
+                if status != 200:
+                    result.errors += 1
+        finally:
+            await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def load_accounts(data_dir: Path) -> List[str]:
+    """启用且有工号的账号。"""
+    users = read_collection(data_dir / "users.json")["items"]
+    return [u["employeeNo"] for u in users if u.get("employeeNo") and u.get("active", True) is not False]
+
+
+async def run_all(opts: argparse.Namespace, accounts: List[str]) -> List[EndpointResult]:
+    results = []
+    for index, name in enumerate(opts.endpoints):
+        # 预热：不计入统计
+        if opts.warmup:
+            await run_endpoint(name, host=opts.host, port=opts.port, accounts=accounts, requests=opts.warmup, concurrency=min(opts.concurrency, opts.warmup), seed=opts.seed - 1)
+        result = await run_endpoint(
+            name,
+            host=opts.host,
+            port=opts.port,
+            accounts=accounts,
+            requests=opts.requests,
+            concurrency=opts.concurrency,
+            seed=opts.seed + index,
+        )
+        print(f"[bench] {name}: {result.requests} 次请求，{result.errors} 个错误，{result.seconds:.2f}s")
+        results.append(result)
+    return results
+
+
+# --- 数据目录与报告 ---
+
+def prepare_data_dir(opts: argparse.Namespace) -> Tuple[Path, bool]:
+    """返回 (数据目录, 是否为本次创建的临时目录)。"""
+    if opts.data_dir is not None:
+        data_dir = opts.data_dir.resolve()
+        if data_dir == DATA_DIR.resolve():
+            raise SystemExit("[ERROR] 压测会写入审计日志，不能指向正式 data/ 目录，请使用单独的目录。")
+        if (data_dir / "users.json").exists() and not opts.regenerate:
+            print(f"[INFO] 使用已有数据目录 {data_dir}")
+            return data_dir, False
+        temporary = False
+    else:
+        data_dir = Path(tempfile.mkdtemp(prefix="bench-data-"))
+        temporary = not opts.keep_data
+    generate(data_dir, users=opts.users, months=opts.months, depth=opts.depth, fanout=opts.fanout, seed=opts.seed)
+    print(f"[INFO] 合成数据已生成：{data_dir}")
+    return data_dir, temporary
+
+
+def cleanup_data_dir(data_dir: Path, temporary: bool) -> None:
+    if temporary:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    else:
+        print(f"[INFO] 数据目录已保留：{data_dir}")
+
+
+def format_results(results: List[EndpointResult], baseline: Optional[Dict[str, Any]] = None) -> List[str]:
+    previous = {row["name"]: row for row in (baseline or {}).get("endpoints", [])}
+    lines = [f"{'endpoint':<18}{'req':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for result in results:
+        row = result.summary()
+        lines.append(
+            f"{row['name']:<18}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9}"
+            f"{row['p50']:>10}{row['p95']:>10}{row['p99']:>10}{row['max'] or 0:>10}"
+        )
+        old = previous.get(row["name"])
+        if old:
+            delta = "  ".join(
+                f"{key} {(row[key] - old[key]) / old[key] * 100:+.0f}%" for key in ("rps", "p50", "p95", "p99") if old.get(key)
+            )
+            lines.append(f"{'  vs baseline':<18}{delta}")
+    return lines
+
+
+def write_results(path: Path, opts: argparse.Namespace, results: List[EndpointResult]) -> None:
+    payload = {
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z"),
+        "params": {key: getattr(opts, key) for key in ("users", "months", "depth", "fanout", "requests", "concurrency", "warmup", "seed")},
+        "endpoints": [r.summary() for r in results],
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="start_local.py bench", description="本地 Node 服务压测")
+    parser.add_argument("--port", type=int, default=18080, help="压测服务端口（默认 18080，避免与正在运行的服务冲突）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--data-dir", type=Path, default=None, help="数据目录（默认临时目录，结束后删除）")
+    parser.add_argument("--regenerate", action="store_true", help="--data-dir 已有数据时也重新生成")
+    parser.add_argument("--keep-data", action="store_true", help="保留临时数据目录")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--months", type=int, default=1, help="生成最近 M 个月的工作项")
+    parser.add_argument("--depth", type=int, default=2, help="部门层级数")
+    parser.add_argument("--fanout", type=int, default=5, help="每个部门的子部门数")
+    parser.add_argument("--requests", type=int, default=300, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="每个接口的预热请求数（不计入统计）")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=20251010)
+    parser.add_argument("--out", type=Path, default=None, help="结果另存为 JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--server-log", type=Path, default=None, help="server 输出写入该文件（默认丢弃）")
+    opts = parser.parse_args(argv)
+    if min(opts.users, opts.depth, opts.fanout, opts.concurrency, opts.requests) < 1 or opts.months < 0:
+        parser.error("--users/--depth/--fanout/--concurrency/--requests 必须为正数，--months 不能为负")
+    return opts
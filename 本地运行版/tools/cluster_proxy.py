@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地多实例的负载均衡反向代理（由 `python start_local.py --instances N` 使用）。
+
+N 个 `npm start` 监听 port+1..port+N 并共享同一 data/，本代理监听对外的 port：
+- 选择后端：默认最少连接（并列时轮转）；--sticky 时按 Authorization（没有则按客户端 IP）
+  做 rendezvous 哈希，同一用户固定落在同一健康实例上，实例剔除时只迁移它名下的用户；
+- 主动健康检查：每 interval 秒 GET /api/health，连续 fail_threshold 次失败即剔除，恢复一次成功即重新加入；
+- 被动剔除：连接后端失败（实例崩溃/重启中）计一次失败并立即换下一个后端重试，请求尚未发出所以可以安全重试；
+- HTTP/1.1 keep-alive：按 Content-Length / chunked 转发请求与响应正文，后端连接每个请求新建（本机连接开销可忽略）；
+- GET /__proxy/status 返回各后端状态（JSON），由代理自己应答；
+- 可选挂载 report_cache.ReportCache（cache=...），报表 GET 命中时直接由代理应答（响应头 X-Report-Cache），
+  并补写 server 本该写入的审计记录。
+
+单独运行（后端已自行启动时）：
+  python tools/cluster_proxy.py --port 8080 --backend 8081 --backend 8082 [--sticky] [--cache-reports]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+HEALTH_PATH = "/api/health"
+STATUS_PATH = "/__proxy/status"
+MAX_HEADER_BYTES = 64 * 1024
+COPY_CHUNK = 64 * 1024
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "upgrade",
+    "expect",
+}
+# 缓存未命中时请求 server 回传审计记录的请求头，以及回传所用的响应头（见 report_cache.py）
+AUDIT_REQUEST_HEADER = "X-Report-Cache-Audit"
+AUDIT_RESPONSE_HEADER = "x-audit-entry"
+
+
+class ProxyError(Exception):
+    """客户端请求格式错误，返回 400 并关闭连接。"""
+
+
+@dataclass
+class Backend:
+    host: str
+    port: int
+    healthy: bool = True
+    active: int = 0
+    failures: int = 0
+    served: int = 0
+    errors: int = 0
+    last_check: Optional[float] = None
+    ejected_at: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "healthy": self.healthy,
+            "active": self.active,
+            "failures": self.failures,
+            "served": self.served,
+            "errors": self.errors,
+            "ejectedAt": self.ejected_at,
+        }
+
+
+@dataclass
+class Request:
+    method: str
+    target: str
+    version: str
+    headers: List[Tuple[str, str]] = field(default_factory=list)
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Optional[bytes]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as exc:
+        if exc.partial.strip():
+            raise ProxyError("连接在请求头中途关闭") from exc
+        return None
+    except asyncio.LimitOverrunError as exc:
+        raise ProxyError("请求头过大") from exc
+    return head
+
+
+def _parse_headers(lines: Sequence[bytes]) -> List[Tuple[str, str]]:
+    headers = []
+    for raw in lines:
+        if not raw:
+            continue
+        name, sep, value = raw.decode("latin-1").partition(":")
+        if not sep:
+            raise ProxyError(f"无效的请求头: {raw[:80]!r}")
+        headers.append((name.strip(), value.strip()))
+    return headers
+
+
+def _connection_tokens(headers: Sequence[Tuple[str, str]]) -> set:
+    tokens = set()
+    for key, value in headers:
+        if key.lower() == "connection":
+            tokens.update(t.strip().lower() for t in value.split(","))
+    return tokens
+
+
+def _body_framing(headers: Sequence[Tuple[str, str]]) -> Tuple[str, int]:
+    """返回 ("chunked", 0) | ("length", n) | ("none", 0)。"""
+    for key, value in headers:
+        if key.lower() == "transfer-encoding" and "chunked" in value.lower():
+            return "chunked", 0
+    for key, value in headers:
+        if key.lower() == "content-length":
+            try:
+                return "length", int(value)
+            except ValueError as exc:
+                raise ProxyError("无效的 Content-Length") from exc
+    return "none", 0
+
+
+async def _copy_exact(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, length: int) -> None:
+    remaining = length
+    while remaining > 0:
+        chunk = await reader.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            raise ConnectionResetError("正文未读完连接即关闭")
+        writer.write(chunk)
+        remaining -= len(chunk)
+        await writer.drain()
+
+
+async def _copy_chunked(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """原样转发 chunked 正文（含 trailer），遇到 0 长度块结束。"""
+    while True:
+        size_line = await reader.readuntil(b"\r\n")
+        writer.write(size_line)
+        size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            while True:
+                trailer = await reader.readuntil(b"\r\n")
+                writer.write(trailer)
+                if trailer == b"\r\n":
+                    await writer.drain()
+                    return
+        await _copy_exact(reader, writer, size + 2)
+
+
+async def _copy_until_eof(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    while True:
+        chunk = await reader.read(COPY_CHUNK)
+        if not chunk:
+            return
+        writer.write(chunk)
+        await writer.drain()
+
+
+def _close(writer: Optional[asyncio.StreamWriter]) -> None:
+    if writer is not None and not writer.is_closing():
+        writer.close()
+
+
+class ClusterProxy:
+    def __init__(
+        self,
+        backends: Sequence[int],
+        *,
+        port: int,
+        host: str = "0.0.0.0",
+        backend_host: str = "127.0.0.1",
+        sticky: bool = False,
+        interval: float = 2.0,
+        probe_timeout: float = 2.0,
+        fail_threshold: int = 2,
+        connect_timeout: float = 2.0,
+        cache=None,
+        on_event=None,
+    ) -> None:
+        self.backends = [Backend(backend_host, p) for p in backends]
+        self.port = port
+        self.host = host
+        self.sticky = sticky
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.fail_threshold = fail_threshold
+        self.connect_timeout = connect_timeout
+        self.cache = cache
+        self.on_event = on_event
+        self._rr = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self.ready = threading.Event()
+        self._clients: set = set()
+
+    def _emit(self, text: str) -> None:
+        if self.on_event is not None:
+            self.on_event(f"[proxy] {text}")
+
+    # --- 后端选择与健康 ---
+
+    def _candidates(self, request: Request, peer: str, exclude: set) -> List[Backend]:
+        pool = [b for b in self.backends if b.healthy and b.name not in exclude]
+        if not pool:
+            # 全部被剔除时仍尝试未试过的实例，而不是直接 502（健康检查可能只是滞后）
+            pool = [b for b in self.backends if b.name not in exclude]
+        if not pool:
+            return []
+        if self.sticky:
+            key = request.header("authorization") or peer
+            return sorted(
+                pool,
+                key=lambda b: hashlib.blake2b(f"{key}|{b.name}".encode(), digest_size=8).digest(),
+                reverse=True,
+            )
+        offset = next(self._rr)
+        rotated = [pool[(offset + i) % len(pool)] for i in range(len(pool))]
+        return sorted(rotated, key=lambda b: b.active)
+
+    def _mark(self, backend: Backend, ok: bool, reason: str = "") -> None:
+        if ok:
+            backend.failures = 0
+            if not backend.healthy:
+                backend.healthy = True
+                backend.ejected_at = None
+                self._emit(f"{backend.name} 恢复，重新加入")
+            return
+        backend.failures += 1
+        if backend.healthy and backend.failures >= self.fail_threshold:
+            backend.healthy = False
+            backend.ejected_at = time.time()
+            self._emit(f"{backend.name} 剔除 ({reason})")
+
+    async def _probe(self, backend: Backend) -> None:
+        writer = None
+        ok = False
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(backend.host, backend.port), self.probe_timeout
+            )
+            writer.write(f"GET {HEALTH_PATH} HTTP/1.1\r\nHost: {backend.name}\r\nConnection: close\r\n\r\n".encode())
+            status_line = await asyncio.wait_for(reader.readline(), self.probe_timeout)
+            ok = status_line.split(b" ")[1:2] == [b"200"]
+        except (OSError, asyncio.TimeoutError, IndexError):
+            ok = False
+        finally:
+            _close(writer)
+        backend.last_check = time.time()
+        self._mark(backend, ok, "health check failed")
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._probe(b) for b in self.backends))
+            await asyncio.sleep(self.interval)
+
+    # --- 请求转发 ---
+
+    def _status_response(self) -> bytes:
+        body = json.dumps(
+            {
+                "port": self.port,
+                "sticky": self.sticky,
+                "backends": [b.to_json() for b in self.backends],
+                "cache": self.cache.status() if self.cache is not None else None,
+            },
+            ensure_ascii=False,
+            indent=2,
+        ).encode("utf-8")
+        head = (
+            "HTTP/1.1 200 OK\r\nContent-Type: application/json; charset=utf-8\r\n"
+            f"Cache-Control: no-store\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        return head.encode() + body
+
+    @staticmethod
+    def _error_response(status: str, message: str) -> bytes:
+        body = json.dumps({"ok": False, "error": message}).encode()
+        return (
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+        ).encode() + body
+
+    async def _connect(self, request: Request, peer: str) -> Tuple[Backend, asyncio.StreamReader, asyncio.StreamWriter]:
+        tried: set = set()
+        while True:
+            candidates = self._candidates(request, peer, tried)
+            if not candidates:
+                raise ConnectionError("没有可用的后端实例")
+            backend = candidates[0]
+            tried.add(backend.name)
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(backend.host, backend.port), self.connect_timeout
+                )
+                return backend, reader, writer
+            except (OSError, asyncio.TimeoutError):
+                backend.errors += 1
+                self._mark(backend, False, "connect failed")
+
+    async def _forward(
+        self,
+        request: Request,
+        peer: str,
+        client_reader: asyncio.StreamReader,
+        client_writer: asyncio.StreamWriter,
+    ) -> bool:
+        """转发一个请求；返回客户端连接是否可以继续复用。"""
+        framing, length = _body_framing(request.headers)
+        client_keep = request.version == "HTTP/1.1" and "close" not in _connection_tokens(request.headers)
+        cacheable = None
+        if self.cache is not None and framing == "none":
+            cacheable = self.cache.key_for(request.method, request.target, request.header("authorization"))
+        if cacheable is not None:
+            cached = self.cache.get(cacheable[0])
+            if cached is not None:
+                head, _, body = cached.response.partition(b"\r\n\r\n")
+                connection = b"keep-alive" if client_keep else b"close"
+                client_writer.write(head + b"\r\nX-Report-Cache: HIT\r\nConnection: " + connection + b"\r\n\r\n" + body)
+                self.cache.record_hit(cached)
+                await client_writer.drain()
+                return client_keep
+            generation = self.cache.generation
+        try:
+            backend, upstream_reader, upstream_writer = await self._connect(request, peer)
+        except ConnectionError as exc:
+            client_writer.write(self._error_response("502 Bad Gateway", str(exc)))
+            await client_writer.drain()
+            return False
+
+        backend.active += 1
+        try:
+            if (request.header("expect") or "").lower() == "100-continue":
+                # 代理先读完正文再转发，直接替后端应答 100 Continue
+                client_writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                await client_writer.drain()
+            drop = HOP_BY_HOP | _connection_tokens(request.headers) | {AUDIT_REQUEST_HEADER.lower()}
+            if cacheable is not None:
+                # 未命中时要拿到完整的 200 才能缓存，不转发条件请求头
+                drop = drop | {"if-none-match", "if-modified-since"}
+            lines = [f"{request.method} {request.target} HTTP/1.1"]
+            for key, value in request.headers:
+                if key.lower() not in drop and key.lower() != "x-forwarded-for":
+                    lines.append(f"{key}: {value}")
+            forwarded = request.header("x-forwarded-for")
+            lines.append(f"X-Forwarded-For: {forwarded + ', ' if forwarded else ''}{peer}")
+            if cacheable is not None:
+                # 请 server 回传它写入的审计记录，命中缓存时照此补写（见 report_cache.py）
+                lines.append(f"{AUDIT_REQUEST_HEADER}: 1")
+            lines.append("Connection: close")
+            upstream_writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            if framing == "chunked":
+                await _copy_chunked(client_reader, upstream_writer)
+            elif framing == "length":
+                await _copy_exact(client_reader, upstream_writer, length)
+            await upstream_writer.drain()
+
+            while True:
+                head = await _read_head(upstream_reader)
+                if head is None:
+                    raise ConnectionResetError("后端未返回响应")
+                status_line, *header_lines = head[:-4].split(b"\r\n")
+                status = int(status_line.split(b" ")[1])
+                if not 100 <= status < 200:
+                    break
+            headers = _parse_headers(header_lines)
+            response_framing, response_length = _body_framing(headers)
+            no_body = request.method == "HEAD" or status in (204, 304)
+            keep = client_keep and (no_body or response_framing != "none")
+
+            out = [status_line.decode("latin-1")]
+            audit = None
+            for key, value in headers:
+                if key.lower() == AUDIT_RESPONSE_HEADER:
+                    audit = value
+                elif key.lower() not in HOP_BY_HOP:
+                    out.append(f"{key}: {value}")
+            if cacheable is not None and status == 200 and response_framing == "length":
+                body = await upstream_reader.readexactly(response_length)
+                head = "\r\n".join(out).encode("latin-1")
+                self.cache.put(
+                    cacheable[0],
+                    head + b"\r\n\r\n" + body,
+                    token_exp=cacheable[1],
+                    range_=cacheable[2],
+                    generation=generation,
+                    audit=audit,
+                )
+                client_writer.write(
+                    head + b"\r\nX-Report-Cache: MISS\r\nConnection: "
+                    + (b"keep-alive" if keep else b"close") + b"\r\n\r\n" + body
+                )
+                await client_writer.drain()
+                backend.served += 1
+                return keep
+            out.append("Connection: keep-alive" if keep else "Connection: close")
+            client_writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1"))
+            if not no_body:
+                if response_framing == "chunked":
+                    await _copy_chunked(upstream_reader, client_writer)
+                elif response_framing == "length":
+                    await _copy_exact(upstream_reader, client_writer, response_length)
+                else:
+                    await _copy_until_eof(upstream_reader, client_writer)
+            await client_writer.drain()
+            backend.served += 1
+            return keep
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError, ProxyError):
+            backend.errors += 1
+            return False
+        finally:
+            backend.active -= 1
+            _close(upstream_writer)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peername = writer.get_extra_info("peername")
+        peer = peername[0] if peername else "unknown"
+        self._clients.add(writer)
+        try:
+            while True:
+                head = await _read_head(reader)
+                if head is None:
+                    return
+                request_line, *header_lines = head[:-4].split(b"\r\n")
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    raise ProxyError("无效的请求行")
+                request = Request(parts[0], parts[1], parts[2], _parse_headers(header_lines))
+                if request.target == STATUS_PATH:
+                    writer.write(self._status_response())
+                    await writer.drain()
+                    continue
+                if not await self._forward(request, peer, reader, writer):
+                    return
+        except ProxyError as exc:
+            writer.write(self._error_response("400 Bad Request", str(exc)))
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            _close(writer)
+
+    # --- 生命周期 ---
+
+    async def serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES)
+        health = asyncio.create_task(self._health_loop())
+        if self.cache is not None:
+            self.cache.start(self._loop)
+        self._emit(f"listening on {self.host}:{self.port} -> {', '.join(b.name for b in self.backends)}")
+        self.ready.set()
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            health.cancel()
+            if self.cache is not None:
+                self.cache.stop()
+            server.close()
+            # 关闭空闲的 keep-alive 连接，让各连接的处理协程自然结束
+            for writer in list(self._clients):
+                _close(writer)
+            await asyncio.sleep(0.1)
+
+    def run(self) -> int:
+        asyncio.run(self.serve())
+        return 0
+
+    def start_thread(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="cluster-proxy", daemon=True)
+        self._thread.start()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待后台线程结束；返回是否仍在运行。"""
+        if self._thread is None:
+            return False
+        self._thread.join(timeout)
+        return self._thread.is_alive()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="本地多实例负载均衡代理")
+    parser.add_argument("--port", type=int, required=True, help="对外监听端口")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址（默认 0.0.0.0）")
+    parser.add_argument("--backend", type=int, action="append", required=True, help="后端端口，可重复")
+    parser.add_argument("--sticky", action="store_true", help="按 Authorization / 客户端 IP 固定后端")
+    parser.add_argument("--interval", type=float, default=2.0, help="健康检查间隔秒数（默认 2）")
+    parser.add_argument("--fail-threshold", type=int, default=2, help="连续失败几次剔除（默认 2）")
+    parser.add_argument("--cache-reports", action="store_true", help="缓存报表 GET 响应（见 report_cache.py）")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="报表缓存 TTL 秒数（默认 300）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    cache = None
+    if args.cache_reports:
+        from report_cache import ReportCache
+
+        cache = ReportCache(ttl=args.cache_ttl, on_event=print)
+    proxy = ClusterProxy(
+        args.backend,
+        port=args.port,
+        host=args.host,
+        sticky=args.sticky,
+        interval=args.interval,
+        fail_threshold=args.fail_threshold,
+        cache=cache,
+        on_event=print,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: proxy.stop())
+    try:
+        return proxy.run()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
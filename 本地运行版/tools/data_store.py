@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tools/ 下各脚本共用的 data/ 读取层。
+
+- 每个集合（users / org_units / user_org_memberships / role_grants / roles）只解析一次；
+- 按 id / name / employeeNo / userId 建立哈希索引，替代各脚本自己的线性扫描；
+- 记录以 __slots__ 类型化对象暴露，原始 dict 保留在 `raw` 上，修改后可原样写回；
+- 解析结果经 json_cache 按 (path, mtime_ns, size) 缓存，文件未变化时不再重新解析。
+
+用法
+    from data_store import DataStore
+
+    store = DataStore()
+    user = store.users.get_by_employee_no("L001")
+    ids = store.users.ids_by_name("张三")
+    store.memberships.active_primary(user.id)
+    for user_id, collection in store.iter_work_item_collections(): ...
+"""
+
+from __future__ import annotations
+
+import json
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+from json_cache import JsonCache, default_cache
+from json_writer import write_json
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+
+USERS_FILENAME = "users.json"
+ORGS_FILENAME = "org_units.json"
+MEMBERSHIPS_FILENAME = "user_org_memberships.json"
+ROLE_GRANTS_FILENAME = "role_grants.json"
+ROLES_FILENAME = "roles.json"
+WORK_ITEMS_DIRNAME = "work_items"
+WORK_ITEMS_MANIFEST = "manifest.json"
+UNDATED_PARTITION = "undated"
+
+
+def default_collection() -> Dict[str, Any]:
+    return {"meta": {"lastId": 0}, "items": []}
+
+
+def to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_collection(path: Path, cache: Optional[JsonCache] = None) -> Dict[str, Any]:
+    """读取 `{ meta, items }` 结构的 JSON；文件不存在时返回空集合（与 server readJson 的 fallback 一致）。"""
+    if cache is not None:
+        data = cache.load(path, default=default_collection)
+    else:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return default_collection()
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} 不是 {{ meta, items }} 结构")
+    data.setdefault("meta", {"lastId": 0})
+    data.setdefault("items", [])
+    return data
+
+
+def write_collection(path: Path, payload: Dict[str, Any]) -> None:
+    """流式、原子地写回集合（见 json_writer.write_json）。"""
+    write_json(path, payload)
+
+
+# --- Work items ---
+#
+# 每个用户两种布局之一（以 user/<id>/manifest.json 是否存在区分，与 server/data/store.js 相同）：
+#   user/<id>.json                        单个集合
+#   user/<id>/<yyyy-mm>.json + manifest   按 workDate 月份分区（tools/reshard_work_items.py），workDate 无效的在 undated 分区
+
+
+def partition_key(work_date: Any) -> str:
+    if isinstance(work_date, str) and len(work_date) == 10 and work_date[4] == "-" and work_date[7] == "-" and (work_date[:4] + work_date[5:7] + work_date[8:]).isdigit():
+        return work_date[:7]
+    return UNDATED_PARTITION
+
+
+def work_item_user_ids(user_dir: Path) -> List[int]:
+    """user/ 下出现的用户 id（单文件或分区目录）。"""
+    ids = set()
+    try:
+        entries = list(Path(user_dir).iterdir())
+    except FileNotFoundError:
+        return []
+    for path in entries:
+        user_id = to_int(path.stem if path.suffix == ".json" else path.name)
+        if user_id is not None:
+            ids.add(user_id)
+    return sorted(ids)
+
+
+def read_work_item_manifest(user_dir: Path, user_id: int) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((Path(user_dir) / str(user_id) / WORK_ITEMS_MANIFEST).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def work_item_files(user_dir: Path, user_id: int) -> List[Path]:
+    """构成该用户工作项的全部文件：分区布局为 manifest 与各分区，否则为单文件（可能不存在）。"""
+    manifest = read_work_item_manifest(user_dir, user_id)
+    if manifest is None:
+        return [Path(user_dir) / f"{user_id}.json"]
+    part_dir = Path(user_dir) / str(user_id)
+    return [part_dir / WORK_ITEMS_MANIFEST] + [part_dir / f"{key}.json" for key in sorted(manifest.get("partitions", {}))]
+
+
+def read_work_items(user_dir: Path, user_id: int, cache: Optional[JsonCache] = None) -> Dict[str, Any]:
+    """按单文件的形状 `{ meta, items }` 返回用户全部工作项；分区布局按月份顺序拼接。"""
+    manifest = read_work_item_manifest(user_dir, user_id)
+    if manifest is None:
+        return read_collection(Path(user_dir) / f"{user_id}.json", cache)
+    part_dir = Path(user_dir) / str(user_id)
+    items: List[Dict[str, Any]] = []
+    for key in sorted(manifest.get("partitions", {})):
+        items.extend(read_collection(part_dir / f"{key}.json", cache)["items"])
+    meta = dict(manifest.get("meta") or {"lastId": 0})
+    return {"meta": meta, "items": items}
+
+
+# --- Records ---
+
+
+class Record:
+    __slots__ = ("raw",)
+
+    def __repr__(self) -> str:
+        fields = []
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name != "raw":
+                    fields.append(f"{name}={getattr(self, name)!r}")
+        return f"{type(self).__name__}({', '.join(fields)})"
+
+
+class UserRecord(Record):
+    __slots__ = ("id", "employee_no", "name", "active")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self.id = to_int(raw.get("id"))
+        employee_no = raw.get("employeeNo")
+        self.employee_no = employee_no.strip() if isinstance(employee_no, str) else None
+        self.name = (raw.get("name") or "").strip()
+        self.active = raw.get("active", True) is not False
+
+
+class OrgUnitRecord(Record):
+    __slots__ = ("id", "name", "parent_id", "type", "active")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self.id = to_int(raw.get("id"))
+        self.name = (raw.get("name") or "").strip()
+        self.parent_id = to_int(raw.get("parentId"))
+        self.type = (raw.get("type") or "").lower()
+        self.active = raw.get("active", True) is not False
+
+
+class MembershipRecord(Record):
+    __slots__ = ("user_id", "org_id", "is_primary", "start_date", "end_date")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self.user_id = to_int(raw.get("userId"))
+        self.org_id = to_int(raw.get("orgId"))
+        self.is_primary = bool(raw.get("isPrimary", False))
+        self.start_date = raw.get("startDate") or None
+        self.end_date = raw.get("endDate") or None
+
+
+class RoleGrantRecord(Record):
+    __slots__ = ("id", "grantee_user_id", "role_id", "domain_org_id", "scope", "start_date", "end_date")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self.id = to_int(raw.get("id"))
+        self.grantee_user_id = to_int(raw.get("granteeUserId"))
+        self.role_id = to_int(raw.get("roleId"))
+        self.domain_org_id = to_int(raw.get("domainOrgId"))
+        self.scope = raw.get("scope")
+        self.start_date = raw.get("startDate") or None
+        self.end_date = raw.get("endDate") or None
+
+
+class RoleRecord(Record):
+    __slots__ = ("id", "code", "name")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self.id = to_int(raw.get("id"))
+        self.code = raw.get("code")
+        self.name = raw.get("name")
+
+
+# --- Collections ---
+
+R = TypeVar("R", bound=Record)
+
+
+class Collection(Generic[R]):
+    """一个 JSON 集合：`payload` 为解析后的原始文档，`records` 与 payload["items"] 一一对应。"""
+
+    record_type: type = Record
+
+    def __init__(self, path: Path, payload: Dict[str, Any]) -> None:
+        self.path = path
+        self.payload = payload
+        self.records: List[R] = [self.record_type(raw) for raw in payload["items"] if isinstance(raw, dict)]
+        self._build_indexes()
+
+    @classmethod
+    def load(cls, path: Path, cache: Optional[JsonCache] = None):
+        return cls(path, read_collection(path, cache))
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.payload["meta"]
+
+    def __iter__(self) -> Iterator[R]:
+        return iter(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _build_indexes(self) -> None:
+        pass
+
+    def save(self) -> None:
+        write_collection(self.path, self.payload)
+
+
+class UsersCollection(Collection[UserRecord]):
+    record_type = UserRecord
+
+    def _build_indexes(self) -> None:
+        self.by_id: Dict[int, UserRecord] = {}
+        self.by_name: Dict[str, List[UserRecord]] = {}
+        self.by_employee_no: Dict[str, UserRecord] = {}
+        for user in self.records:
+            if user.id is not None:
+                self.by_id[user.id] = user
+            if user.name:
+                self.by_name.setdefault(user.name, []).append(user)
+            if user.employee_no:
+                # server 端按工号登录时忽略大小写
+                self.by_employee_no.setdefault(user.employee_no.lower(), user)
+
+    def get(self, user_id: Any) -> Optional[UserRecord]:
+        return self.by_id.get(to_int(user_id))
+
+    def get_by_employee_no(self, employee_no: str) -> Optional[UserRecord]:
+        return self.by_employee_no.get((employee_no or "").strip().lower())
+
+    def ids_by_name(self, name: str) -> List[int]:
+        return [u.id for u in self.by_name.get((name or "").strip(), []) if u.id is not None]
+
+
+class OrgUnitsCollection(Collection[OrgUnitRecord]):
+    record_type = OrgUnitRecord
+
+    def _build_indexes(self) -> None:
+        self.by_id: Dict[int, OrgUnitRecord] = {}
+        self.by_name: Dict[str, List[OrgUnitRecord]] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        for org in self.records:
+            if org.id is None:
+                continue
+            self.by_id[org.id] = org
+            if org.name:
+                self.by_name.setdefault(org.name, []).append(org)
+            self.children.setdefault(org.parent_id, []).append(org.id)
+
+    def get(self, org_id: Any) -> Optional[OrgUnitRecord]:
+        return self.by_id.get(to_int(org_id))
+
+    def roots(self) -> List[int]:
+        return [org.id for org in self.by_id.values() if org.parent_id is None or org.parent_id not in self.by_id]
+
+
+class MembershipsCollection(Collection[MembershipRecord]):
+    record_type = MembershipRecord
+
+    def _build_indexes(self) -> None:
+        self.by_user: Dict[int, List[MembershipRecord]] = {}
+        self.by_org: Dict[int, List[MembershipRecord]] = {}
+        for m in self.records:
+            if m.user_id is not None:
+                self.by_user.setdefault(m.user_id, []).append(m)
+            if m.org_id is not None:
+                self.by_org.setdefault(m.org_id, []).append(m)
+
+    def for_user(self, user_id: Any) -> List[MembershipRecord]:
+        return self.by_user.get(to_int(user_id), [])
+
+    def active_primary(self, user_id: Any) -> List[MembershipRecord]:
+        """未结束（endDate 为空）的主属记录。"""
+        return [m for m in self.for_user(user_id) if m.is_primary and m.end_date is None]
+
+    def add(self, raw: Dict[str, Any]) -> MembershipRecord:
+        record = MembershipRecord(raw)
+        self.payload["items"].append(raw)
+        self.records.append(record)
+        if record.user_id is not None:
+            self.by_user.setdefault(record.user_id, []).append(record)
+        if record.org_id is not None:
+            self.by_org.setdefault(record.org_id, []).append(record)
+        return record
+
+
+class RoleGrantsCollection(Collection[RoleGrantRecord]):
+    record_type = RoleGrantRecord
+
+    def _build_indexes(self) -> None:
+        self.by_id: Dict[int, RoleGrantRecord] = {}
+        self.by_user: Dict[int, List[RoleGrantRecord]] = {}
+        for g in self.records:
+            if g.id is not None:
+                self.by_id[g.id] = g
+            if g.grantee_user_id is not None:
+                self.by_user.setdefault(g.grantee_user_id, []).append(g)
+
+    def for_user(self, user_id: Any) -> List[RoleGrantRecord]:
+        return self.by_user.get(to_int(user_id), [])
+
+
+class RolesCollection(Collection[RoleRecord]):
+    record_type = RoleRecord
+
+    def _build_indexes(self) -> None:
+        self.by_id: Dict[int, RoleRecord] = {}
+        self.by_code: Dict[str, RoleRecord] = {}
+        for role in self.records:
+            if role.id is not None:
+                self.by_id[role.id] = role
+            if role.code:
+                self.by_code[role.code] = role
+
+
+class DataStore:
+    """按需加载 data/ 下的集合；同一实例内每个文件只读取、解析一次。
+
+    `cache` 默认使用进程级 json_cache；传 None 则每次都直接解析文件。
+    """
+
+    def __init__(self, data_dir: Path = DATA_DIR, cache: Optional[JsonCache] = None, *, use_cache: bool = True) -> None:
+        self.data_dir = Path(data_dir)
+        self.cache = cache if cache is not None else (default_cache() if use_cache else None)
+
+    @property
+    def work_items_dir(self) -> Path:
+        return self.data_dir / WORK_ITEMS_DIRNAME
+
+    @cached_property
+    def users(self) -> UsersCollection:
+        return UsersCollection.load(self.data_dir / USERS_FILENAME, self.cache)
+
+    @cached_property
+    def org_units(self) -> OrgUnitsCollection:
+        return OrgUnitsCollection.load(self.data_dir / ORGS_FILENAME, self.cache)
+
+    @cached_property
+    def memberships(self) -> MembershipsCollection:
+        return MembershipsCollection.load(self.data_dir / MEMBERSHIPS_FILENAME, self.cache)
+
+    @cached_property
+    def role_grants(self) -> RoleGrantsCollection:
+        return RoleGrantsCollection.load(self.data_dir / ROLE_GRANTS_FILENAME, self.cache)
+
+    @cached_property
+    def roles(self) -> RolesCollection:
+        return RolesCollection.load(self.data_dir / ROLES_FILENAME, self.cache)
+
+    def work_items(self, user_id: int) -> Dict[str, Any]:
+        """单个用户的全部工作项（`work_items/user/<id>.json` 或其月份分区）。"""
+        return read_work_items(self.work_items_dir / "user", int(user_id), self.cache)
+
+    def iter_work_item_collections(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """遍历所有用户的工作项集合，产出 (userId, collection)；未变化的文件直接命中缓存。"""
+        user_dir = self.work_items_dir / "user"
+        for user_id in work_item_user_ids(user_dir):
+            yield user_id, read_work_items(user_dir, user_id, self.cache)
+
+    def reload(self, *names: str) -> None:
+        """丢弃已加载的集合（不传参数则全部丢弃），下次访问时重新读取。"""
+        for name in names or ("users", "org_units", "memberships", "role_grants", "roles"):
+            self.__dict__.pop(name, None)
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视 data/ 的变化，增量维护 data/indexes/ 下的派生索引。
+
+server 与 tools 各自改写 data/，其它消费者每次都要整份重新解析。这里常驻监视（Linux 用 inotify，
+其它平台或 inotify 不可用时按 mtime 轮询），把变化的文件归类后只更新受影响的部分：
+- indexes/user_lookup.json：工号（小写）→ id、姓名 → [id]，users.json 变化时重建；
+- indexes/org_closure.json：org_units.json 变化时经 OrgClosure.ensure 更新（结构未变时沿用闭包，见 org_closure.py）；
+- indexes/work_item_ranges.json：每个用户的工作项条数、最早/最晚 workDate、最大 id，
+  只重新读取文件有变化的用户（单文件或分区布局均可）。
+索引经 json_writer 原子替换，读者任何时刻看到的都是完整文件。每个索引记录源文件的 (mtime_ns, size)，
+读者可以用 is_current 判断是否与 data/ 一致；不一致时自行回退到解析原文件。
+
+连续写入在 --debounce 秒内合并为一次更新；inotify 队列溢出时做一次全量核对（仍然只重读有变化的用户）。
+
+用法
+  python tools/data_watcher.py build                 # 单次核对并更新全部索引
+  python tools/data_watcher.py watch [--poll 1.0]    # 常驻；python start_local.py --watch-data 会在服务旁启动它
+  python tools/data_watcher.py status
+
+在其它脚本中：
+  from data_watcher import WorkItemRanges
+  ranges = WorkItemRanges.load(data_dir)
+  if ranges is not None and ranges.is_current(data_dir):
+      user_ids = ranges.users_overlapping("2025-10-01", "2025-10-31")
+"""
+
+from __future__ import annotations
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from data_store import (
+    DATA_DIR,
+    ORGS_FILENAME,
+    USERS_FILENAME,
+    WORK_ITEMS_DIRNAME,
+    DataStore,
+    read_collection,
+    read_work_items,
+    to_int,
+    work_item_files,
+    work_item_user_ids,
+)
+from json_writer import write_json
+from org_closure import INDEX_DIRNAME, OrgClosure
+
+INDEX_VERSION = 1
+USER_LOOKUP_FILENAME = "user_lookup.json"
+RANGES_FILENAME = "work_item_ranges.json"
+RESCAN = "*"  # 需要全量核对时放入变化集合的标记
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def fingerprint(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _ignored(rel: str) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    return rel.startswith(INDEX_DIRNAME + "/") or ".tmp-" in name or name.endswith(".lock")
+
+
+# --- 派生索引 ---
+
+
+class UserLookup:
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self.payload = payload
+        self.meta: Dict[str, Any] = payload.get("meta", {})
+
+    @classmethod
+    def build(cls, data_dir: Path) -> "UserLookup":
+        source = Path(data_dir) / USERS_FILENAME
+        fp = fingerprint(source)
+        by_employee_no: Dict[str, int] = {}
+        by_name: Dict[str, List[int]] = {}
+        for user in read_collection(source)["items"]:
+            uid = to_int(user.get("id"))
+            if uid is None:
+                continue
+            employee_no = user.get("employeeNo")
+            if isinstance(employee_no, str) and employee_no.strip():
+                # 与 data_store.UsersCollection 一致：忽略大小写，重复时保留第一个
+                by_employee_no.setdefault(employee_no.strip().lower(), uid)
+            name = (user.get("name") or "").strip()
+            if name:
+                by_name.setdefault(name, []).append(uid)
+        return cls({
+            "meta": {"version": INDEX_VERSION, "source": USERS_FILENAME, "sourceFingerprint": fp, "builtAt": utc_now_iso(), "users": len(by_employee_no)},
+            "byEmployeeNo": by_employee_no,
+            "byName": by_name,
+        })
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional["UserLookup"]:
+        payload = _load_index(Path(data_dir) / INDEX_DIRNAME / USER_LOOKUP_FILENAME)
+        return cls(payload) if payload is not None else None
+
+    def save(self, data_dir: Path) -> None:
+        write_json(Path(data_dir) / INDEX_DIRNAME / USER_LOOKUP_FILENAME, self.payload)
+
+    def is_current(self, data_dir: Path) -> bool:
+        return self.meta.get("sourceFingerprint") == fingerprint(Path(data_dir) / USERS_FILENAME)
+
+    def by_employee_no(self, employee_no: str) -> Optional[int]:
+        return self.payload["byEmployeeNo"].get((employee_no or "").strip().lower())
+
+    def ids_by_name(self, name: str) -> List[int]:
+        return list(self.payload["byName"].get((name or "").strip(), []))
+
+
+class WorkItemRanges:
+    """每个用户的 {count, minDate, maxDate, maxId, files}；files 为构成该用户工作项的文件指纹。"""
+
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self.payload = payload
+        self.users: Dict[str, Dict[str, Any]] = payload.setdefault("users", {})
+
+    @classmethod
+    def empty(cls) -> "WorkItemRanges":
+        return cls({"meta": {"version": INDEX_VERSION}, "users": {}})
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional["WorkItemRanges"]:
+        payload = _load_index(Path(data_dir) / INDEX_DIRNAME / RANGES_FILENAME)
+        return cls(payload) if payload is not None else None
+
+    def save(self, data_dir: Path) -> None:
+        self.payload["meta"] = {
+            "version": INDEX_VERSION,
+            "builtAt": utc_now_iso(),
+            "users": len(self.users),
+            "items": sum(entry["count"] for entry in self.users.values()),
+        }
+        self.payload["users"] = {k: self.users[k] for k in sorted(self.users, key=int)}
+        self.users = self.payload["users"]
+        write_json(Path(data_dir) / INDEX_DIRNAME / RANGES_FILENAME, self.payload)
+
+    @staticmethod
+    def _files(data_dir: Path, user_id: int) -> List[List[Any]]:
+        user_dir = Path(data_dir) / WORK_ITEMS_DIRNAME / "user"
+        files = []
+        for path in work_item_files(user_dir, user_id):
+            fp = fingerprint(path)
+            if fp is not None:
+                files.append([path.relative_to(data_dir).as_posix()] + fp)
+        return files
+
+    def refresh_user(self, data_dir: Path, user_id: int) -> bool:
+        """文件指纹变化时重新统计该用户；返回是否有改动。"""
+        files = self._files(data_dir, user_id)
+        key = str(user_id)
+        if not files:
+            return self.users.pop(key, None) is not None
+        entry = self.users.get(key)
+        if entry is not None and entry.get("files") == files:
+            return False
+        items = read_work_items(Path(data_dir) / WORK_ITEMS_DIRNAME / "user", user_id)["items"]
+        dates = [d for d in (item.get("workDate") for item in items) if isinstance(d, str)]
+        self.users[key] = {
+            "count": len(items),
+            "minDate": min(dates) if dates else None,
+            "maxDate": max(dates) if dates else None,
+            "maxId": max((to_int(item.get("id")) or 0 for item in items), default=0),
+            "files": files,
+        }
+        return True
+
+    def refresh_all(self, data_dir: Path) -> bool:
+        present = work_item_user_ids(Path(data_dir) / WORK_ITEMS_DIRNAME / "user")
+        changed = False
+        for key in set(self.users) - {str(uid) for uid in present}:
+            del self.users[key]
+            changed = True
+        for uid in present:
+            changed = self.refresh_user(data_dir, uid) or changed
+        return changed
+
+    def is_current(self, data_dir: Path) -> bool:
+        present = work_item_user_ids(Path(data_dir) / WORK_ITEMS_DIRNAME / "user")
+        if {str(uid) for uid in present} != set(self.users):
+            return False
+        return all(self.users[str(uid)]["files"] == self._files(data_dir, uid) for uid in present)
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return self.users.get(str(user_id))
+
+    def users_overlapping(self, start: str, end: str) -> List[int]:
+        """workDate 范围与 [start, end] 相交的用户。"""
+        return [
+            int(key)
+            for key, entry in self.users.items()
+            if entry["minDate"] is not None and entry["minDate"] <= end and entry["maxDate"] >= start
+        ]
+
+
+def _load_index(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("meta", {}).get("version") != INDEX_VERSION:
+        return None
+    return payload
+
+
+class IndexMaintainer:
+    """按变化的文件更新相应索引。"""
+
+    def __init__(self, data_dir: Path, *, log: bool = True) -> None:
+        self.data_dir = Path(data_dir)
+        self.log = log
+        self.ranges = WorkItemRanges.load(self.data_dir) or WorkItemRanges.empty()
+
+    def _info(self, text: str) -> None:
+        if self.log:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {text}", flush=True)
+
+    def refresh_users(self, *, force: bool = False) -> bool:
+        current = None if force else UserLookup.load(self.data_dir)
+        if current is not None and current.is_current(self.data_dir):
+            return False
+        lookup = UserLookup.build(self.data_dir)
+        lookup.save(self.data_dir)
+        self._info(f"user_lookup：{lookup.meta['users']} 个工号")
+        return True
+
+    def refresh_orgs(self, *, force: bool = False) -> bool:
+        store = DataStore(self.data_dir, use_cache=False)
+        before = OrgClosure.load(self.data_dir / INDEX_DIRNAME / "org_closure.json")
+        if not force and before is not None and before.is_current(self.data_dir / ORGS_FILENAME):
+            return False
+        closure = OrgClosure.ensure(store, force=force)
+        self._info(f"org_closure：{closure.meta['nodes']} 个组织")
+        return True
+
+    def refresh_all(self, *, force: bool = False) -> None:
+        self.refresh_users(force=force)
+        self.refresh_orgs(force=force)
+        if force:
+            self.ranges = WorkItemRanges.empty()
+        if self.ranges.refresh_all(self.data_dir):
+            self.ranges.save(self.data_dir)
+            self._info(f"work_item_ranges：{len(self.ranges.users)} 个用户")
+
+    def apply(self, changed: Set[str]) -> None:
+        if RESCAN in changed:
+            self.refresh_all()
+            return
+        user_ids: Set[int] = set()
+        rescan_users = False
+        prefix = f"{WORK_ITEMS_DIRNAME}/user/"
+        for rel in changed:
+            if rel == USERS_FILENAME:
+                self.refresh_users()
+            elif rel == ORGS_FILENAME:
+                self.refresh_orgs()
+            elif rel.startswith(prefix):
+                uid = to_int(rel[len(prefix):].split("/")[0].split(".")[0])
+                if uid is not None:
+                    user_ids.add(uid)
+            elif rel in (WORK_ITEMS_DIRNAME, f"{WORK_ITEMS_DIRNAME}/user"):
+                rescan_users = True
+        dirty = self.ranges.refresh_all(self.data_dir) if rescan_users else False
+        for uid in sorted(user_ids):
+            dirty = self.ranges.refresh_user(self.data_dir, uid) or dirty
+        if dirty:
+            self.ranges.save(self.data_dir)
+            self._info(f"work_item_ranges：更新 {len(user_ids) or '全部'} 个用户")
+
+
+# --- 变化来源 ---
+
+
+class PollingWatcher:
+    """按 (mtime_ns, size) 轮询 data/ 下的全部文件。"""
+
+    def __init__(self, data_dir: Path, interval: float = 1.0) -> None:
+        self.data_dir = Path(data_dir)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, List[int]]:
+        result: Dict[str, List[int]] = {}
+        for root, dirs, files in os.walk(self.data_dir):
+            rel_root = Path(root).relative_to(self.data_dir).as_posix()
+            if rel_root == INDEX_DIRNAME:
+                dirs[:] = []
+                continue
+            for name in files:
+                rel = name if rel_root == "." else f"{rel_root}/{name}"
+                if _ignored(rel):
+                    continue
+                fp = fingerprint(Path(root) / name)
+                if fp is not None:
+                    result[rel] = fp
+        return result
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        current = self._scan()
+        changed = {rel for rel in current.keys() | self.snapshot.keys() if current.get(rel) != self.snapshot.get(rel)}
+        self.snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+# <sys/inotify.h>
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Linux inotify（经 ctypes 调用 libc），对 data/ 下除 indexes/ 外的每个目录加监视，新建的目录自动加入。"""
+
+    def __init__(self, data_dir: Path) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅在 Linux 上可用")
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name or "libc.so.6", use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.data_dir = Path(data_dir)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.dirs: Dict[int, str] = {}
+        self._add_tree(self.data_dir)
+
+    def _add(self, path: Path) -> None:
+        rel = path.relative_to(self.data_dir).as_posix()
+        if rel == INDEX_DIRNAME:
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify 监视数量达到上限（fs.inotify.max_user_watches）")
+            return
+        self.dirs[wd] = "" if rel == "." else rel
+
+    def _add_tree(self, root: Path) -> None:
+        for current, dirs, _files in os.walk(root):
+            if Path(current).relative_to(self.data_dir).as_posix() == INDEX_DIRNAME:
+                dirs[:] = []
+                continue
+            self._add(Path(current))
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: Set[str] = set()
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(RESCAN)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None:
+                continue
+            rel = f"{parent}/{name}" if parent and name else (name or parent)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # 新目录（如 split 出的分区目录）：加监视，并把其中已存在的文件视为变化
+                self._add_tree(self.data_dir / rel)
+            if rel and not _ignored(rel):
+                changed.add(rel)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher(data_dir: Path, *, poll: Optional[float] = None):
+    if poll is None:
+        try:
+            return InotifyWatcher(data_dir)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(data_dir, poll or 1.0)
+
+
+def watch(data_dir: Path, *, debounce: float = 0.3, poll: Optional[float] = None, log: bool = True) -> int:
+    maintainer = IndexMaintainer(data_dir, log=log)
+    watcher = open_watcher(data_dir, poll=poll)
+    maintainer._info(f"监视 {data_dir}（{'inotify' if isinstance(watcher, InotifyWatcher) else '轮询'}）")
+    # 启动前的变化（例如服务停止期间的修改）先全量核对一遍
+    maintainer.refresh_all()
+
+    stopping = False
+
+    def _stop(_signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    pending: Set[str] = set()
+    try:
+        while not stopping:
+            events = watcher.wait(debounce if pending else 1.0)
+            if events:
+                pending |= events
+                continue
+            if pending:
+                batch, pending = pending, set()
+                try:
+                    maintainer.apply(batch)
+                except (OSError, ValueError) as e:
+                    # 读到了正在被替换的文件等：下一轮全量核对
+                    maintainer._info(f"[WARN] 更新索引失败：{e}")
+                    pending.add(RESCAN)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="监视 data/ 并维护 data/indexes/ 下的派生索引")
+    parser.add_argument("--data-dir", type=Path, default=Path(os.environ.get("DATA_DIR") or DATA_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="单次核对并更新全部索引")
+    p.add_argument("--force", action="store_true", help="忽略已有索引，全部重建")
+    p = sub.add_parser("watch", help="常驻监视")
+    p.add_argument("--poll", type=float, default=None, help="使用 mtime 轮询（秒），不用 inotify")
+    p.add_argument("--debounce", type=float, default=0.3, help="合并连续变化的等待时间（秒）")
+    p.add_argument("--quiet", action="store_true", help="不输出更新日志")
+    sub.add_parser("status", help="各索引是否与 data/ 一致")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    data_dir = args.data_dir.resolve()
+
+    if args.command == "build":
+        IndexMaintainer(data_dir).refresh_all(force=args.force)
+        print("OK")
+        return 0
+
+    if args.command == "watch":
+        return watch(data_dir, debounce=args.debounce, poll=args.poll, log=not args.quiet)
+
+    if args.command == "status":
+        lookup = UserLookup.load(data_dir)
+        closure = OrgClosure.load(data_dir / INDEX_DIRNAME / "org_closure.json")
+        ranges = WorkItemRanges.load(data_dir)
+        states = {
+            USER_LOOKUP_FILENAME: lookup is not None and lookup.is_current(data_dir),
+            "org_closure.json": closure is not None and closure.is_current(data_dir / ORGS_FILENAME),
+            RANGES_FILENAME: ranges is not None and ranges.is_current(data_dir),
+        }
+        for name, ok in states.items():
+            print(f"{name}: {'最新' if ok else '缺失或过期'}")
+        return 0 if all(states.values()) else 1
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把 data/work_items/user/ 下的工作项（单文件或月份分区）导出为列式二进制快照，供批量分析直接 mmap 读取，不再解析 JSON。
+
+目录结构（默认 exports/columnar/）：
+- `manifest.json`：列定义、字典文件名、每个用户源文件的 (mtime_ns, size)（分区布局取最大 mtime 与总大小）与 chunk 文件；
+  最后原子替换，作为提交点；
+- `strings-<hash>.bin`：全局字符串字典（title / detail / tags / type 共用），增量导出时只追加，已有编码保持不变；
+- `chunks/<userId>-<hash>.wcol`：单个用户的列块。
+字典与 chunk 按内容哈希命名，从不原地改写：导出中断时旧 manifest 引用的文件完整且彼此一致。
+新 manifest 写入后只删除新旧两代 manifest 都不引用的文件，上一代的文件保留到下一次导出，
+读者在一个导出周期内读完它加载的 manifest 即可；更早的 manifest 引用的文件可能已被删除。
+
+列（小端，8 字节对齐，可直接 memoryview.cast / numpy.frombuffer）：
+  id int64 | creatorId int32 | orgId int32 | workDate int32（1970-01-01 起的天数）| type int32（字典编码）|
+  durationMinutes float64（NaN 为空）| title int32 | detail int32 | tagOffsets int32（rows+1）| tagCodes int32 |
+  createdAt int64 / updatedAt int64（毫秒时间戳）
+整数列中的空值：字典编码列为 -1，其余为该类型最小值（NULL_INT32 / NULL_INT64）。
+
+增量：源文件 (mtime_ns, size) 未变化的用户直接沿用上次的 chunk，只重新编码发生变化的用户；
+已删除的用户文件会同步删除 chunk。`--full` 丢弃旧字典与全部 chunk 重新导出（顺带回收不再使用的字符串）。
+
+用法
+  python tools/export_columnar.py export [--out exports/columnar] [--full]
+  python tools/export_columnar.py verify   # 逐条与源 JSON 比对
+  python tools/export_columnar.py stats
+
+读取
+  from export_columnar import ColumnarSnapshot
+  snap = ColumnarSnapshot()
+  for chunk in snap.chunks():
+      chunk["workDate"]          # memoryview（int32），零拷贝
+  snap.to_numpy()["durationMinutes"]   # 需要 numpy，拼接所有 chunk
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from data_store import DATA_DIR, ROOT, WORK_ITEMS_DIRNAME, read_work_items, to_int, work_item_files, work_item_user_ids
+from json_writer import write_bytes, write_json
+
+EXPORT_DIR = ROOT / "exports" / "columnar"
+FORMAT_VERSION = 1
+MAGIC = b"WICOL\x00\x01\x00"
+ALIGN = 8
+NULL_INT32 = -(2 ** 31)
+NULL_INT64 = -(2 ** 63)
+EPOCH = date(1970, 1, 1)
+LEGACY_STRINGS = "strings.bin"  # 早期导出原地改写的字典文件名，manifest 中没有 stringsFile 时使用
+
+# 列名 -> array typecode（q=int64, i=int32, d=float64）
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("id", "q"),
+    ("creatorId", "i"),
+    ("orgId", "i"),
+    ("workDate", "i"),
+    ("type", "i"),
+    ("durationMinutes", "d"),
+    ("title", "i"),
+    ("detail", "i"),
+    ("tagOffsets", "i"),
+    ("tagCodes", "i"),
+    ("createdAt", "q"),
+    ("updatedAt", "q"),
+)
+COLUMN_TYPES = dict(COLUMNS)
+NEEDS_SWAP = sys.byteorder != "little"
+
+
+def _date32(value: Any) -> int:
+    try:
+        return (date.fromisoformat(value) - EPOCH).days
+    except (TypeError, ValueError):
+        return NULL_INT32
+
+
+def _timestamp_ms(value: Any) -> int:
+    if not isinstance(value, str):
+        return NULL_INT64
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return NULL_INT64
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+def _int_or(value: Any, null: int) -> int:
+    number = to_int(value)
+    return number if number is not None else null
+
+
+class StringDictionary:
+    """只追加的字符串字典；编码即在 strings 中的下标。"""
+
+    def __init__(self, strings: Optional[List[str]] = None) -> None:
+        self.strings: List[str] = list(strings or [])
+        self.codes: Dict[str, int] = {s: i for i, s in enumerate(self.strings)}
+        self.dirty = False
+
+    def encode(self, value: Any) -> int:
+        if value is None:
+            return -1
+        text = str(value)
+        code = self.codes.get(text)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(text)
+            self.codes[text] = code
+            self.dirty = True
+        return code
+
+    def to_bytes(self) -> bytes:
+        blobs = [s.encode("utf-8") for s in self.strings]
+        offsets = array("q", [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        if NEEDS_SWAP:
+            offsets.byteswap()
+        return struct.pack("<8sQ", MAGIC, len(blobs)) + offsets.tobytes() + b"".join(blobs)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StringDictionary":
+        magic, count = struct.unpack_from("<8sQ", data, 0)
+        if magic != MAGIC:
+            raise ValueError("strings.bin 格式不正确")
+        offsets = array("q")
+        start = 16
+        offsets.frombytes(data[start:start + 8 * (count + 1)])
+        if NEEDS_SWAP:
+            offsets.byteswap()
+        base = start + 8 * (count + 1)
+        return cls([data[base + offsets[i]:base + offsets[i + 1]].decode("utf-8") for i in range(count)])
+
+
+def encode_chunk(items: List[Dict[str, Any]], strings: StringDictionary) -> Tuple[bytes, int]:
+    """把一个用户的工作项编码为列块，返回 (bytes, rows)。"""
+    cols: Dict[str, array] = {name: array(code) for name, code in COLUMNS}
+    cols["tagOffsets"].append(0)
+    for item in items:
+        cols["id"].append(_int_or(item.get("id"), NULL_INT64))
+        cols["creatorId"].append(_int_or(item.get("creatorId"), NULL_INT32))
+        cols["orgId"].append(_int_or(item.get("orgId"), NULL_INT32))
+        cols["workDate"].append(_date32(item.get("workDate")))
+        cols["type"].append(strings.encode(item.get("type")))
+        duration = item.get("durationMinutes")
+        try:
+            cols["durationMinutes"].append(float(duration) if duration is not None else math.nan)
+        except (TypeError, ValueError):
+            cols["durationMinutes"].append(math.nan)
+        cols["title"].append(strings.encode(item.get("title")))
+        cols["detail"].append(strings.encode(item.get("detail")))
+        tags = item.get("tags") if isinstance(item.get("tags"), list) else []
+        cols["tagCodes"].extend(strings.encode(tag) for tag in tags)
+        cols["tagOffsets"].append(len(cols["tagCodes"]))
+        cols["createdAt"].append(_timestamp_ms(item.get("createdAt")))
+        cols["updatedAt"].append(_timestamp_ms(item.get("updatedAt")))
+
+    layout: Dict[str, List[int]] = {}
+    bodies: List[bytes] = []
+    offset = 0
+    for name, _code in COLUMNS:
+        column = cols[name]
+        if NEEDS_SWAP:
+            column.byteswap()
+        body = column.tobytes()
+        layout[name] = [offset, len(column)]
+        padded = body + b"\x00" * (-len(body) % ALIGN)
+        bodies.append(padded)
+        offset += len(padded)
+
+    header = json.dumps({"rows": len(items), "columns": layout}, separators=(",", ":")).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\x00" * (-len(prefix) % ALIGN)
+    # 列偏移在 header 中相对数据区记录，数据区起点 = prefix 长度
+    return prefix + b"".join(bodies), len(items)
+
+
+class Chunk:
+    """mmap 打开的列块；列以 memoryview 暴露，零拷贝。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = view = memoryview(self._mmap)
+        if bytes(view[:8]) != MAGIC:
+            raise ValueError(f"{path} 不是列块文件")
+        (header_len,) = struct.unpack_from("<I", view, 8)
+        header = json.loads(bytes(view[12:12 + header_len]))
+        base = 12 + header_len
+        base += -base % ALIGN
+        self.rows: int = header["rows"]
+        self._columns: Dict[str, memoryview] = {}
+        for name, (offset, count) in header["columns"].items():
+            code = COLUMN_TYPES[name]
+            size = array(code).itemsize * count
+            self._columns[name] = view[base + offset:base + offset + size].cast(code)
+
+    def __getitem__(self, name: str) -> memoryview:
+        return self._columns[name]
+
+    def keys(self) -> List[str]:
+        return list(self._columns)
+
+    def close(self) -> None:
+        for column in self._columns.values():
+            column.release()
+        self._columns.clear()
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # 仍有 numpy 数组引用该映射，交给 GC 回收
+
+
+class ColumnarSnapshot:
+    def __init__(self, export_dir: Path = EXPORT_DIR) -> None:
+        self.export_dir = Path(export_dir)
+        self.manifest = json.loads((self.export_dir / "manifest.json").read_text(encoding="utf-8"))
+        self.strings_path = self.export_dir / self.manifest.get("stringsFile", LEGACY_STRINGS)
+        self.strings = StringDictionary.from_bytes(self.strings_path.read_bytes()).strings
+        self._open: List[Chunk] = []
+
+    def user_ids(self) -> List[int]:
+        return sorted(int(uid) for uid in self.manifest["users"])
+
+    def chunk(self, user_id: int) -> Chunk:
+        entry = self.manifest["users"][str(user_id)]
+        chunk = Chunk(self.export_dir / entry["chunk"])
+        self._open.append(chunk)
+        return chunk
+
+    def chunks(self) -> Iterator[Chunk]:
+        for uid in self.user_ids():
+            yield self.chunk(uid)
+
+    def decode(self, code: int) -> Optional[str]:
+        return self.strings[code] if code >= 0 else None
+
+    def rows(self, user_id: int) -> Iterator[Dict[str, Any]]:
+        """按行还原（用于校验与小规模查看）。"""
+        c = self.chunk(user_id)
+        for i in range(c.rows):
+            tags = c["tagCodes"][c["tagOffsets"][i]:c["tagOffsets"][i + 1]]
+            duration = c["durationMinutes"][i]
+            yield {
+                "id": None if c["id"][i] == NULL_INT64 else c["id"][i],
+                "creatorId": None if c["creatorId"][i] == NULL_INT32 else c["creatorId"][i],
+                "orgId": None if c["orgId"][i] == NULL_INT32 else c["orgId"][i],
+                "workDate": None if c["workDate"][i] == NULL_INT32 else (EPOCH + timedelta(days=c["workDate"][i])).isoformat(),
+                "type": self.decode(c["type"][i]),
+                "durationMinutes": None if math.isnan(duration) else duration,
+                "title": self.decode(c["title"][i]),
+                "detail": self.decode(c["detail"][i]),
+                "tags": [self.strings[code] for code in tags],
+                "createdAt": None if c["createdAt"][i] == NULL_INT64 else c["createdAt"][i],
+                "updatedAt": None if c["updatedAt"][i] == NULL_INT64 else c["updatedAt"][i],
+            }
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """拼接全部 chunk 为 numpy 数组（tagOffsets 会按拼接后的 tagCodes 重新计算）。"""
+        import numpy as np  # type: ignore
+
+        parts: Dict[str, List[Any]] = {name: [] for name, _ in COLUMNS}
+        tag_base = 0
+        for chunk in self.chunks():
+            for name, code in COLUMNS:
+                values = np.frombuffer(chunk[name], dtype=np.dtype(code).newbyteorder("<"))
+                if name == "tagOffsets":
+                    values = values[:-1] + tag_base
+                parts[name].append(values)
+            tag_base += len(chunk["tagCodes"])
+        result = {
+            name: np.concatenate(parts[name]) if parts[name] else np.array([], dtype=code)
+            for name, code in COLUMNS
+        }
+        result["tagOffsets"] = np.append(result["tagOffsets"], tag_base).astype(np.int32)
+        return result
+
+    def close(self) -> None:
+        for chunk in self._open:
+            chunk.close()
+        self._open.clear()
+
+
+def _source_files(data_dir: Path) -> Dict[int, List[Path]]:
+    """每个用户的源文件：单文件，或月份分区布局下的 manifest 与各分区。"""
+    user_dir = data_dir / WORK_ITEMS_DIRNAME / "user"
+    files = {}
+    for uid in work_item_user_ids(user_dir):
+        paths = [p for p in work_item_files(user_dir, uid) if p.exists()]
+        if paths:
+            files[uid] = paths
+    return files
+
+
+def _source_stat(paths: List[Path]) -> Tuple[int, int]:
+    """(最大 mtime_ns, 总大小)；分区布局下任一分区或 manifest 变化都会改变它。"""
+    stats = [p.stat() for p in paths]
+    return max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats)
+
+
+def _content_name(prefix: str, blob: bytes, suffix: str) -> str:
+    return f"{prefix}-{hashlib.sha256(blob).hexdigest()[:16]}{suffix}"
+
+
+def _write_new(path: Path, blob: bytes, *, fsync: bool = True) -> None:
+    # 名字由内容决定：已存在即内容相同，不必（也不能）改写正在被读者使用的文件
+    if not path.exists():
+        write_bytes(path, blob, fsync=fsync)
+
+
+def export(*, data_dir: Path = DATA_DIR, export_dir: Path = EXPORT_DIR, full: bool = False) -> Dict[str, int]:
+    export_dir = Path(export_dir)
+    manifest_path = export_dir / "manifest.json"
+    previous: Dict[str, Any] = {}
+    # 上一代 manifest 引用的文件：可能仍有读者在用，本次导出不删除（--full 也一样）
+    retained: Set[str] = set()
+    strings = StringDictionary()
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        retained = {manifest.get("stringsFile", LEGACY_STRINGS)} | {
+            entry["chunk"] for entry in manifest.get("users", {}).values() if isinstance(entry, dict) and "chunk" in entry
+        }
+        strings_path = export_dir / manifest.get("stringsFile", LEGACY_STRINGS)
+        if not full and manifest.get("version") == FORMAT_VERSION and strings_path.exists():
+            previous = manifest.get("users", {})
+            strings = StringDictionary.from_bytes(strings_path.read_bytes())
+
+    users: Dict[str, Any] = {}
+    stats = {"encoded": 0, "reused": 0, "removed": 0, "rows": 0}
+    for uid, paths in sorted(_source_files(Path(data_dir)).items()):
+        mtime_ns, size = _source_stat(paths)
+        old = previous.get(str(uid))
+        if (
+            old is not None
+            and old["mtimeNs"] == mtime_ns
+            and old["size"] == size
+            and (export_dir / old["chunk"]).exists()
+        ):
+            users[str(uid)] = old
+            stats["reused"] += 1
+            stats["rows"] += old["rows"]
+            continue
+        items = read_work_items(Path(data_dir) / WORK_ITEMS_DIRNAME / "user", uid)["items"]
+        blob, rows = encode_chunk(items, strings)
+        chunk_name = "chunks/" + _content_name(str(uid), blob, ".wcol")
+        _write_new(export_dir / chunk_name, blob, fsync=False)
+        users[str(uid)] = {
+            "source": paths[0].relative_to(data_dir).as_posix(),
+            "mtimeNs": mtime_ns,
+            "size": size,
+            "chunk": chunk_name,
+            "rows": rows,
+        }
+        stats["encoded"] += 1
+        stats["rows"] += rows
+
+    stats["removed"] = len(set(previous) - set(users))
+
+    # 字典与 chunk 都已写到新文件名，manifest 的原子替换才让它们生效
+    strings_blob = strings.to_bytes()
+    strings_name = _content_name("strings", strings_blob, ".bin")
+    _write_new(export_dir / strings_name, strings_blob)
+    write_json(
+        manifest_path,
+        {
+            "version": FORMAT_VERSION,
+            "exportedAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "columns": [{"name": name, "type": code} for name, code in COLUMNS],
+            "stringsFile": strings_name,
+            "strings": len(strings.strings),
+            "rows": stats["rows"],
+            "users": users,
+        },
+    )
+
+    # 提交之后再回收：更早的 manifest 引用的、中断的导出留下的文件；上一代保留到下次导出
+    live = {strings_name} | {entry["chunk"] for entry in users.values()} | retained
+    for path in [*export_dir.glob("strings*.bin"), *export_dir.glob("chunks/*.wcol")]:
+        if path.relative_to(export_dir).as_posix() not in live:
+            path.unlink(missing_ok=True)
+    return stats
+
+
+def _expected(item: Dict[str, Any]) -> Dict[str, Any]:
+    duration = item.get("durationMinutes")
+    try:
+        duration = float(duration) if duration is not None else None
+    except (TypeError, ValueError):
+        duration = None
+    tags = item.get("tags") if isinstance(item.get("tags"), list) else []
+    created, updated = _timestamp_ms(item.get("createdAt")), _timestamp_ms(item.get("updatedAt"))
+    work_day = _date32(item.get("workDate"))
+    return {
+        "id": to_int(item.get("id")),
+        "creatorId": to_int(item.get("creatorId")),
+        "orgId": to_int(item.get("orgId")),
+        "workDate": item.get("workDate") if work_day != NULL_INT32 else None,
+        "type": None if item.get("type") is None else str(item["type"]),
+        "durationMinutes": duration,
+        "title": None if item.get("title") is None else str(item["title"]),
+        "detail": None if item.get("detail") is None else str(item["detail"]),
+        "tags": [str(t) for t in tags],
+        "createdAt": None if created == NULL_INT64 else created,
+        "updatedAt": None if updated == NULL_INT64 else updated,
+    }
+
+
+def verify(*, data_dir: Path = DATA_DIR, export_dir: Path = EXPORT_DIR) -> List[str]:
+    """逐条比对快照与源 JSON；源文件在导出后被修改的用户报告为 stale。"""
+    snap = ColumnarSnapshot(export_dir)
+    problems: List[str] = []
+    sources = _source_files(Path(data_dir))
+    try:
+        for uid in sorted(set(sources) | set(snap.user_ids())):
+            entry = snap.manifest["users"].get(str(uid))
+            if entry is None:
+                problems.append(f"user {uid}: 未导出")
+                continue
+            if uid not in sources:
+                problems.append(f"user {uid}: 源文件已删除")
+                continue
+            if _source_stat(sources[uid]) != (entry["mtimeNs"], entry["size"]):
+                problems.append(f"user {uid}: stale（源文件在导出后有修改）")
+                continue
+            items = read_work_items(Path(data_dir) / WORK_ITEMS_DIRNAME / "user", uid)["items"]
+            expected = [_expected(item) for item in items]
+            actual = list(snap.rows(uid))
+            if len(expected) != len(actual):
+                problems.append(f"user {uid}: 行数 {len(actual)} != {len(expected)}")
+                continue
+            for row, (want, got) in enumerate(zip(expected, actual)):
+                if want != got:
+                    diff = sorted(k for k in want if want[k] != got[k])
+                    problems.append(f"user {uid} row {row}: 字段不一致 {diff}")
+                    break
+    finally:
+        snap.close()
+    return problems
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="工作项列式快照导出")
+    parser.add_argument("--out", type=Path, default=EXPORT_DIR, help="快照目录（默认 exports/columnar）")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="增量导出（只重新编码有变化的用户）")
+    p.add_argument("--full", action="store_true", help="丢弃旧字典与 chunk，全部重新导出")
+    sub.add_parser("verify", help="与源 JSON 逐条比对")
+    sub.add_parser("stats", help="快照大小与行数")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.command == "export":
+        stats = export(data_dir=args.data_dir, export_dir=args.out, full=args.full)
+        print(
+            f"Completed. 重新编码 {stats['encoded']} 个用户，沿用 {stats['reused']} 个，"
+            f"删除 {stats['removed']} 个，共 {stats['rows']} 行 -> {args.out}"
+        )
+        return 0
+
+    if not (args.out / "manifest.json").exists():
+        print(f"[ERROR] {args.out} 下没有快照，请先执行 export。")
+        return 2
+
+    if args.command == "verify":
+        problems = verify(data_dir=args.data_dir, export_dir=args.out)
+        for line in problems:
+            print(f"[ERROR] {line}")
+        print("OK" if not problems else f"{len(problems)} problems.")
+        return 1 if problems else 0
+
+    if args.command == "stats":
+        snap = ColumnarSnapshot(args.out)
+        chunk_bytes = sum((args.out / e["chunk"]).stat().st_size for e in snap.manifest["users"].values())
+        source_bytes = sum(e["size"] for e in snap.manifest["users"].values())
+        dict_bytes = snap.strings_path.stat().st_size
+        print(
+            f"用户 {len(snap.manifest['users'])}，行 {snap.manifest['rows']}，字典 {len(snap.strings)} 项；"
+            f"快照 {(chunk_bytes + dict_bytes) / 1024:.1f} KB（源 JSON {source_bytes / 1024:.1f} KB），导出于 {snap.manifest['exportedAt']}"
+        )
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,33 +7,31 @@ Usage:
     python tools/fix_employee_numbers.py
 
 This script updates data/users.json in place and prints a summary of changes.
+The previous content is snapshotted into the backups/ pack first.
 """
 
 from __future__ import annotations
 
-import json
 import re
-from pathlib import Path
 
-ROOT_PATH = Path(__file__).resolve().parent.parent
-USERS_PATH = ROOT_PATH / "data" / "users.json"
-PATTERN = re.compile(r"^([A-Za-z]+)(\d+)$")
+from backup_store import snapshot_file
+from data_store import DataStore
 
+PATTERN = re.compile(r"^([A-Za-z]+)(\d+)$")
 
-def normalize_employee_numbers() -> int:
-    if not USERS_PATH.exists():
-        raise FileNotFoundError(f"{USERS_PATH} not found")
 
-    data = json.loads(USERS_PATH.read_text(encoding="utf-8"))
-    items = data.get("items", [])
+def normalize_employee_numbers(store: DataStore | None = None) -> int:
+    store = store or DataStore()
+    users = store.users
+    if not users.path.exists():
+        raise FileNotFoundError(f"{users.path} not found")
 
     changes = []
-    for item in items:
-        employee_no = item.get("employeeNo")
-        if not isinstance(employee_no, str):
+    for user in users:
+        stripped = user.employee_no
+        if stripped is None:
             continue
 
-        stripped = employee_no.strip()
         match = PATTERN.fullmatch(stripped)
         if not match:
             continue
@@ -43,22 +41,19 @@ def normalize_employee_numbers() -> int:
             # Only handle prefixes that start with L or D.
             continue
 
-        width = max(3, len(str(item.get("id", ""))))
-        try:
-            identifier = int(item["id"])
-        except (TypeError, ValueError):
+        identifier = user.id
+        if identifier is None:
             continue
+        width = max(3, len(str(identifier)))
 
         new_employee_no = f"{prefix}{identifier:0{width}d}"
         if new_employee_no != stripped:
-            item["employeeNo"] = new_employee_no
-            changes.append((stripped, new_employee_no, item.get("name"), identifier))
+            user.raw["employeeNo"] = new_employee_no
+            changes.append((stripped, new_employee_no, user.name, identifier))
 
     if changes:
-        USERS_PATH.write_text(
-            json.dumps(data, ensure_ascii=False, indent=2) + "\n",
-            encoding="utf-8",
-        )
+        snapshot_file(users.path, note="fix_employee_numbers")
+        users.save()
 
     for old, new, name, identifier in changes:
         print(f"[updated] id={identifier:<3} name={name or '(unknown)'}: {old} -> {new}")
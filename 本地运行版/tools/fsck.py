@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+data/ 目录一致性检查（fsck），可选自动修复。
+
+全局集合在主进程中检查，work_items/user/ 下的每个用户文件（单文件或月份分区）分发到进程池并行检查：
+- 文件能否解析、是否为 { meta, items }；id 缺失或重复；meta.lastId 小于最大 id；
+- 引用完整性：组织 parentId、任职与授权的 userId/orgId/roleId/domainOrgId、工作项 orgId 指向不存在的记录；
+  组织 parentId 成环；工号重复（忽略大小写，与登录一致）；
+- 同一用户生效期重叠的主属任职记录，无法解析的 startDate/endDate；
+- 工作项：creatorId 与所在文件不符、workDate / type 无效、不同用户之间 id 重复、
+  work_items/meta.json 的 lastId 小于全部工作项的最大 id、没有对应用户的工作项文件；分区布局另做 reshard verify 的检查；
+- 遗留的 `*.tmp-*`（写入中断）与过期的 `*.lock`。
+
+每条问题有 code、severity（error | warning）、path（相对 data/）与 repairable。--repair 修复可以安全自动处理的：
+meta.lastId 调高到最大 id、work_items/meta.json 经 id_allocator 推进、分区 manifest 按磁盘重建（reindex）、
+删除超过 --tmp-age 秒的临时文件与过期锁。改写的文件先批量登记到 backups/（--no-backup 跳过）。
+修复时持有与 server 相同的锁（用户的 manifest.json 或 <id>.json，全局集合的 <name>.json），改写后重新检查，
+只有复查时已消失的问题才记为 repaired。其余问题（悬空引用、重复 id、重叠任职）需要人工判断，只报告。
+
+存在未修复的 error 时退出码为 1，适合在备份前、工具运行后调用。
+
+用法
+  python tools/fsck.py
+  python tools/fsck.py --json > fsck.json
+  python tools/fsck.py --repair [--no-backup] [--workers 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from backup_store import snapshot_files
+from data_store import (
+    DATA_DIR,
+    MEMBERSHIPS_FILENAME,
+    ORGS_FILENAME,
+    ROLE_GRANTS_FILENAME,
+    ROLES_FILENAME,
+    USERS_FILENAME,
+    WORK_ITEMS_DIRNAME,
+    OrgUnitsCollection,
+    read_collection,
+    read_work_item_manifest,
+    to_int,
+    work_item_files,
+    work_item_user_ids,
+)
+from id_allocator import IdAllocator
+from json_writer import LockTimeout, file_lock, write_json
+from org_closure import compute as compute_closure
+from reshard_work_items import UserStore, rebuild_manifest, verify_user
+
+COLLECTION_FILENAMES = (
+    USERS_FILENAME,
+    ORGS_FILENAME,
+    MEMBERSHIPS_FILENAME,
+    ROLE_GRANTS_FILENAME,
+    ROLES_FILENAME,
+    "suggestions.json",
+    "audit_logs.json",
+)
+WORK_ITEM_TYPES = frozenset(("done", "progress", "temp", "assist", "plan"))
+TMP_PATTERN = re.compile(r"\.tmp-\d+(-\d+)?$")
+LOCK_STALE_AFTER = 30.0
+MAX_DAY = "9999-12-31"
+
+ViolationKey = Tuple[str, str, str]  # (code, path, message)
+
+
+@dataclass
+class Violation:
+    code: str
+    severity: str  # error | warning
+    path: str
+    message: str
+    id: Optional[int] = None
+    repairable: bool = False
+    repaired: bool = False
+
+    @property
+    def key(self) -> ViolationKey:
+        return self.code, self.path, self.message
+
+
+def _valid_day(value: Any) -> bool:
+    try:
+        date.fromisoformat(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _load(path: Path, rel: str, out: List[Violation]) -> Optional[Dict[str, Any]]:
+    """读取集合；解析失败时记录问题并返回 None。"""
+    try:
+        data = read_collection(path)
+    except (ValueError, UnicodeDecodeError) as e:
+        out.append(Violation("parse_error", "error", rel, f"无法解析：{e}"))
+        return None
+    if not isinstance(data.get("items"), list) or not isinstance(data.get("meta"), dict):
+        out.append(Violation("shape", "error", rel, "不是 { meta, items } 结构"))
+        return None
+    return data
+
+
+def _check_ids(items: List[Any], meta: Dict[str, Any], rel: str, out: List[Violation], *, required: bool) -> List[int]:
+    """id 重复 / 缺失，meta.lastId 小于最大 id；返回出现的 id。"""
+    seen: Dict[int, int] = {}
+    for item in items:
+        item_id = to_int(item.get("id")) if isinstance(item, dict) else None
+        if item_id is None:
+            if required:
+                out.append(Violation("missing_id", "error", rel, "条目缺少 id"))
+            continue
+        seen[item_id] = seen.get(item_id, 0) + 1
+    for item_id, count in seen.items():
+        if count > 1:
+            out.append(Violation("duplicate_id", "error", rel, f"id {item_id} 出现 {count} 次", id=item_id))
+    if seen:
+        max_id = max(seen)
+        last_id = to_int(meta.get("lastId")) or 0
+        if last_id < max_id:
+            out.append(Violation("last_id_low", "error", rel, f"meta.lastId={last_id} 小于最大 id {max_id}", repairable=True))
+    return list(seen)
+
+
+# --- 每个用户的工作项（在进程池中执行） ---
+
+_ORG_IDS: Optional[FrozenSet[int]] = None
+_USER_IDS: Optional[FrozenSet[int]] = None
+
+
+def _init_worker(org_ids: Optional[FrozenSet[int]], user_ids: Optional[FrozenSet[int]]) -> None:
+    global _ORG_IDS, _USER_IDS
+    _ORG_IDS, _USER_IDS = org_ids, user_ids
+
+
+def _partition_repairable(message: str) -> bool:
+    # reshard reindex 能处理：manifest 与磁盘不一致、lastId 偏小
+    return "reindex" in message or "meta.lastId" in message
+
+
+def _check_user(task: Tuple[str, str, int]) -> Tuple[int, List[Violation], List[int]]:
+    data_dir, user_dir, uid = Path(task[0]), Path(task[1]), task[2]
+    out: List[Violation] = []
+
+    def rel(path: Path) -> str:
+        return path.relative_to(data_dir).as_posix()
+
+    if _USER_IDS is not None and uid not in _USER_IDS:
+        out.append(Violation("orphan_user_file", "warning", rel(user_dir / str(uid)), f"用户 {uid} 不存在于 users.json", id=uid))
+    try:
+        manifest = read_work_item_manifest(user_dir, uid)
+    except ValueError as e:
+        out.append(Violation("parse_error", "error", rel(user_dir / str(uid) / "manifest.json"), f"无法解析：{e}"))
+        return uid, out, []
+    if manifest is not None:
+        store = UserStore(user_dir, uid)
+        for problem in verify_user(store):
+            out.append(Violation("partition_layout", "error", rel(store.part_dir), problem, repairable=_partition_repairable(problem)))
+
+    ids: List[int] = []
+    seen: Dict[int, str] = {}
+    for path in work_item_files(user_dir, uid):
+        if path.name == "manifest.json" or not path.exists():
+            continue
+        data = _load(path, rel(path), out)
+        if data is None:
+            continue
+        file_ids = _check_ids(data["items"], data["meta"], rel(path), out, required=True)
+        for item_id in file_ids:
+            if item_id in seen and seen[item_id] != rel(path):
+                out.append(Violation("duplicate_id", "error", rel(path), f"id {item_id} 也出现在 {seen[item_id]}", id=item_id))
+            seen.setdefault(item_id, rel(path))
+        ids.extend(file_ids)
+        for item in data["items"]:
+            if not isinstance(item, dict):
+                continue
+            item_id = to_int(item.get("id"))
+            if to_int(item.get("creatorId")) != uid:
+                out.append(Violation("creator_mismatch", "warning", rel(path), f"creatorId={item.get('creatorId')!r} 与文件所属用户 {uid} 不符", id=item_id))
+            org_id = to_int(item.get("orgId"))
+            if _ORG_IDS is not None and (org_id is None or org_id not in _ORG_IDS):
+                out.append(Violation("dangling_org", "error", rel(path), f"orgId={item.get('orgId')!r} 不存在", id=item_id))
+            if not _valid_day(item.get("workDate")):
+                out.append(Violation("invalid_date", "warning", rel(path), f"workDate={item.get('workDate')!r} 无效", id=item_id))
+            if item.get("type") not in WORK_ITEM_TYPES:
+                out.append(Violation("invalid_type", "warning", rel(path), f"type={item.get('type')!r} 无效", id=item_id))
+    return uid, out, ids
+
+
+def _repair_user(task: Tuple[str, str, int]) -> Tuple[int, Optional[List[ViolationKey]]]:
+    """调高各文件 meta.lastId；分区布局再按磁盘重建 manifest。返回用户 id 与复查后仍存在的问题。
+
+    全程持有 server 的 withWorkItemLock 同一把锁，复查也在锁内完成；拿不到锁时返回 None（未修复）。
+    """
+    data_dir, user_dir, uid = task[0], Path(task[1]), task[2]
+    store = UserStore(user_dir, uid)
+    try:
+        with store.lock():
+            _repair_user_files(store)
+            _, remaining, _ = _check_user((data_dir, str(user_dir), uid))
+    except LockTimeout:
+        return uid, None
+    return uid, [v.key for v in remaining]
+
+
+def _repair_user_files(store: UserStore) -> None:
+    paths = list(store.partition_files().values()) if store.partitioned else [store.legacy_path]
+    for path in paths:
+        try:
+            data = read_collection(path)
+        except ValueError:
+            continue
+        max_id = max((to_int(i.get("id")) or 0 for i in data["items"] if isinstance(i, dict)), default=0)
+        if (to_int(data["meta"].get("lastId")) or 0) < max_id:
+            data["meta"]["lastId"] = max_id
+            write_json(path, data, lock=False)
+    if store.partitioned:
+        rebuild_manifest(store)
+
+
+# --- 全局集合 ---
+
+
+def _check_collections(data_dir: Path, out: List[Violation]) -> Dict[str, Optional[Dict[str, Any]]]:
+    loaded: Dict[str, Optional[Dict[str, Any]]] = {}
+    for name in COLLECTION_FILENAMES:
+        path = data_dir / name
+        if not path.exists():
+            if name in (USERS_FILENAME, ORGS_FILENAME):
+                out.append(Violation("missing_file", "warning", name, "文件不存在，跳过对它的引用检查"))
+            loaded[name] = None
+            continue
+        data = _load(path, name, out)
+        if data is not None:
+            # 任职记录没有 id，只检查出现了 id 的条目
+            _check_ids(data["items"], data["meta"], name, out, required=name not in (MEMBERSHIPS_FILENAME,))
+        loaded[name] = data
+    return loaded
+
+
+def _ids(data: Optional[Dict[str, Any]]) -> Optional[FrozenSet[int]]:
+    if data is None:
+        return None
+    return frozenset(i for i in (to_int(item.get("id")) for item in data["items"] if isinstance(item, dict)) if i is not None)
+
+
+def _check_references(loaded: Dict[str, Optional[Dict[str, Any]]], out: List[Violation]) -> None:
+    users, orgs, memberships, grants, roles = (loaded.get(n) for n in (USERS_FILENAME, ORGS_FILENAME, MEMBERSHIPS_FILENAME, ROLE_GRANTS_FILENAME, ROLES_FILENAME))
+    user_ids, org_ids, role_ids = _ids(users), _ids(orgs), _ids(roles)
+
+    def dangling(ids: Optional[FrozenSet[int]], value: Any) -> bool:
+        return ids is not None and to_int(value) not in ids
+
+    if users is not None:
+        owners: Dict[str, int] = {}
+        for user in users["items"]:
+            employee_no = user.get("employeeNo")
+            if not isinstance(employee_no, str) or not employee_no.strip():
+                continue
+            key = employee_no.strip().lower()
+            if key in owners:
+                out.append(Violation("duplicate_employee_no", "error", USERS_FILENAME, f"工号 {employee_no} 同时属于用户 {owners[key]} 与 {user.get('id')}", id=to_int(user.get("id"))))
+            else:
+                owners[key] = to_int(user.get("id")) or 0
+
+    if orgs is not None:
+        for org in orgs["items"]:
+            parent = org.get("parentId")
+            if parent is not None and dangling(org_ids, parent):
+                out.append(Violation("dangling_org", "warning", ORGS_FILENAME, f"组织 {org.get('id')} 的 parentId={parent!r} 不存在（按树根处理）", id=to_int(org.get("id"))))
+        for problem in compute_closure(OrgUnitsCollection(Path(ORGS_FILENAME), orgs))["problems"]:
+            out.append(Violation("org_cycle", "error", ORGS_FILENAME, problem))
+
+    if memberships is not None:
+        primaries: Dict[int, List[Tuple[str, str, int]]] = {}
+        for index, m in enumerate(memberships["items"]):
+            where = f"第 {index + 1} 条（userId={m.get('userId')!r}）"
+            if dangling(user_ids, m.get("userId")):
+                out.append(Violation("dangling_user", "error", MEMBERSHIPS_FILENAME, f"{where} 用户不存在"))
+            if dangling(org_ids, m.get("orgId")):
+                out.append(Violation("dangling_org", "error", MEMBERSHIPS_FILENAME, f"{where} orgId={m.get('orgId')!r} 不存在"))
+            start, end = m.get("startDate") or None, m.get("endDate") or None
+            if (start and not _valid_day(start)) or (end and not _valid_day(end)):
+                out.append(Violation("invalid_date", "warning", MEMBERSHIPS_FILENAME, f"{where} 日期无法解析（永不生效）"))
+                continue
+            uid = to_int(m.get("userId"))
+            if m.get("isPrimary") and uid is not None:
+                primaries.setdefault(uid, []).append((start or "0001-01-01", end or MAX_DAY, index + 1))
+        for uid, spans in sorted(primaries.items()):
+            spans.sort()
+            for (s1, e1, n1), (s2, e2, n2) in zip(spans, spans[1:]):
+                if s2 <= e1:
+                    out.append(Violation("primary_overlap", "error", MEMBERSHIPS_FILENAME, f"用户 {uid} 的主属任职第 {n1} 条（{s1}~{e1}）与第 {n2} 条（{s2}~{e2}）重叠", id=uid))
+
+    if grants is not None:
+        for g in grants["items"]:
+            gid = to_int(g.get("id"))
+            if dangling(user_ids, g.get("granteeUserId")):
+                out.append(Violation("dangling_user", "error", ROLE_GRANTS_FILENAME, f"授权 {gid} 的 granteeUserId={g.get('granteeUserId')!r} 不存在", id=gid))
+            if dangling(role_ids, g.get("roleId")):
+                out.append(Violation("dangling_role", "error", ROLE_GRANTS_FILENAME, f"授权 {gid} 的 roleId={g.get('roleId')!r} 不存在", id=gid))
+            if g.get("domainOrgId") is not None and dangling(org_ids, g.get("domainOrgId")):
+                out.append(Violation("dangling_org", "error", ROLE_GRANTS_FILENAME, f"授权 {gid} 的 domainOrgId={g.get('domainOrgId')!r} 不存在", id=gid))
+
+
+def _leftover_files(data_dir: Path, tmp_age: float, out: List[Violation]) -> List[Path]:
+    now = time.time()
+    found: List[Path] = []
+    for root, _dirs, files in os.walk(data_dir):
+        for name in files:
+            path = Path(root) / name
+            if TMP_PATTERN.search(name):
+                code, limit, text = "orphan_tmp", tmp_age, "写入中断遗留的临时文件"
+            elif name.endswith(".lock"):
+                code, limit, text = "stale_lock", LOCK_STALE_AFTER, "过期的锁文件"
+            else:
+                continue
+            try:
+                age = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age >= limit:
+                out.append(Violation(code, "warning", path.relative_to(data_dir).as_posix(), f"{text}（{age / 3600:.1f} 小时前）", repairable=True))
+                found.append(path)
+    return found
+
+
+# --- 入口 ---
+
+
+def run_fsck(data_dir: Path, *, workers: Optional[int] = None, repair: bool = False, backup: bool = True, tmp_age: float = 300.0) -> Dict[str, Any]:
+    data_dir = Path(data_dir)
+    started = time.perf_counter()
+    violations: List[Violation] = []
+    loaded = _check_collections(data_dir, violations)
+    _check_references(loaded, violations)
+    leftovers = _leftover_files(data_dir, tmp_age, violations)
+
+    user_dir = data_dir / WORK_ITEMS_DIRNAME / "user"
+    user_ids = work_item_user_ids(user_dir)
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(user_ids) // (workers * 8))
+    owners: Dict[int, int] = {}
+    max_item_id = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(_ids(loaded[ORGS_FILENAME]), _ids(loaded[USERS_FILENAME]))) as pool:
+        for uid, found, ids in pool.map(_check_user, [(str(data_dir), str(user_dir), uid) for uid in user_ids], chunksize=chunksize):
+            violations.extend(found)
+            for item_id in ids:
+                if item_id in owners and owners[item_id] != uid:
+                    violations.append(Violation("duplicate_id", "error", f"{WORK_ITEMS_DIRNAME}/user", f"工作项 id {item_id} 同时属于用户 {owners[item_id]} 与 {uid}", id=item_id))
+                owners.setdefault(item_id, uid)
+                max_item_id = max(max_item_id, item_id)
+
+        allocator = IdAllocator(data_dir)
+        meta_rel = allocator.meta_path.relative_to(data_dir).as_posix()
+        try:
+            meta_last = allocator.last_id()
+        except ValueError as e:
+            violations.append(Violation("parse_error", "error", meta_rel, f"无法解析：{e}"))
+            meta_last = None
+        if meta_last is not None and meta_last < max_item_id:
+            violations.append(Violation("last_id_low", "error", meta_rel, f"lastId={meta_last} 小于工作项最大 id {max_item_id}，新建工作项会与已有 id 冲突", repairable=True))
+
+        if repair:
+            _repair(data_dir, violations, leftovers, pool, allocator, max_item_id, backup=backup)
+
+    return {
+        "dataDir": str(data_dir),
+        "users": len(user_ids),
+        "elapsed": round(time.perf_counter() - started, 3),
+        "errors": sum(1 for v in violations if v.severity == "error" and not v.repaired),
+        "warnings": sum(1 for v in violations if v.severity == "warning" and not v.repaired),
+        "repaired": sum(1 for v in violations if v.repaired),
+        "violations": [asdict(v) for v in violations],
+    }
+
+
+def _repair(
+    data_dir: Path,
+    violations: List[Violation],
+    leftovers: Iterable[Path],
+    pool: ProcessPoolExecutor,
+    allocator: IdAllocator,
+    max_item_id: int,
+    *,
+    backup: bool,
+) -> None:
+    fixable = [v for v in violations if v.repairable]
+    if not fixable:
+        return
+    user_prefix = f"{WORK_ITEMS_DIRNAME}/user/"
+    users_to_fix = sorted({
+        uid for uid in (to_int(v.path[len(user_prefix):].split("/")[0].split(".")[0]) for v in fixable if v.path.startswith(user_prefix)) if uid is not None
+    })
+    collections_to_fix = sorted({v.path for v in fixable if v.code == "last_id_low" and v.path in COLLECTION_FILENAMES})
+    if backup:
+        user_dir = data_dir / WORK_ITEMS_DIRNAME / "user"
+        paths = [data_dir / name for name in collections_to_fix] + [p for uid in users_to_fix for p in work_item_files(user_dir, uid)]
+        if any(v.code == "last_id_low" and v.path == allocator.meta_path.relative_to(data_dir).as_posix() for v in fixable):
+            paths.append(allocator.meta_path)
+        snapshot_files(paths, note="fsck --repair")
+
+    # 修复后复查仍存在的问题；只有实际处理过且复查时已消失的才记为 repaired
+    remaining: Set[ViolationKey] = set()
+    attempted: Set[str] = set()
+    for path in leftovers:
+        rel = path.relative_to(data_dir).as_posix()
+        try:
+            # 先于下面的加锁修复处理（file_lock 会接管过期锁）；扫描之后锁可能已被新的持有者重新创建，只删除仍然过期的
+            if path.name.endswith(".lock") and time.time() - path.stat().st_mtime < LOCK_STALE_AFTER:
+                continue
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        attempted.add(rel)
+
+    for name in collections_to_fix:
+        path = data_dir / name
+        with file_lock(path):
+            data = read_collection(path)
+            data["meta"]["lastId"] = max(to_int(i.get("id")) or 0 for i in data["items"] if isinstance(i, dict))
+            write_json(path, data, lock=False)
+            recheck: List[Violation] = []
+            data = _load(path, name, recheck)
+            if data is not None:
+                _check_ids(data["items"], data["meta"], name, recheck, required=name not in (MEMBERSHIPS_FILENAME,))
+        remaining.update(v.key for v in recheck)
+        attempted.add(name)
+
+    meta_rel = allocator.meta_path.relative_to(data_dir).as_posix()
+    if any(v.path == meta_rel for v in fixable):
+        allocator.advance_to(max_item_id)
+        attempted.add(meta_rel)
+        if allocator.last_id() < max_item_id:
+            remaining.update(v.key for v in fixable if v.path == meta_rel)
+
+    user_dir = data_dir / WORK_ITEMS_DIRNAME / "user"
+    fixed_users: Set[int] = set()
+    for uid, still in pool.map(_repair_user, [(str(data_dir), str(user_dir), uid) for uid in users_to_fix]):
+        if still is None:
+            continue
+        remaining.update(still)
+        fixed_users.add(uid)
+
+    for v in fixable:
+        uid = to_int(v.path[len(user_prefix):].split("/")[0].split(".")[0]) if v.path.startswith(user_prefix) else None
+        handled = v.path in attempted or (uid is not None and uid in fixed_users and v.code not in ("orphan_tmp", "stale_lock"))
+        v.repaired = handled and v.key not in remaining
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="检查 data/ 目录的一致性")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--repair", action="store_true", help="自动修复可安全处理的问题")
+    parser.add_argument("--no-backup", action="store_true", help="修复前不备份要改写的文件")
+    parser.add_argument("--tmp-age", type=float, default=300.0, help="超过该秒数的 *.tmp-* 才视为遗留（默认 300）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    result = run_fsck(args.data_dir, workers=args.workers, repair=args.repair, backup=not args.no_backup, tmp_age=args.tmp_age)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        for v in result["violations"]:
+            mark = "repaired" if v["repaired"] else v["severity"]
+            suffix = "（可 --repair）" if v["repairable"] and not v["repaired"] else ""
+            print(f"[{mark}] {v['code']} {v['path']}: {v['message']}{suffix}")
+        print(
+            f"检查 {result['users']} 个用户的工作项，error {result['errors']}，warning {result['warnings']}，"
+            f"已修复 {result['repaired']}（{result['elapsed']:.1f}s）"
+        )
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
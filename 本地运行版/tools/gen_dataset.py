@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成规模可调的合成 data/ 目录，用于压测与容量评估。
+
+生成内容（格式与 server 写出的一致）：
+- org_units.json：根组织 + 领导层 + depth 层、每层 fanout 个子部门的组织树；
+- users.json：N 个用户（工号 G000001 起，无 passwordHash，登录不校验密码），约 3% 已停用；
+  每个部门的第一个人为负责人，visibleUserIds 为其子树内全部用户；
+- user_org_memberships.json：每人 1~3 段首尾相接的主属记录（调岗历史），最后一段 endDate 为 null；
+  停用用户的最后一段在停用日结束；
+- roles.json / role_grants.json：sys_admin 与 leadership 两个角色，1 号用户为管理员，领导层成员有 leadership；
+- work_items/user/<id>.json：每人最近 M 个月每个工作日 1~3 条完成项，多数日子附带一条次日计划，
+  orgId 为当天生效的主属组织；id 经 id_allocator 一次租用，work_items/meta.json 的 lastId 为最大 id；
+- audit_logs.json：可选的 --audit-entries 条历史登录/查询记录。
+
+工作项按用户分发到进程池并行生成、写入。每个用户使用独立的随机数种子（seed + userId），
+id 先按用户顺序分配连续区间，因此结果与 --workers 数无关：同一 seed 与 --end 重复生成时，
+work_items/user/ 下的工作项文件与 user_org_memberships.json、audit_logs.json 逐字节一致；
+组织、用户、角色与授权的 createdAt/updatedAt 取生成时刻，work_items/meta.json 的租用记录带租用时间，这些字段每次不同。
+
+用法
+  python tools/gen_dataset.py --out /tmp/data-10k --users 10000 --months 24
+  python tools/gen_dataset.py --out /tmp/data-1k --users 1000 --depth 4 --fanout 4 --workers 8 --seed 7
+  DATA_DIR=/tmp/data-10k npm start        # 让 server 读取生成的数据
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from data_store import DATA_DIR
+from id_allocator import IdAllocator
+from json_writer import write_json
+
+WORK_TYPES = ("done", "done", "done", "progress", "temp", "assist")
+DURATIONS = (None, 30, 60, 90, 120, 180, 240)
+TITLES = ("整理资料", "现场巡检", "编制方案", "参加例会", "对接设计", "核对工程量", "安全检查", "材料验收", "编写周报", "协调分包")
+PLAN_PROBABILITY = 0.8
+INACTIVE_RATIO = 0.03
+
+# (orgId, startDate, endDate)
+Period = Tuple[int, str, Optional[str]]
+
+
+@dataclass
+class UserPlan:
+    user_id: int
+    periods: List[Period]
+    first_id: int = 0
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _write(path: Path, payload: Any) -> None:
+    # 生成的数据可随时重建，不必 fsync；也没有其它写者，不加锁
+    write_json(path, payload, lock=False, fsync=False)
+
+
+# --- 组织、用户、任职 ---
+
+def build_org_tree(depth: int, fanout: int, now: str) -> Tuple[List[Dict[str, Any]], List[int], int]:
+    """返回 (orgs, 可分配人员的组织 id, 领导层 id)。"""
+    orgs = [{"id": 1, "name": "项目部", "parentId": None, "type": "root", "active": True, "createdAt": now, "updatedAt": now}]
+    leadership_id = 2
+    orgs.append({"id": leadership_id, "name": "领导层", "parentId": 1, "type": "leadership", "active": True, "createdAt": now, "updatedAt": now})
+    frontier = [(1, "")]
+    for _level in range(depth):
+        next_frontier = []
+        for parent_id, prefix in frontier:
+            for i in range(1, fanout + 1):
+                oid = len(orgs) + 1
+                label = f"{prefix}{i:02d}" if not prefix else f"{prefix}-{i:02d}"
+                orgs.append({
+                    "id": oid,
+                    "name": f"部门{label}",
+                    "parentId": parent_id,
+                    "type": "department",
+                    "active": True,
+                    "createdAt": now,
+                    "updatedAt": now,
+                })
+                next_frontier.append((oid, label))
+        frontier = next_frontier
+    assignable = [o["id"] for o in orgs if o["type"] != "root"]
+    return orgs, assignable, leadership_id
+
+
+def plan_periods(rng: random.Random, orgs: Sequence[int], start: date, end: date, deactivated: Optional[date]) -> List[Period]:
+    """1~3 段首尾相接的主属任职；每段至少 30 天。"""
+    span = (end - start).days
+    cuts = sorted(rng.sample(range(30, span - 30), k=rng.randint(0, 2))) if span > 120 else []
+    bounds = [start] + [start + timedelta(days=c) for c in cuts] + [None]
+    periods: List[Period] = []
+    org = rng.choice(orgs)
+    for i in range(len(bounds) - 1):
+        begin = bounds[i]
+        finish = bounds[i + 1] - timedelta(days=1) if bounds[i + 1] is not None else None
+        if deactivated is not None and (finish is None or finish > deactivated):
+            finish = deactivated
+        periods.append((org, begin.isoformat(), finish.isoformat() if finish else None))
+        if finish is not None and finish == deactivated:
+            break
+        org = rng.choice([o for o in orgs if o != org] or orgs)
+    return periods
+
+
+def subtree_members(orgs: List[Dict[str, Any]], current_org: Dict[int, int]) -> Dict[int, List[int]]:
+    children: Dict[Optional[int], List[int]] = {}
+    for org in orgs:
+        children.setdefault(org["parentId"], []).append(org["id"])
+    direct: Dict[int, List[int]] = {}
+    for uid, oid in current_org.items():
+        direct.setdefault(oid, []).append(uid)
+    result: Dict[int, List[int]] = {}
+
+    def walk(oid: int) -> List[int]:
+        members = list(direct.get(oid, []))
+        for child in children.get(oid, []):
+            members.extend(walk(child))
+        result[oid] = members
+        return members
+
+    walk(1)
+    return result
+
+
+# --- 工作项（进程池） ---
+
+def _workdays(periods: Sequence[Period], first: date, end: date) -> Iterator[Tuple[date, int]]:
+    for org_id, start, finish in periods:
+        day = max(date.fromisoformat(start), first)
+        last = min(date.fromisoformat(finish), end) if finish else end
+        while day <= last:
+            if day.weekday() < 5:
+                yield day, org_id
+            day += timedelta(days=1)
+
+
+def _day_counts(seed: int, user_id: int, periods: Sequence[Period], first: date, end: date) -> List[Tuple[date, int, int, bool]]:
+    """(日期, orgId, 完成项数, 是否有计划)；单独的随机数流，只决定条数，供先行分配 id。"""
+    rng = random.Random(f"{seed}:shape:{user_id}")
+    return [(day, org_id, rng.randint(1, 3), rng.random() < PLAN_PROBABILITY) for day, org_id in _workdays(periods, first, end)]
+
+
+def count_items(task: Tuple[int, int, List[Period], date, date]) -> int:
+    seed, user_id, periods, first, end = task
+    return sum(n + (1 if plan else 0) for _day, _org, n, plan in _day_counts(seed, user_id, periods, first, end))
+
+
+def write_user_items(task: Tuple[int, int, int, List[Period], date, date, str]) -> int:
+    seed, user_id, first_id, periods, first, end, out_dir = task
+    rng = random.Random(f"{seed}:items:{user_id}")
+    items = []
+    next_id = first_id
+    for day, org_id, done, plan in _day_counts(seed, user_id, periods, first, end):
+        stamp = f"{day.isoformat()}T{rng.randint(9, 18):02d}:{rng.randint(0, 59):02d}:00.000Z"
+        kinds = [rng.choice(WORK_TYPES) for _ in range(done)] + (["plan"] if plan else [])
+        for kind in kinds:
+            work_date = day + timedelta(days=1) if kind == "plan" else day
+            items.append({
+                "id": next_id,
+                "creatorId": user_id,
+                "createdAt": stamp,
+                "updatedAt": stamp,
+                "orgId": org_id,
+                "workDate": work_date.isoformat(),
+                "title": rng.choice(TITLES),
+                "type": kind,
+                "durationMinutes": rng.choice(DURATIONS) if kind != "plan" else None,
+                "tags": [],
+                "detail": None,
+            })
+            next_id += 1
+    last_id = next_id - 1 if items else 0
+    _write(Path(out_dir) / "work_items" / "user" / f"{user_id}.json", {"meta": {"lastId": last_id}, "items": items})
+    return len(items)
+
+
+# --- 入口 ---
+
+def generate(
+    out: Path,
+    *,
+    users: int,
+    months: int,
+    depth: int = 3,
+    fanout: int = 4,
+    seed: int = 1,
+    workers: Optional[int] = None,
+    end: Optional[date] = None,
+    audit_entries: int = 0,
+    log: bool = True,
+) -> Dict[str, int]:
+    """在 out 下生成完整的 data/ 目录，返回统计。"""
+    out = Path(out)
+    end = end or date.today()
+    history_start = end - timedelta(days=round(months * 30.44))
+    now = utc_now_iso()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    orgs, assignable, leadership_id = build_org_tree(depth, fanout, now)
+
+    plans: List[UserPlan] = []
+    user_items: List[Dict[str, Any]] = []
+    memberships: List[Dict[str, Any]] = []
+    current_org: Dict[int, int] = {}
+    for uid in range(1, users + 1):
+        joined = history_start - timedelta(days=rng.randint(0, 365)) if rng.random() < 0.7 else history_start + timedelta(days=rng.randint(0, max(0, (end - history_start).days - 30)))
+        deactivated = end - timedelta(days=rng.randint(1, 180)) if uid > 1 and rng.random() < INACTIVE_RATIO else None
+        if deactivated is not None and deactivated <= joined:
+            deactivated = None
+        targets = [leadership_id] if uid <= max(1, users // 100) else [o for o in assignable if o != leadership_id]
+        periods = plan_periods(rng, targets, joined, end, deactivated)
+        plans.append(UserPlan(uid, periods))
+        current_org[uid] = periods[-1][0]
+        for org_id, start, finish in periods:
+            memberships.append({"userId": uid, "orgId": org_id, "isPrimary": True, "startDate": start, "endDate": finish})
+        user_items.append({
+            "id": uid,
+            "employeeNo": f"G{uid:06d}",
+            "name": f"用户{uid:06d}",
+            "email": None,
+            "phone": None,
+            "jobTitle": None,
+            "active": deactivated is None,
+            "passwordHash": None,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+    # 每个部门的第一个人（按 id）作为负责人，可见其子树内所有用户；1 号管理员可见全部
+    members = subtree_members(orgs, current_org)
+    leaders: Dict[int, int] = {}
+    for uid, oid in current_org.items():
+        leaders.setdefault(oid, uid)
+    for oid, uid in leaders.items():
+        user_items[uid - 1]["visibleUserIds"] = sorted(set(members.get(oid, [])) | {uid})
+    user_items[0]["visibleUserIds"] = list(range(1, users + 1))
+
+    roles = [
+        {"id": 1, "code": "sys_admin", "name": "系统管理员", "createdAt": now, "updatedAt": now},
+        {"id": 2, "code": "leadership", "name": "领导", "createdAt": now, "updatedAt": now},
+    ]
+    grants = [{"id": 1, "granteeUserId": 1, "roleId": 1, "domainOrgId": 1, "scope": "subtree", "startDate": history_start.isoformat(), "endDate": None, "createdAt": now, "updatedAt": now}]
+    for plan in plans:
+        if plan.periods[0][0] == leadership_id and plan.user_id != 1:
+            grants.append({
+                "id": len(grants) + 1,
+                "granteeUserId": plan.user_id,
+                "roleId": 2,
+                "domainOrgId": 1,
+                "scope": "subtree",
+                "startDate": plan.periods[0][1],
+                "endDate": plan.periods[-1][2],
+                "createdAt": now,
+                "updatedAt": now,
+            })
+
+    if out.exists():
+        shutil.rmtree(out / "work_items", ignore_errors=True)
+    _write(out / "org_units.json", {"meta": {"lastId": len(orgs)}, "items": orgs})
+    _write(out / "users.json", {"meta": {"lastId": users}, "items": user_items})
+    _write(out / "user_org_memberships.json", {"meta": {"lastId": len(memberships)}, "items": memberships})
+    _write(out / "roles.json", {"meta": {"lastId": len(roles)}, "items": roles})
+    _write(out / "role_grants.json", {"meta": {"lastId": len(grants)}, "items": grants})
+    _write(out / "settings.json", {"titleMaxLength": 40})
+    _write(out / "suggestions.json", {"meta": {"lastId": 0}, "items": []})
+    _write(out / "audit_logs.json", {"meta": {"lastId": audit_entries}, "items": _audit_entries(rng, audit_entries, users, history_start, end)})
+    (out / "work_items" / "user").mkdir(parents=True, exist_ok=True)
+    if log:
+        print(f"[INFO] 组织 {len(orgs)}，用户 {users}，任职记录 {len(memberships)}（{time.perf_counter() - started:.1f}s）")
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, users // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(count_items, [(seed, p.user_id, p.periods, history_start, end) for p in plans], chunksize=chunksize))
+        # 一次租下全部 id：meta.json 只写一次（新目录中从 1 开始，结果仍与 seed 绑定）
+        next_id = IdAllocator(out).lease(sum(counts), owner="gen_dataset").first if sum(counts) else 1
+        if not sum(counts):
+            _write(out / "work_items" / "meta.json", {"lastId": 0})
+        for plan, count in zip(plans, counts):
+            plan.first_id = next_id
+            next_id += count
+        tasks = [(seed, p.user_id, p.first_id, p.periods, history_start, end, str(out)) for p in plans]
+        total = sum(pool.map(write_user_items, tasks, chunksize=chunksize))
+    if log:
+        print(f"[INFO] 工作项 {total} 条，{workers} 个进程（共 {time.perf_counter() - started:.1f}s）")
+    return {"orgs": len(orgs), "users": users, "memberships": len(memberships), "workItems": total}
+
+
+def _audit_entries(rng: random.Random, count: int, users: int, start: date, end: date) -> List[Dict[str, Any]]:
+    span = max(1, int((datetime.combine(end, datetime.min.time()) - datetime.combine(start, datetime.min.time())).total_seconds()))
+    base = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+    stamps = sorted(rng.randrange(span) for _ in range(count))
+    entries = []
+    for i, offset in enumerate(stamps, start=1):
+        action = rng.choice(("login", "login", "list", "report_daily_overview", "report_weekly_overview"))
+        entries.append({
+            "id": i,
+            "actorUserId": rng.randint(1, users),
+            "action": action,
+            "objectType": "user" if action == "login" else "work_item",
+            "createdAt": (base + timedelta(seconds=offset)).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        })
+    return entries
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="生成合成 data/ 目录")
+    parser.add_argument("--out", type=Path, required=True, help="输出目录（不能是正式的 data/）")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--months", type=int, default=12, help="每人最近 M 个月的工作项")
+    parser.add_argument("--depth", type=int, default=3, help="部门层级数（根组织以下）")
+    parser.add_argument("--fanout", type=int, default=4, help="每个部门的子部门数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--end", default=None, help="历史截止日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--audit-entries", type=int, default=0, help="audit_logs.json 中预置的历史记录条数")
+    parser.add_argument("--force", action="store_true", help="输出目录非空时也覆盖")
+    opts = parser.parse_args(argv)
+    if opts.users < 1 or opts.months < 0 or opts.depth < 1 or opts.fanout < 1:
+        parser.error("--users/--depth/--fanout 必须为正数，--months 不能为负")
+    return opts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    opts = parse_args(argv)
+    out = opts.out.resolve()
+    if out == DATA_DIR.resolve():
+        print("[ERROR] 不能覆盖正式 data/ 目录，请指定其它输出目录。")
+        return 2
+    if out.exists() and any(out.iterdir()) and not opts.force:
+        print(f"[ERROR] {out} 非空，加 --force 覆盖。")
+        return 2
+    try:
+        end = date.fromisoformat(opts.end) if opts.end else None
+    except ValueError:
+        print("[ERROR] --end 必须为 YYYY-MM-DD")
+        return 2
+    stats = generate(
+        out,
+        users=opts.users,
+        months=opts.months,
+        depth=opts.depth,
+        fanout=opts.fanout,
+        seed=opts.seed,
+        workers=opts.workers,
+        end=end,
+        audit_entries=opts.audit_entries,
+    )
+    print(f"Completed. {stats['users']} users, {stats['orgs']} orgs, {stats['workItems']} work items -> {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作项全局 id 分配：在 data/work_items/meta.json 上按块租用 id。
+
+server 的 nextWorkItemId 每新建一条工作项就读写一次 meta.json；批量导入若也逐条分配，
+百万行就是百万次元数据写入，且与 server 之间没有互斥。这里改为一次租用一整块：
+- 持有 `meta.json.lock`（json_writer.file_lock，server 的 nextWorkItemId 使用同一把锁）读-改-写，
+  lastId 直接推进到块尾，块内 id 由调用方在进程内自行使用，不再触碰 meta.json；
+- 每次租用记录在 meta.json 的 leases 中（owner、区间、时间），只保留最近 MAX_LEASES 条；
+- 用不完的尾部可以 release 归还：仅当该块仍是最后分配的区间（lastId 未被他人推进）时回退 lastId，
+  否则保留空洞，id 不会重复分配。
+
+meta.json 形如：
+  {"lastId": 12000, "leases": [{"owner": "import_work_items", "first": 11001, "last": 12000, "at": "..."}]}
+
+用法
+    from id_allocator import IdAllocator
+
+    ids = IdAllocator().block(owner="import_work_items", size=1000)
+    for row in rows:
+        row["id"] = ids.next()      # 块用完时自动再租一块
+    ids.close()                     # 归还未用完的尾部
+
+    python tools/id_allocator.py status
+    python tools/id_allocator.py lease 5000 --owner backfill
+    python tools/id_allocator.py release 7001 12000 --owner backfill
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from data_store import DATA_DIR, WORK_ITEMS_DIRNAME, to_int
+from json_writer import file_lock, write_json
+
+META_FILENAME = "meta.json"
+DEFAULT_BLOCK = 1000
+MAX_LEASES = 50
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+@dataclass
+class Lease:
+    owner: str
+    first: int
+    last: int
+
+    def __len__(self) -> int:
+        return self.last - self.first + 1
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.first, self.last + 1))
+
+
+class IdAllocator:
+    """work_items/meta.json 的 id 分配器；每次调用只做一次加锁的读-改-写。"""
+
+    def __init__(self, data_dir: Path = DATA_DIR, *, lock_timeout: float = 10.0) -> None:
+        self.data_dir = Path(data_dir)
+        self.meta_path = self.data_dir / WORK_ITEMS_DIRNAME / META_FILENAME
+        self.lock_timeout = lock_timeout
+
+    def read_meta(self) -> Dict[str, Any]:
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            meta = {}
+        if not isinstance(meta, dict):
+            raise ValueError(f"{self.meta_path} 不是对象")
+        meta["lastId"] = to_int(meta.get("lastId")) or 0
+        return meta
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        # 调用方已持有锁
+        meta["leases"] = list(meta.get("leases") or [])[-MAX_LEASES:]
+        write_json(self.meta_path, meta, lock=False)
+
+    def last_id(self) -> int:
+        return self.read_meta()["lastId"]
+
+    def lease(self, count: int, owner: str = "tools") -> Lease:
+        """租用连续的 count 个 id，lastId 推进到块尾。"""
+        if count < 1:
+            raise ValueError("count 必须为正数")
+        with file_lock(self.meta_path, timeout=self.lock_timeout):
+            meta = self.read_meta()
+            lease = Lease(owner, meta["lastId"] + 1, meta["lastId"] + count)
+            meta["lastId"] = lease.last
+            meta.setdefault("leases", []).append({"owner": owner, "first": lease.first, "last": lease.last, "at": utc_now_iso()})
+            self._write_meta(meta)
+        return lease
+
+    def release(self, lease: Lease, used_through: int) -> int:
+        """归还 lease 中 used_through 之后未使用的 id；返回实际归还的个数。
+
+        只有 lastId 仍等于块尾时才能回退，否则之后已有人分配，尾部保留为空洞。
+        """
+        keep = max(lease.first - 1, min(used_through, lease.last))
+        if keep >= lease.last:
+            return 0
+        with file_lock(self.meta_path, timeout=self.lock_timeout):
+            meta = self.read_meta()
+            if meta["lastId"] != lease.last:
+                return 0
+            meta["lastId"] = keep
+            leases = list(meta.get("leases") or [])
+            for entry in reversed(leases):
+                if entry.get("first") == lease.first and entry.get("last") == lease.last:
+                    if keep < lease.first:
+                        leases.remove(entry)
+                    else:
+                        entry["last"] = keep
+                    break
+            meta["leases"] = leases
+            self._write_meta(meta)
+        returned = lease.last - keep
+        lease.last = keep
+        return returned
+
+    def advance_to(self, last_id: int) -> bool:
+        """确保 lastId 不小于 last_id（fsck 修复用）；返回是否有改动。"""
+        with file_lock(self.meta_path, timeout=self.lock_timeout):
+            meta = self.read_meta()
+            if meta["lastId"] >= last_id:
+                return False
+            meta["lastId"] = last_id
+            self._write_meta(meta)
+        return True
+
+    def block(self, owner: str = "tools", size: int = DEFAULT_BLOCK) -> "IdBlock":
+        return IdBlock(self, owner, size)
+
+
+class IdBlock:
+    """按需续租的 id 序列：块用完时再租 size 个，close() 归还最后一块的剩余部分。"""
+
+    def __init__(self, allocator: IdAllocator, owner: str, size: int = DEFAULT_BLOCK) -> None:
+        if size < 1:
+            raise ValueError("size 必须为正数")
+        self.allocator = allocator
+        self.owner = owner
+        self.size = size
+        self.leases: List[Lease] = []
+        self._next = 0
+        self.issued = 0
+
+    def next(self) -> int:
+        current = self.leases[-1] if self.leases else None
+        if current is None or self._next > current.last:
+            current = self.allocator.lease(self.size, self.owner)
+            self.leases.append(current)
+            self._next = current.first
+        value = self._next
+        self._next += 1
+        self.issued += 1
+        return value
+
+    def take(self, count: int) -> List[int]:
+        return [self.next() for _ in range(count)]
+
+    def close(self) -> int:
+        if not self.leases:
+            return 0
+        return self.allocator.release(self.leases[-1], self._next - 1)
+
+    def __enter__(self) -> "IdBlock":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="工作项 id 分配（data/work_items/meta.json）")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="查看 lastId 与最近的租用记录")
+    p = sub.add_parser("lease", help="租用一段连续 id")
+    p.add_argument("count", type=int)
+    p.add_argument("--owner", default="cli")
+    p = sub.add_parser("release", help="归还一段租用的尾部（仅当它仍是最后分配的区间）")
+    p.add_argument("first", type=int, help="租用区间首个 id")
+    p.add_argument("last", type=int, help="租用区间最后一个 id")
+    p.add_argument("--used-through", type=int, default=None, help="已使用到的 id（默认一个都没用）")
+    p.add_argument("--owner", default="cli")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    allocator = IdAllocator(args.data_dir)
+
+    if args.command == "status":
+        meta = allocator.read_meta()
+        print(f"lastId: {meta['lastId']}")
+        for entry in meta.get("leases") or []:
+            print(f"  {entry.get('at', '?')}  {entry.get('owner', '?')}: {entry.get('first')}-{entry.get('last')}")
+        return 0
+
+    if args.command == "lease":
+        if args.count < 1:
+            print("[ERROR] count 必须为正数")
+            return 2
+        lease = allocator.lease(args.count, args.owner)
+        print(f"{lease.first} {lease.last}")
+        return 0
+
+    if args.command == "release":
+        if args.last < args.first:
+            print("[ERROR] last 不能小于 first")
+            return 2
+        used = args.first - 1 if args.used_through is None else args.used_through
+        returned = allocator.release(Lease(args.owner, args.first, args.last), used)
+        if returned:
+            print(f"[updated] 归还 {returned} 个 id，lastId = {allocator.last_id()}")
+        else:
+            print("[INFO] 区间之后已有新的分配（或没有可归还的部分），保留为空洞。")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从 CSV/TSV/Excel 导出批量导入工作项（历史数据回填、部门整体迁入）。
+
+逐条调用 POST /api/work-items 时，每条都要重写一次用户文件、meta.json 与 audit_logs.json；
+这里一次性处理全部输入：
+- 进程池并行读取各输入文件，再按块并行校验；校验规则与 server/services/work.js validateWorkItemInput 相同：
+  标题去空白后非空且不超过 settings.json 的 titleMaxLength 个字符，workDate 为合法的 YYYY-MM-DD，
+  type 为 done/progress/temp/assist/plan（也接受界面上的 完成/推进/临时/协同/计划，空值为 done），
+  durationMinutes 为空或非负整数；
+- orgId 按 workDate 当天生效的主属组织确定（interval_index.MembershipIndex，与 getPrimaryOrgId 一致），
+  当天没有主属组织的行报错；
+- 默认跳过与已有记录（或本次输入中前面的行）workDate、标题、类型都相同的行，重复导入同一文件不会产生重复数据；
+- id 经 id_allocator 一次租用，meta.json 只写一次；按用户分组后每个用户的文件只写一次（分区布局只写涉及的月份），
+  写入前把涉及的文件批量登记到 backups/，最后在 audit_logs.json 追加一条汇总记录。
+任一行有错误时默认不写入任何文件（--skip-invalid 只导入合法的行）。导入期间请先停止服务。
+
+输入首行为表头，列名（不区分大小写）：
+  人员：工号 / 姓名 / 人员 / employeeNo / name（缺省时用 --user 指定全部行的人员）
+  日期 / workDate，标题 / 工作内容 / title，类型 / type，时长 / durationMinutes，标签 / tags（以 , ; | 分隔），详情 / 备注 / detail
+.xlsx 读取第一个工作表，需要 openpyxl。
+
+用法
+  python tools/import_work_items.py 2025-*.csv
+  python tools/import_work_items.py 历史记录.xlsx --dry-run --report import.json
+  python tools/import_work_items.py 张三.csv --user L001 --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from backup_store import snapshot_files
+from data_store import (
+    DATA_DIR,
+    DataStore,
+    read_collection,
+    read_work_items,
+    to_int,
+    work_item_files,
+)
+from id_allocator import IdAllocator
+from interval_index import MembershipIndex
+from json_writer import file_lock, write_json
+from membership_batch import Resolver
+from reshard_work_items import UserStore, describe_partition, group_by_month
+
+ALLOWED_TYPES = ("done", "progress", "temp", "assist", "plan")
+TYPE_LABELS = {"完成": "done", "推进": "progress", "临时": "temp", "协同": "assist", "计划": "plan"}
+DEFAULT_TITLE_MAX = 40
+MAX_TAGS = 20
+CHUNK_ROWS = 5000
+TAG_SEPARATORS = re.compile(r"[,，;；|]")
+
+COLUMNS = {
+    "user": ("工号", "姓名", "人员", "employeeno", "employee_no", "name", "user"),
+    "workDate": ("日期", "工作日期", "workdate", "date"),
+    "title": ("标题", "工作内容", "内容", "title"),
+    "type": ("类型", "type"),
+    "durationMinutes": ("时长", "时长(分钟)", "时长（分钟）", "用时", "durationminutes", "duration"),
+    "tags": ("标签", "tags"),
+    "detail": ("详情", "备注", "detail"),
+}
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+@dataclass
+class ImportRow:
+    source: str
+    line: int
+    user_key: str
+    work_date: str
+    title: str
+    type: str
+    duration_minutes: Optional[int]
+    tags: List[str]
+    detail: Optional[str]
+
+
+@dataclass
+class RowError:
+    source: str
+    line: int
+    error: str
+
+
+@dataclass
+class ImportPlan:
+    # userId -> 待写入的行（输入顺序）
+    rows_by_user: Dict[int, List[Tuple[ImportRow, int]]] = field(default_factory=dict)
+    errors: List[RowError] = field(default_factory=list)
+    duplicates: List[RowError] = field(default_factory=list)
+    total_rows: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(len(rows) for rows in self.rows_by_user.values())
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rows": self.total_rows,
+            "toImport": self.count,
+            "users": len(self.rows_by_user),
+            "errors": [asdict(e) for e in self.errors],
+            "duplicates": [asdict(d) for d in self.duplicates],
+        }
+
+
+# --- 读取与校验（在进程池中执行） ---
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def read_table(path: Path) -> List[List[str]]:
+    """读取整个表格为字符串单元格（CSV/TSV 自动识别分隔符；.xlsx 取第一个工作表）。"""
+    if path.suffix.lower() in (".xlsx", ".xlsm"):
+        try:
+            from openpyxl import load_workbook  # type: ignore
+        except ImportError as e:
+            raise ValueError("读取 .xlsx 需要 openpyxl（pip install openpyxl），或先另存为 CSV") from e
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return [[_cell_text(v) for v in row] for row in workbook.worksheets[0].iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+    text = path.read_text(encoding="utf-8-sig")
+    if path.suffix.lower() == ".tsv":
+        delimiter = "\t"
+    else:
+        first = next((ln for ln in text.splitlines() if ln.strip()), "")
+        delimiter = "\t" if "\t" in first else ","
+    return [[c.strip() for c in cells] for cells in csv.reader(io.StringIO(text), delimiter=delimiter)]
+
+
+def map_columns(header: Sequence[str]) -> Dict[str, int]:
+    lookup = {alias: name for name, aliases in COLUMNS.items() for alias in aliases}
+    mapping: Dict[str, int] = {}
+    for index, cell in enumerate(header):
+        name = lookup.get(cell.strip().lower())
+        if name is not None and name not in mapping:
+            mapping[name] = index
+    return mapping
+
+
+def validate_row(cells: Dict[str, str], title_max: int) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """与 validateWorkItemInput 相同的规则；返回 (规范化后的字段, 错误列表)。"""
+    errors: List[str] = []
+    title = cells.get("title", "").strip()
+    if not title:
+        errors.append("title is required")
+    if len(title) > title_max:
+        errors.append(f"title must be <= {title_max} characters")
+
+    work_date = cells.get("workDate", "")
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", work_date):
+        errors.append("workDate must be YYYY-MM-DD")
+    else:
+        try:
+            date.fromisoformat(work_date)
+        except ValueError:
+            errors.append("invalid workDate")
+
+    raw_type = cells.get("type", "")
+    kind = TYPE_LABELS.get(raw_type, raw_type.lower()) if raw_type else "done"
+    if kind not in ALLOWED_TYPES:
+        errors.append("invalid type")
+
+    duration: Optional[int] = None
+    raw_duration = cells.get("durationMinutes", "")
+    if raw_duration:
+        try:
+            value = float(raw_duration)
+        except ValueError:
+            value = -1.0
+        if not value.is_integer() or value < 0:
+            errors.append("durationMinutes must be a non-negative integer")
+        else:
+            duration = int(value)
+
+    if errors:
+        return None, errors
+    tags = [t.strip() for t in TAG_SEPARATORS.split(cells.get("tags", "")) if t.strip()][:MAX_TAGS]
+    return {
+        "workDate": work_date,
+        "title": title,
+        "type": kind,
+        "durationMinutes": duration,
+        "tags": tags,
+        "detail": cells.get("detail") or None,
+    }, errors
+
+
+def _load_file(task: Tuple[str, Optional[str]]) -> Tuple[str, List[Tuple[int, Dict[str, str]]], Optional[str]]:
+    """读取一个输入文件，按表头映射成 (行号, {列: 值})；返回 (source, rows, 文件级错误)。"""
+    source, default_user = task
+    try:
+        table = read_table(Path(source))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return source, [], str(e)
+    start = next((i for i, cells in enumerate(table) if any(cells)), None)
+    if start is None:
+        return source, [], None
+    mapping = map_columns(table[start])
+    missing = [name for name in ("workDate", "title") if name not in mapping]
+    if "user" not in mapping and not default_user:
+        missing.append("人员（或 --user）")
+    if missing:
+        return source, [], f"缺少列：{', '.join(missing)}"
+    rows = []
+    for offset, cells in enumerate(table[start + 1:], start=start + 2):
+        if not any(cells):
+            continue
+        values = {name: cells[i] if i < len(cells) else "" for name, i in mapping.items()}
+        if not values.get("user"):
+            values["user"] = default_user or ""
+        rows.append((offset, values))
+    return source, rows, None
+
+
+def _validate_chunk(task: Tuple[str, List[Tuple[int, Dict[str, str]]], int]) -> Tuple[List[ImportRow], List[RowError]]:
+    source, rows, title_max = task
+    valid: List[ImportRow] = []
+    errors: List[RowError] = []
+    for line, cells in rows:
+        fields, problems = validate_row(cells, title_max)
+        if not cells.get("user"):
+            problems.append("user is required")
+        if problems or fields is None:
+            errors.append(RowError(source, line, "; ".join(problems)))
+            continue
+        valid.append(ImportRow(
+            source,
+            line,
+            cells["user"],
+            fields["workDate"],
+            fields["title"],
+            fields["type"],
+            fields["durationMinutes"],
+            fields["tags"],
+            fields["detail"],
+        ))
+    return valid, errors
+
+
+def _existing_keys(task: Tuple[str, int, str, str]) -> Tuple[int, Set[Tuple[str, str, str]]]:
+    user_dir, user_id, start, end = task
+    items = read_work_items(Path(user_dir), user_id)["items"]
+    return user_id, {
+        (item.get("workDate"), item.get("title"), item.get("type"))
+        for item in items
+        if isinstance(item.get("workDate"), str) and start <= item["workDate"] <= end
+    }
+
+
+def _write_user(task: Tuple[str, int, List[Dict[str, Any]]]) -> int:
+    """把新记录追加到用户文件：单文件布局写一次，分区布局只写涉及的月份与 manifest。
+
+    整个读-改-写持有 server 的 withWorkItemLock 同一把锁，服务端同时新增的条目不会被覆盖。
+    """
+    user_dir, user_id, records = task
+    store = UserStore(Path(user_dir), user_id)
+    with store.lock():
+        return _append_records(store, records)
+
+
+def _append_records(store: UserStore, records: List[Dict[str, Any]]) -> int:
+    last_id = max(r["id"] for r in records)
+    manifest = store.manifest()
+    if manifest is None:
+        collection = read_collection(store.legacy_path)
+        collection["items"].extend(records)
+        collection["meta"]["lastId"] = max(to_int(collection["meta"].get("lastId")) or 0, last_id)
+        write_json(store.legacy_path, collection, lock=False)
+        return len(records)
+    partitions = dict(manifest.get("partitions") or {})
+    for key, items in group_by_month(records).items():
+        path = store.partition_path(key)
+        collection = read_collection(path)
+        collection["items"].extend(items)
+        collection["meta"]["lastId"] = max(to_int(collection["meta"].get("lastId")) or 0, max(i["id"] for i in items))
+        write_json(path, collection, lock=False)
+        partitions[key] = describe_partition(collection["items"])
+    meta = dict(manifest.get("meta") or {"lastId": 0})
+    meta["lastId"] = max(to_int(meta.get("lastId")) or 0, last_id)
+    store.write_manifest(meta, partitions, lock=False)
+    return len(records)
+
+
+# --- 计划与写入 ---
+
+
+def title_max_length(data_dir: Path) -> int:
+    try:
+        settings = json.loads((data_dir / "settings.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return DEFAULT_TITLE_MAX
+    return to_int(settings.get("titleMaxLength")) or DEFAULT_TITLE_MAX
+
+
+def plan_import(
+    store: DataStore,
+    sources: Sequence[Path],
+    pool: ProcessPoolExecutor,
+    *,
+    default_user: Optional[str] = None,
+    match: str = "auto",
+    allow_duplicates: bool = False,
+) -> ImportPlan:
+    plan = ImportPlan()
+    title_max = title_max_length(store.data_dir)
+
+    chunks: List[Tuple[str, List[Tuple[int, Dict[str, str]]], int]] = []
+    for source, rows, error in pool.map(_load_file, [(str(p), default_user) for p in sources]):
+        if error:
+            plan.errors.append(RowError(source, 0, error))
+        plan.total_rows += len(rows)
+        for i in range(0, len(rows), CHUNK_ROWS):
+            chunks.append((source, rows[i:i + CHUNK_ROWS], title_max))
+
+    valid: List[ImportRow] = []
+    for rows, errors in pool.map(_validate_chunk, chunks):
+        valid.extend(rows)
+        plan.errors.extend(errors)
+
+    resolver = Resolver(store, match=match)
+    memberships = MembershipIndex(store.memberships)
+    user_cache: Dict[str, List[int]] = {}
+    for row in valid:
+        ids = user_cache.get(row.user_key)
+        if ids is None:
+            ids = user_cache[row.user_key] = resolver.user_ids(row.user_key)
+        if len(ids) != 1:
+            plan.errors.append(RowError(row.source, row.line, f"{'ambiguous' if ids else 'unknown'} user: {row.user_key}"))
+            continue
+        org_id = memberships.primary_org(ids[0], row.work_date)
+        if org_id is None:
+            plan.errors.append(RowError(row.source, row.line, "no primary org for user"))
+            continue
+        plan.rows_by_user.setdefault(ids[0], []).append((row, org_id))
+
+    if not allow_duplicates and plan.rows_by_user:
+        tasks = []
+        for uid, rows in plan.rows_by_user.items():
+            dates = [row.work_date for row, _org in rows]
+            tasks.append((str(store.work_items_dir / "user"), uid, min(dates), max(dates)))
+        existing = dict(pool.map(_existing_keys, tasks))
+        for uid in list(plan.rows_by_user):
+            seen = existing.get(uid, set())
+            kept = []
+            for row, org_id in plan.rows_by_user[uid]:
+                key = (row.work_date, row.title, row.type)
+                if key in seen:
+                    plan.duplicates.append(RowError(row.source, row.line, f"duplicate: {row.work_date} {row.title}"))
+                    continue
+                seen.add(key)
+                kept.append((row, org_id))
+            if kept:
+                plan.rows_by_user[uid] = kept
+            else:
+                del plan.rows_by_user[uid]
+    plan.errors.sort(key=lambda e: (e.source, e.line))
+    plan.duplicates.sort(key=lambda e: (e.source, e.line))
+    return plan
+
+
+def apply_import(
+    store: DataStore,
+    plan: ImportPlan,
+    pool: ProcessPoolExecutor,
+    *,
+    sources: Sequence[Path] = (),
+    backup: bool = True,
+) -> Dict[str, Any]:
+    """一次租用 id，批量备份涉及的文件，每个用户写一次，最后追加一条审计记录。"""
+    user_dir = store.work_items_dir / "user"
+    user_ids = sorted(plan.rows_by_user)
+    if backup:
+        snapshot_files([p for uid in user_ids for p in work_item_files(user_dir, uid)], note="import_work_items")
+
+    lease = IdAllocator(store.data_dir).lease(plan.count, owner="import_work_items")
+    next_id = lease.first
+    now = utc_now_iso()
+    tasks = []
+    for uid in user_ids:
+        records = []
+        for row, org_id in plan.rows_by_user[uid]:
+            records.append({
+                "id": next_id,
+                "creatorId": uid,
+                "createdAt": now,
+                "updatedAt": now,
+                "orgId": org_id,
+                "workDate": row.work_date,
+                "title": row.title,
+                "type": row.type,
+                "durationMinutes": row.duration_minutes,
+                "tags": row.tags,
+                "detail": row.detail,
+            })
+            next_id += 1
+        tasks.append((str(user_dir), uid, records))
+    written = sum(pool.map(_write_user, tasks, chunksize=max(1, len(tasks) // 64)))
+
+    audit_path = store.data_dir / "audit_logs.json"
+    # server 的 appendAuditLog 与 report_cache 持有同一把 audit_logs.json.lock，读-改-写须整体在锁内
+    with file_lock(audit_path):
+        audit = read_collection(audit_path)
+        audit["meta"]["lastId"] = (to_int(audit["meta"].get("lastId")) or 0) + 1
+        audit["items"].append({
+            "id": audit["meta"]["lastId"],
+            "createdAt": now,
+            "actorUserId": None,
+            "action": "import_work_items",
+            "objectType": "work_item",
+            "detail": {
+                "sources": [Path(s).name for s in sources],
+                "count": written,
+                "users": len(user_ids),
+                "firstId": lease.first,
+                "lastId": lease.last,
+            },
+        })
+        write_json(audit_path, audit, lock=False)
+    return {"count": written, "users": len(user_ids), "firstId": lease.first, "lastId": lease.last}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="从 CSV/TSV/Excel 批量导入工作项")
+    parser.add_argument("inputs", type=Path, nargs="+", help="CSV/TSV/.xlsx 文件（首行为表头）")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--user", default=None, help="没有人员列（或为空）的行归属的人员：工号或姓名")
+    parser.add_argument("--match", choices=["auto", "name", "employeeNo"], default="auto", help="人员列的匹配方式")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--allow-duplicates", action="store_true", help="不跳过与已有记录日期、标题、类型相同的行")
+    parser.add_argument("--skip-invalid", action="store_true", help="有错误的行跳过，其余照常导入")
+    parser.add_argument("--dry-run", action="store_true", help="只校验并输出统计，不写文件")
+    parser.add_argument("--report", type=Path, default=None, help="把校验结果另存为 JSON")
+    parser.add_argument("--no-backup", action="store_true", help="写入前不备份涉及的用户文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = DataStore(args.data_dir, use_cache=False)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count() or 1) as pool:
+        plan = plan_import(
+            store,
+            args.inputs,
+            pool,
+            default_user=args.user,
+            match=args.match,
+            allow_duplicates=args.allow_duplicates,
+        )
+        for error in plan.errors[:50]:
+            print(f"[error] {error.source}:{error.line}: {error.error}")
+        if len(plan.errors) > 50:
+            print(f"[error] ……另有 {len(plan.errors) - 50} 条错误（--report 查看全部）")
+        print(
+            f"[INFO] 读取 {plan.total_rows} 行，可导入 {plan.count} 条（{len(plan.rows_by_user)} 人），"
+            f"错误 {len(plan.errors)}，重复跳过 {len(plan.duplicates)}（{time.perf_counter() - started:.1f}s）"
+        )
+        if args.report:
+            args.report.write_text(json.dumps(plan.report(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            print(f"[INFO] 校验结果已写入 {args.report}")
+
+        if plan.errors and not args.skip_invalid:
+            print("[ERROR] 存在错误的行，请修正后重试（或加 --skip-invalid）；未写入任何文件。")
+            return 2
+        if args.dry_run:
+            print("[INFO] --dry-run：未写入文件。")
+            return 0
+        if not plan.count:
+            print("[INFO] 没有需要导入的记录。")
+            return 0
+        result = apply_import(store, plan, pool, sources=args.inputs, backup=not args.no_backup)
+    print(
+        f"[INFO] 已导入 {result['count']} 条工作项（{result['users']} 人，id {result['firstId']}-{result['lastId']}，"
+        f"共 {time.perf_counter() - started:.1f}s）"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按用户构建 user_org_memberships.json / role_grants.json 的有效期区间索引。
+
+server/services/domain.js 的 getPrimaryOrgId / isUserAdmin 每次都把整份数组用 isEffective 过滤一遍；
+这里把每个用户的记录按 startDate/endDate 切成互不重叠、按日期排序的区间段，每段预先算好结果：
+- 主属组织：段内生效的主属记录中 startDate 最大者，相同时取文件中靠前的一条（与 domain.js 的稳定排序一致）；
+- 角色授权：段内生效的全部授权（保持文件顺序），以及是否含 sys_admin。
+单日查询为一次 bisect（O(log n)），日期区间查询按段遍历，不再逐日扫描全部记录。
+
+有效期语义同 server/utils/datetime.js isEffective：startDate 为空视为最早，endDate 为空视为 9999-12-31，两端都包含；
+日期无法解析的记录在服务端永远不生效，这里同样忽略并计入 skipped。
+
+用法
+  python tools/interval_index.py at --user 5 [--date 2025-10-01]
+  python tools/interval_index.py history --user 5 [--from 2025-01-01] [--to 2025-12-31]
+
+在其它脚本中：
+  from interval_index import MembershipIndex, GrantIndex
+  memberships = MembershipIndex(store.memberships)
+  memberships.primary_org(5, "2025-10-01")
+  memberships.primary_orgs_at("2025-10-01", user_ids)          # 批量单日
+  memberships.primary_org_by_day(user_ids, "2025-10-01", "2025-10-31")  # 批量区间，每人每天一个值
+  grants = GrantIndex(store.role_grants, store.roles)
+  grants.is_admin(5, "2025-10-01")
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from bisect import bisect_right
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from data_store import DATA_DIR, DataStore, MembershipRecord, MembershipsCollection, RoleGrantRecord, RoleGrantsCollection, RolesCollection
+
+MIN_DAY = "0001-01-01"
+MAX_DAY = "9999-12-31"
+ADMIN_ROLE_CODE = "sys_admin"
+
+T = TypeVar("T")
+V = TypeVar("V")
+
+
+def normalize_day(value: Optional[str], default: str) -> Optional[str]:
+    """空值返回 default；无法解析返回 None（该记录永不生效）。"""
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        return None
+
+
+def next_day(day: str) -> Optional[str]:
+    if day == MAX_DAY:
+        return None
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+
+def prev_day(day: str) -> str:
+    return (date.fromisoformat(day) - timedelta(days=1)).isoformat()
+
+
+class Timeline(Generic[V]):
+    """分段常量：starts/ends 为按日期排序、互不重叠的闭区间，values[i] 为该段的值；未覆盖的日期没有值。"""
+
+    __slots__ = ("starts", "ends", "values")
+
+    def __init__(self) -> None:
+        self.starts: List[str] = []
+        self.ends: List[str] = []
+        self.values: List[V] = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(self, start: str, end: str, value: V) -> None:
+        # 与上一段首尾相接且值相同则合并
+        if self.values and self.values[-1] == value and next_day(self.ends[-1]) == start:
+            self.ends[-1] = end
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self.values.append(value)
+
+    def at(self, day: str) -> Optional[V]:
+        i = bisect_right(self.starts, day) - 1
+        if i >= 0 and day <= self.ends[i]:
+            return self.values[i]
+        return None
+
+    def runs(self, start: str, end: str) -> Iterator[Tuple[str, str, V]]:
+        """与 [start, end] 相交的各段，两端已裁剪。"""
+        i = max(bisect_right(self.starts, start) - 1, 0)
+        while i < len(self.starts) and self.starts[i] <= end:
+            lo, hi = max(self.starts[i], start), min(self.ends[i], end)
+            if lo <= hi:
+                yield lo, hi, self.values[i]
+            i += 1
+
+
+def build_timeline(intervals: Sequence[Tuple[str, str, T]], resolve: Callable[[List[T]], Optional[V]]) -> Timeline[V]:
+    """intervals 为按文件顺序给出的闭区间 (start, end, item)。
+
+    在每个区间端点处切段，resolve 收到段内生效的全部 item（保持输入顺序），返回该段的值；返回 None 表示该段无值。
+    """
+    adds: Dict[str, List[int]] = {}
+    removes: Dict[str, List[int]] = {}
+    for pos, (start, end, _item) in enumerate(intervals):
+        adds.setdefault(start, []).append(pos)
+        after = next_day(end)
+        if after is not None:
+            removes.setdefault(after, []).append(pos)
+    bounds = sorted(set(adds) | set(removes))
+
+    timeline: Timeline[V] = Timeline()
+    active: Dict[int, T] = {}
+    for i, bound in enumerate(bounds):
+        for pos in removes.get(bound, ()):
+            active.pop(pos, None)
+        for pos in adds.get(bound, ()):
+            active[pos] = intervals[pos][2]
+        if not active:
+            continue
+        value = resolve([active[pos] for pos in sorted(active)])
+        if value is None:
+            continue
+        seg_end = prev_day(bounds[i + 1]) if i + 1 < len(bounds) else MAX_DAY
+        timeline.append(bound, seg_end, value)
+    return timeline
+
+
+class _UserIntervals(Generic[T, V]):
+    """按用户分组的有效期记录，首次查询某个用户时构建其 Timeline。"""
+
+    def __init__(self, records: Iterable[Tuple[Optional[int], Optional[str], Optional[str], T]]) -> None:
+        self._intervals: Dict[int, List[Tuple[str, str, T]]] = {}
+        self._timelines: Dict[int, Timeline[V]] = {}
+        self.skipped = 0
+        for user_id, start_date, end_date, item in records:
+            if user_id is None:
+                continue
+            start = normalize_day(start_date, MIN_DAY)
+            end = normalize_day(end_date, MAX_DAY)
+            if start is None or end is None:
+                self.skipped += 1
+                continue
+            if start > end:
+                continue
+            self._intervals.setdefault(user_id, []).append((start, end, item))
+
+    def _resolve(self, active: List[T]) -> Optional[V]:
+        raise NotImplementedError
+
+    @property
+    def user_ids(self) -> List[int]:
+        return sorted(self._intervals)
+
+    def timeline(self, user_id: int) -> Timeline[V]:
+        timeline = self._timelines.get(user_id)
+        if timeline is None:
+            timeline = build_timeline(self._intervals.get(user_id, []), self._resolve)
+            self._timelines[user_id] = timeline
+        return timeline
+
+    def value_at(self, user_id: int, day: str) -> Optional[V]:
+        return self.timeline(user_id).at(day)
+
+    def values_at(self, day: str, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Optional[V]]:
+        ids = self.user_ids if user_ids is None else user_ids
+        return {uid: self.timeline(uid).at(day) for uid in ids}
+
+    def runs(self, user_id: int, start: str, end: str) -> List[Tuple[str, str, V]]:
+        return list(self.timeline(user_id).runs(start, end))
+
+    def by_day(self, user_ids: Iterable[int], start: str, end: str) -> Dict[int, List[Optional[V]]]:
+        """[start, end] 内每人每天的值（列表下标 0 对应 start）。"""
+        first = date.fromisoformat(start)
+        days = (date.fromisoformat(end) - first).days + 1
+        result: Dict[int, List[Optional[V]]] = {}
+        for uid in user_ids:
+            row: List[Optional[V]] = [None] * max(days, 0)
+            for lo, hi, value in self.timeline(uid).runs(start, end):
+                a = (date.fromisoformat(lo) - first).days
+                b = (date.fromisoformat(hi) - first).days
+                row[a : b + 1] = [value] * (b - a + 1)
+            result[uid] = row
+        return result
+
+
+class MembershipIndex(_UserIntervals[MembershipRecord, MembershipRecord]):
+    """主属组织索引；段值为当段生效的主属记录。"""
+
+    def __init__(self, memberships: MembershipsCollection) -> None:
+        super().__init__((m.user_id, m.start_date, m.end_date, m) for m in memberships if m.is_primary)
+
+    def _resolve(self, active: List[MembershipRecord]) -> Optional[MembershipRecord]:
+        # max 在 startDate 相同时返回第一个，即文件中靠前的一条
+        return max(active, key=lambda m: m.start_date or "")
+
+    def primary_membership(self, user_id: int, day: str) -> Optional[MembershipRecord]:
+        return self.value_at(user_id, day)
+
+    def primary_org(self, user_id: int, day: str) -> Optional[int]:
+        record = self.value_at(user_id, day)
+        return record.org_id if record is not None else None
+
+    def primary_orgs_at(self, day: str, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Optional[int]]:
+        return {uid: (m.org_id if m is not None else None) for uid, m in self.values_at(day, user_ids).items()}
+
+    def primary_org_runs(self, user_id: int, start: str, end: str) -> List[Tuple[str, str, Optional[int]]]:
+        runs: List[Tuple[str, str, Optional[int]]] = []
+        for lo, hi, m in self.runs(user_id, start, end):
+            # 不同记录指向同一组织时合并成一段
+            if runs and runs[-1][2] == m.org_id and next_day(runs[-1][1]) == lo:
+                runs[-1] = (runs[-1][0], hi, m.org_id)
+            else:
+                runs.append((lo, hi, m.org_id))
+        return runs
+
+    def primary_org_by_day(self, user_ids: Iterable[int], start: str, end: str) -> Dict[int, List[Optional[int]]]:
+        return {
+            uid: [m.org_id if m is not None else None for m in row]
+            for uid, row in self.by_day(user_ids, start, end).items()
+        }
+
+
+class GrantIndex(_UserIntervals[RoleGrantRecord, Tuple[RoleGrantRecord, ...]]):
+    """角色授权索引；段值为当段生效的授权（文件顺序）。"""
+
+    def __init__(self, grants: RoleGrantsCollection, roles: RolesCollection) -> None:
+        self.role_codes: Dict[int, Any] = {rid: role.code for rid, role in roles.by_id.items()}
+        super().__init__((g.grantee_user_id, g.start_date, g.end_date, g) for g in grants)
+
+    def _resolve(self, active: List[RoleGrantRecord]) -> Tuple[RoleGrantRecord, ...]:
+        return tuple(active)
+
+    def grants_at(self, user_id: int, day: str) -> Tuple[RoleGrantRecord, ...]:
+        return self.value_at(user_id, day) or ()
+
+    def role_codes_at(self, user_id: int, day: str) -> List[Any]:
+        return [self.role_codes.get(g.role_id) for g in self.grants_at(user_id, day)]
+
+    def is_admin(self, user_id: int, day: str) -> bool:
+        return ADMIN_ROLE_CODE in self.role_codes_at(user_id, day)
+
+    def admins_at(self, day: str, user_ids: Optional[Iterable[int]] = None) -> List[int]:
+        ids = self.user_ids if user_ids is None else user_ids
+        return [uid for uid in ids if self.is_admin(uid, day)]
+
+
+def _valid_day(value: str) -> str:
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("日期必须为 YYYY-MM-DD")
+    return value
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="主属组织 / 角色授权的有效期区间索引")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("at", help="某个用户在某天的主属组织与授权")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("--date", type=_valid_day, default=date.today().isoformat())
+    p = sub.add_parser("history", help="某个用户在日期区间内的主属组织与授权变化")
+    p.add_argument("--user", type=int, required=True)
+    p.add_argument("--from", dest="start", type=_valid_day, default=MIN_DAY)
+    p.add_argument("--to", dest="end", type=_valid_day, default=MAX_DAY)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = DataStore(args.data_dir, use_cache=False)
+    if store.users.get(args.user) is None:
+        print(f"[ERROR] 用户 {args.user} 不存在。")
+        return 2
+    memberships = MembershipIndex(store.memberships)
+    grants = GrantIndex(store.role_grants, store.roles)
+
+    def org_label(org_id: Optional[int]) -> str:
+        if org_id is None:
+            return "无"
+        org = store.org_units.get(org_id)
+        return f"{org.name if org else '?'}({org_id})"
+
+    def grant_label(items: Sequence[RoleGrantRecord]) -> str:
+        return "、".join(f"{grants.role_codes.get(g.role_id) or g.role_id}#{g.id}" for g in items) or "无"
+
+    if args.command == "at":
+        print(f"主属组织：{org_label(memberships.primary_org(args.user, args.date))}")
+        print(f"角色授权：{grant_label(grants.grants_at(args.user, args.date))}")
+        print(f"管理员：{'是' if grants.is_admin(args.user, args.date) else '否'}")
+    else:
+        print("主属组织：")
+        for lo, hi, org_id in memberships.primary_org_runs(args.user, args.start, args.end):
+            print(f"  {lo} ~ {hi}  {org_label(org_id)}")
+        print("角色授权：")
+        for lo, hi, items in grants.runs(args.user, args.start, args.end):
+            print(f"  {lo} ~ {hi}  {grant_label(items)}")
+    skipped = memberships.skipped + grants.skipped
+    if skipped:
+        print(f"[WARN] 忽略 {skipped} 条日期无效的记录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按 (path, mtime_ns, size) 缓存已解析的 JSON 集合，跨进程保留快照。
+
+- 文件未变化时直接返回缓存结果，只重新解析发生变化的文件；
+- 缓存内容以 marshal 字节保存：每次 `load` 都反序列化出一份新的对象，
+  调用方随意修改也不会污染缓存；marshal 反序列化明显快于 json 解析；
+- 进程退出时把缓存写入 `.cache/json_cache.marshal`，下次启动即为热缓存。
+
+用法
+    from json_cache import default_cache
+
+    cache = default_cache()
+    users = cache.load(DATA_DIR / "users.json")
+    per_user = cache.load_dir(DATA_DIR / "work_items" / "user")
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import marshal
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from json_writer import atomic_write
+
+ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = ROOT / ".cache"
+SNAPSHOT_FILE = CACHE_DIR / "json_cache.marshal"
+SNAPSHOT_VERSION = 1
+
+# path -> (mtime_ns, size, marshal bytes)
+Entry = Tuple[int, int, bytes]
+
+
+class JsonCache:
+    def __init__(self, snapshot_path: Optional[Path] = SNAPSHOT_FILE) -> None:
+        self.snapshot_path = snapshot_path
+        self._entries: Dict[str, Entry] = {}
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        if snapshot_path is not None:
+            self._read_snapshot()
+
+    def _read_snapshot(self) -> None:
+        try:
+            with open(self.snapshot_path, "rb") as fh:
+                version, entries = marshal.load(fh)
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+        if version == SNAPSHOT_VERSION and isinstance(entries, dict):
+            self._entries = entries
+
+    def load(self, path: Path, default: Optional[Callable[[], Any]] = None) -> Any:
+        """返回解析后的 JSON；文件不存在时返回 `default()`（未提供则抛 FileNotFoundError）。"""
+        key = os.fspath(Path(path).resolve())
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+            if default is None:
+                raise
+            return default()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            self.hits += 1
+            return marshal.loads(entry[2])
+        self.misses += 1
+        with open(key, "rb") as fh:
+            raw = fh.read()
+        data = json.loads(raw.decode("utf-8-sig"))
+        self._entries[key] = (st.st_mtime_ns, st.st_size, marshal.dumps(data))
+        self._dirty = True
+        return data
+
+    def load_dir(self, directory: Path, pattern: str = "*.json") -> Dict[Path, Any]:
+        """加载目录下所有匹配的文件；未变化的文件不会重新解析。"""
+        result: Dict[Path, Any] = {}
+        for path in sorted(Path(directory).glob(pattern)):
+            try:
+                result[path] = self.load(path)
+            except FileNotFoundError:
+                continue
+        return result
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(os.fspath(Path(path).resolve()), None)
+        self._dirty = True
+
+    def save(self) -> None:
+        """把缓存写回快照；已被删除的文件顺带清理掉。"""
+        if self.snapshot_path is None or not self._dirty:
+            return
+        live = {key: entry for key, entry in self._entries.items() if os.path.exists(key)}
+        # 缓存丢了可以重建，不必 fsync
+        with atomic_write(self.snapshot_path, "wb", fsync=False) as fh:
+            marshal.dump((SNAPSHOT_VERSION, live), fh)
+        self._entries = live
+        self._dirty = False
+
+
+_DEFAULT: Optional[JsonCache] = None
+
+
+def default_cache() -> JsonCache:
+    """进程级共享缓存；首次使用时读取快照，退出时自动保存。"""
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = JsonCache()
+        atexit.register(_save_default)
+    return _DEFAULT
+
+
+def _save_default() -> None:
+    if _DEFAULT is None:
+        return
+    try:
+        _DEFAULT.save()
+    except OSError:
+        pass
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tools/ 写入 data/ 的统一出口：流式编码 + 临时文件 + fsync + rename + 建议锁。
+
+- 与 server/utils/file-store.js 的 writeJson 相同的协议：先写 `<file>.tmp-<ts>`，再 rename 覆盖，
+  server 在任何时刻读到的都是完整文件；rename 遇到 EPERM/EACCES/EBUSY（Windows 上文件被占用）时重试；
+- 写入前 fsync 临时文件，rename 后 fsync 所在目录，断电也不会留下半截 JSON；
+- `<file>.lock`（O_CREAT|O_EXCL 创建）作为建议锁，使多个工具之间串行写同一文件；
+  锁文件超过 stale_after 秒未释放视为残留并清除；
+- `{ meta, items }` 中的 items 逐条编码写出，可以传入生成器，内存占用与集合大小无关。
+  输出与 `json.dumps(payload, ensure_ascii=False, indent=2) + "\\n"` 逐字节一致。
+
+用法
+    from json_writer import write_json, file_lock
+
+    write_json(path, {"meta": {"lastId": 3}, "items": iter_records()})
+    with file_lock(path):
+        ...  # 读-改-写
+"""
+
+from __future__ import annotations
+
+import errno
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+WRITE_BUFFER = 1 << 20
+RENAME_RETRIES = 5
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+def lock_path_for(path: Path) -> Path:
+    return path.with_name(f"{path.name}.lock")
+
+
+@contextmanager
+def file_lock(path: Path, *, timeout: float = 10.0, stale_after: float = 30.0, poll: float = 0.05) -> Iterator[Path]:
+    """对 `path` 加建议锁（锁文件为 `<path>.lock`）。超时抛 LockTimeout。"""
+    lock = lock_path_for(Path(path))
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileNotFoundError:
+            # 等锁期间目录被删除（reshard merge 删除分区目录）
+            lock.parent.mkdir(parents=True, exist_ok=True)
+            continue
+        except FileExistsError:
+            try:
+                age = time.time() - lock.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age > stale_after:
+                try:
+                    lock.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"{lock} 被占用超过 {timeout:g}s")
+            time.sleep(poll)
+            continue
+        try:
+            os.write(fd, json.dumps({"pid": os.getpid(), "at": time.time()}).encode("utf-8"))
+        finally:
+            os.close(fd)
+        break
+    try:
+        yield lock
+    finally:
+        try:
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _fsync_dir(directory: Path) -> None:
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace(tmp: Path, target: Path) -> None:
+    for attempt in range(RENAME_RETRIES):
+        try:
+            os.replace(tmp, target)
+            return
+        except PermissionError as e:
+            last_error: OSError = e
+        except OSError as e:
+            if e.errno != errno.EBUSY:
+                raise
+            last_error = e
+        try:
+            target.unlink()
+        except OSError:
+            pass
+        time.sleep(0.05 * (attempt + 1))
+    raise last_error
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "w", *, fsync: bool = True) -> Iterator[IO[Any]]:
+    """以临时文件打开 `path`，退出时 fsync + rename 覆盖；异常时删除临时文件、原文件不受影响。"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{int(time.time() * 1000)}-{os.getpid()}")
+    kwargs = {"encoding": "utf-8", "newline": "\n"} if "b" not in mode else {}
+    fh = open(tmp, mode, buffering=WRITE_BUFFER, **kwargs)
+    try:
+        yield fh
+        fh.flush()
+        if fsync:
+            os.fsync(fh.fileno())
+        fh.close()
+        _replace(tmp, path)
+    except BaseException:
+        fh.close()
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def _dump(value: Any, indent: int, level: int) -> str:
+    text = json.dumps(value, ensure_ascii=False, indent=indent)
+    return text.replace("\n", "\n" + " " * (indent * level))
+
+
+def _is_stream(value: Any) -> bool:
+    return isinstance(value, (list, tuple)) or (
+        isinstance(value, Iterable) and not isinstance(value, (str, bytes, dict))
+    )
+
+
+def iter_json_chunks(payload: Any, indent: int = 2) -> Iterator[str]:
+    """逐段编码：顶层 dict 的列表/生成器字段按元素输出，其余字段整体输出。"""
+    if not isinstance(payload, dict):
+        yield json.dumps(payload, ensure_ascii=False, indent=indent)
+        return
+    if not payload:
+        yield "{}"
+        return
+    pad1 = " " * indent
+    pad2 = " " * (indent * 2)
+    yield "{"
+    for index, (key, value) in enumerate(payload.items()):
+        yield ("\n" if index == 0 else ",\n") + pad1 + json.dumps(str(key), ensure_ascii=False) + ": "
+        if not _is_stream(value):
+            yield _dump(value, indent, 1)
+            continue
+        empty = True
+        for item in value:
+            yield ("[\n" if empty else ",\n") + pad2 + _dump(item, indent, 2)
+            empty = False
+        yield "[]" if empty else "\n" + pad1 + "]"
+    yield "\n}"
+
+
+def write_json(
+    path: Path,
+    payload: Any,
+    *,
+    lock: bool = True,
+    fsync: bool = True,
+    lock_timeout: float = 10.0,
+) -> None:
+    """流式写出 JSON（末尾换行），tmp + rename 原子替换；默认持有 `<path>.lock`。"""
+    path = Path(path)
+
+    def _write() -> None:
+        with atomic_write(path, "w", fsync=fsync) as fh:
+            for chunk in iter_json_chunks(payload):
+                fh.write(chunk)
+            fh.write("\n")
+
+    if lock:
+        with file_lock(path, timeout=lock_timeout):
+            _write()
+    else:
+        _write()
+
+
+def write_bytes(path: Path, content: bytes, *, fsync: bool = True) -> None:
+    with atomic_write(path, "wb", fsync=fsync) as fh:
+        fh.write(content)
+
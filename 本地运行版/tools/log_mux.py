@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+子进程输出的日志多路复用（start_local.py 与仓库根的 scripts/dev.py 共用）。
+
+一个后台线程里的 asyncio 事件循环负责读取所有子进程的 stdout/stderr：
+- 按 64KB 块读取，只对整行解码（一块一次 decode），不完整的行留到下一块；
+- 每行打上进程名与时间戳，回显到控制台时一块只写一次（echo=False 时不回显）；
+- 每个进程保留最近 ring_lines 行的环形缓冲，tail() 可按进程名 / 正则过滤；
+- 每个进程写 logs/<name>.log（JSON 行：at / proc / line），超过 max_bytes 轮转为 <name>.log.1.gz …，
+  保留 backups 份，压缩在单线程的后台执行器中按轮转顺序进行，不阻塞读取；close() 等待压缩完成。
+POSIX 上用 loop.connect_read_pipe 直接读管道；Windows 的匿名管道不支持重叠 I/O，退化为每个管道一个
+按块读取的线程，行处理仍在事件循环中完成。
+
+在其它脚本中：
+  from log_mux import LogMux
+  mux = LogMux(ROOT / "logs").start()
+  proc = mux.spawn("server", ["npm", "start"], cwd=ROOT)   # 或 mux.attach("server", popen)（stdout=PIPE）
+  mux.tail(proc="server", pattern="ERROR", n=50)
+  mux.close()
+
+命令行：
+  python tools/log_mux.py tail [--proc server] [--grep REGEX] [-n 100] [--follow]   # 读 logs/ 下的文件（含 .gz）
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+LOGS_DIR = ROOT / "logs"
+READ_CHUNK = 64 * 1024
+NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+Record = Tuple[float, str, str]  # (时间戳, 进程名, 行)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def safe_name(name: str) -> str:
+    return NAME_RE.sub("_", name).strip("_") or "proc"
+
+
+class RotatingJsonLog:
+    """按大小轮转的 JSON 行日志；旧文件 gzip 压缩为 .1.gz … .N.gz。
+
+    submit(fn, *args) 须按提交顺序串行执行（LogMux 用单线程执行器），编号的移位在压缩完成后进行，
+    连续轮转时后完成的总是较新的一份。
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int, backups: int, submit) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._submit = submit
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 上次异常退出时未压缩完的文件：半成品删掉，待压缩的按时间顺序补做
+        for leftover in sorted(path.parent.glob(f"{path.name}.rotating-*")):
+            if leftover.name.endswith(".tmp"):
+                leftover.unlink(missing_ok=True)
+            else:
+                submit(self._compress, leftover)
+        self.fh = open(path, "ab")
+        self.size = self.fh.tell()
+
+    def write(self, records: Sequence[Record]) -> None:
+        data = "".join(
+            json.dumps({"at": _iso(ts), "proc": proc, "line": line}, ensure_ascii=False) + "\n"
+            for ts, proc, line in records
+        ).encode("utf-8")
+        self.fh.write(data)
+        self.fh.flush()
+        self.size += len(data)
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self) -> None:
+        self.fh.close()
+        # 先改名（每次轮转一个唯一的名字）再在后台压缩，新文件立即可写
+        pending = self.path.with_name(f"{self.path.name}.rotating-{time.time_ns()}")
+        os.replace(self.path, pending)
+        self._submit(self._compress, pending)
+        self.fh = open(self.path, "ab")
+        self.size = 0
+
+    def _compress(self, pending: Path) -> None:
+        """在执行器线程中：压缩到本次独有的临时文件，再移位旧备份并放到 .1.gz。"""
+        tmp = pending.with_name(pending.name + ".gz.tmp")
+        with open(pending, "rb") as fin, gzip.open(tmp, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}.gz")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}.gz"))
+        os.replace(tmp, self.path.with_name(f"{self.path.name}.1.gz"))
+        pending.unlink()
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+class _Stream:
+    """一个进程的行拆分状态、环形缓冲与日志文件。"""
+
+    def __init__(self, mux: "LogMux", name: str) -> None:
+        self.mux = mux
+        self.name = name
+        self.partial = b""
+        self.ring: Deque[Record] = deque(maxlen=mux.ring_lines)
+        self.log = (
+            RotatingJsonLog(
+                mux.log_dir / f"{safe_name(name)}.log",
+                max_bytes=mux.max_bytes,
+                backups=mux.backups,
+                submit=mux._compress_later,
+            )
+            if mux.log_dir is not None
+            else None
+        )
+        self.open_pipes = 0
+
+    def feed(self, data: bytes) -> None:
+        data = self.partial + data
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            self.partial = data
+            if len(self.partial) > READ_CHUNK:  # 超长无换行输出（进度条等）按块切开
+                self.emit(self.partial)
+                self.partial = b""
+            return
+        self.partial = data[cut + 1:]
+        self.emit(data[:cut])
+
+    def emit(self, block: bytes) -> None:
+        now = time.time()
+        lines = block.decode("utf-8", errors="replace").replace("\r\n", "\n").split("\n")
+        records = [(now, self.name, line.rstrip("\r")) for line in lines]
+        self.ring.extend(records)
+        if self.log is not None:
+            self.log.write(records)
+        if self.mux.echo:
+            self.mux.out.write("".join(f"[{self.name}] {line}\n" for _, _, line in records))
+            self.mux.out.flush()
+
+    def eof(self) -> None:
+        self.open_pipes -= 1
+        if self.open_pipes <= 0 and self.partial:
+            self.emit(self.partial)
+            self.partial = b""
+
+
+class _PipeProtocol(asyncio.Protocol):
+    def __init__(self, stream: _Stream) -> None:
+        self.stream = stream
+
+    def data_received(self, data: bytes) -> None:
+        self.stream.feed(data)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.stream.eof()
+
+
+class LogMux:
+    def __init__(
+        self,
+        log_dir: Optional[Path] = LOGS_DIR,
+        *,
+        echo: bool = True,
+        ring_lines: int = 2000,
+        max_bytes: int = 10 * 1024 * 1024,
+        backups: int = 5,
+        out=None,
+    ) -> None:
+        self.log_dir = Path(log_dir) if log_dir is not None else None
+        self.echo = echo
+        self.ring_lines = ring_lines
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.out = out or sys.stdout
+        self.streams: Dict[str, _Stream] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # --- 生命周期 ---
+
+    def start(self) -> "LogMux":
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-mux-gzip")
+            self._thread = threading.Thread(target=self._run, name="log-mux", daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """停止读取并关闭日志文件（子进程应已结束，剩余输出尽量读完）。"""
+        if self._loop is None:
+            return
+        deadline = time.time() + timeout
+        while time.time() < deadline and any(s.open_pipes > 0 for s in self.streams.values()):
+            time.sleep(0.05)
+        self._call(self._close_files)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._loop = None
+        self._thread = None
+        self._ready.clear()
+        # 等待排队中的压缩完成，不留下 .rotating-* 文件
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _close_files(self) -> None:
+        for stream in self.streams.values():
+            if stream.log is not None:
+                stream.log.close()
+
+    def _call(self, fn, *args) -> Any:
+        """在事件循环线程中执行 fn 并等待结果。"""
+        if self._loop is None:
+            raise RuntimeError("LogMux 未启动")
+
+        async def runner():
+            return fn(*args)
+
+        return asyncio.run_coroutine_threadsafe(runner(), self._loop).result()
+
+    def _compress_later(self, fn, *args) -> None:
+        assert self._executor is not None
+        self._executor.submit(fn, *args)
+
+    # --- 接入子进程 ---
+
+    def _stream(self, name: str) -> _Stream:
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = self.streams[name] = _Stream(self, name)
+        return stream
+
+    async def _connect(self, stream: _Stream, pipe) -> None:
+        await self._loop.connect_read_pipe(lambda: _PipeProtocol(stream), pipe)
+
+    def _thread_reader(self, stream: _Stream, pipe) -> None:
+        fd = pipe.fileno()
+        while True:
+            try:
+                data = os.read(fd, READ_CHUNK)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            self._loop.call_soon_threadsafe(stream.feed, data)
+        self._loop.call_soon_threadsafe(stream.eof)
+        pipe.close()
+
+    def attach(self, name: str, proc: subprocess.Popen) -> subprocess.Popen:
+        """接管 proc.stdout / proc.stderr（须为 PIPE）的读取。"""
+        self.start()
+        pipes = [p for p in (proc.stdout, proc.stderr) if p is not None]
+        stream = self._call(self._stream, name)
+
+        def register() -> None:
+            stream.open_pipes += len(pipes)
+
+        self._call(register)
+        for pipe in pipes:
+            if os.name == "nt":
+                threading.Thread(target=self._thread_reader, args=(stream, pipe), name=f"log-{name}", daemon=True).start()
+            else:
+                asyncio.run_coroutine_threadsafe(self._connect(stream, pipe), self._loop).result()
+        return proc
+
+    def spawn(self, name: str, cmd, **popen_kwargs) -> subprocess.Popen:
+        """subprocess.Popen(cmd, ...) 并把 stdout+stderr 接入 name。"""
+        popen_kwargs.setdefault("stdout", subprocess.PIPE)
+        popen_kwargs.setdefault("stderr", subprocess.STDOUT)
+        popen_kwargs.setdefault("stdin", subprocess.DEVNULL)
+        return self.attach(name, subprocess.Popen(cmd, **popen_kwargs))
+
+    # --- 查询 ---
+
+    def tail(self, *, proc: Optional[str] = None, pattern: Optional[str] = None, n: int = 100) -> List[Record]:
+        """环形缓冲中最近 n 条（按时间合并），可按进程名与正则过滤。"""
+        regex = re.compile(pattern) if pattern else None
+
+        def collect() -> List[Record]:
+            records: List[Record] = []
+            for name, stream in self.streams.items():
+                if proc is None or name == proc:
+                    records.extend(r for r in stream.ring if regex is None or regex.search(r[2]))
+            records.sort(key=lambda r: r[0])
+            return records[-n:] if n > 0 else records
+
+        return self._call(collect)
+
+
+# --- 命令行：从 logs/ 读取 ---
+
+
+def _open_log(path: Path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.suffix == ".gz" else open(path, "r", encoding="utf-8")
+
+
+def _log_files(log_dir: Path, proc: Optional[str]) -> List[Path]:
+    """按时间从旧到新：<name>.log.N.gz … <name>.log.1.gz, <name>.log。"""
+    names = [safe_name(proc)] if proc else sorted({p.name.split(".log")[0] for p in log_dir.glob("*.log*")})
+    files: List[Path] = []
+    for name in names:
+        rotated = sorted(log_dir.glob(f"{name}.log.*.gz"), key=lambda p: int(p.name.split(".")[-2]), reverse=True)
+        files.extend(rotated)
+        if (log_dir / f"{name}.log").exists():
+            files.append(log_dir / f"{name}.log")
+    return files
+
+
+def _read_records(files: Sequence[Path]) -> Iterator[Dict[str, Any]]:
+    for path in files:
+        with _open_log(path) as fh:
+            for raw in fh:
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    continue
+                # logs/ 里还有 supervisor.log 等其它格式的文件
+                if isinstance(record, dict) and "proc" in record and "line" in record:
+                    yield record
+
+
+def cmd_tail(args: argparse.Namespace) -> int:
+    regex = re.compile(args.grep) if args.grep else None
+    files = _log_files(args.log_dir, args.proc)
+    if not files:
+        print(f"{args.log_dir} 下没有{'进程 ' + args.proc + ' 的' if args.proc else ''}日志。")
+        return 1
+    matched: Deque[Dict[str, Any]] = deque(maxlen=args.n)
+    for record in _read_records(files):
+        if regex is None or regex.search(record.get("line", "")):
+            matched.append(record)
+    for record in sorted(matched, key=lambda r: r.get("at", "")):
+        print(f"{record['at']} [{record['proc']}] {record['line']}")
+    if not args.follow:
+        return 0
+    # --follow：跟踪当前的 <name>.log（轮转后重新打开）
+    live = {path: path.stat().st_size for path in files if path.suffix == ".log"}
+    try:
+        while True:
+            time.sleep(0.5)
+            for path in list(live):
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                if size < live[path]:
+                    live[path] = 0
+                if size == live[path]:
+                    continue
+                with open(path, "r", encoding="utf-8") as fh:
+                    fh.seek(live[path])
+                    chunk = fh.read()
+                    live[path] = fh.tell()
+                for raw in chunk.splitlines():
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if not isinstance(record, dict) or "proc" not in record or "line" not in record:
+                        continue
+                    if regex is None or regex.search(record["line"]):
+                        print(f"{record['at']} [{record['proc']}] {record['line']}", flush=True)
+    except KeyboardInterrupt:
+        return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="子进程日志多路复用")
+    parser.add_argument("--log-dir", type=Path, default=LOGS_DIR, help="日志目录（默认 logs/）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_tail = sub.add_parser("tail", help="查看日志（含已轮转的 .gz）")
+    p_tail.add_argument("--proc", help="只看某个进程")
+    p_tail.add_argument("--grep", help="按正则过滤行")
+    p_tail.add_argument("-n", type=int, default=100, help="显示最近多少行（默认 100）")
+    p_tail.add_argument("--follow", "-f", action="store_true", help="持续输出新行")
+    args = parser.parse_args(argv)
+    if args.command == "tail":
+        return cmd_tail(args)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
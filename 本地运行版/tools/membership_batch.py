@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量重建 data/user_org_memberships.json（无界面版本，GUI 也复用这里的引擎）。
+
+输入为 CSV/TSV，每行一条「人员, 部门」：
+- 人员：姓名或工号（employeeNo，忽略大小写；同时匹配时优先工号）；
+- 部门：组织 ID、org_units.json 中的名称，或 GUI 下拉框中的显示名（如 “xx（领导层）”）。
+首行若是表头（姓名/工号/部门/name/employeeNo/department）会自动跳过。
+
+一次性在索引上解析全部行，生成新的集合后只做一次备份（登记到 backups/ 去重仓库）与一次原子写入，并输出差异报告。
+
+模式
+- append（默认）：保留现有记录。已在目标部门的跳过；已有在职主属的改为新部门；
+  没有主属的追加一条 { userId, orgId, isPrimary: true, startDate, endDate: null }。
+  加 --close-previous 时不直接改旧记录，而是把旧主属的 endDate 置为 startDate 前一天并追加新记录，保留历史。
+- replace：整个文件只保留输入中出现的人员，每人一条主属记录（与 GUI “生成并覆盖”一致）。
+
+用法
+  python tools/membership_batch.py 调整名单.csv
+  python tools/membership_batch.py 调整名单.tsv --mode replace --start-date 2025-10-08
+  python tools/membership_batch.py 调整名单.csv --dry-run --report diff.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import csv
+import io
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backup_store import snapshot_file
+from data_store import DataStore, MembershipsCollection, OrgUnitsCollection, to_int, write_collection
+
+HEADER_CELLS = {"姓名", "工号", "人员", "部门", "name", "employeeno", "employee_no", "department", "dept"}
+DEPARTMENT_TYPES = {"department", "leadership"}
+
+
+def today_iso() -> str:
+    return date.today().strftime("%Y-%m-%d")
+
+
+def load_departments(orgs: OrgUnitsCollection) -> List[Tuple[str, int]]:
+    """返回 (display_name, id) 列表，按名称排序。包含部门与领导层等启用组织。"""
+    items: List[Tuple[str, int]] = []
+    for org in orgs:
+        if not org.active or org.id is None:
+            continue
+        if org.type not in DEPARTMENT_TYPES:
+            continue
+        if not org.name:
+            continue
+        label = org.name if org.type == "department" else f"{org.name}（领导层）"
+        items.append((label, org.id))
+    # 去重（同名+类型组合取较小 id）
+    dedup: Dict[str, int] = {}
+    for label, oid in items:
+        if label not in dedup or oid < dedup[label]:
+            dedup[label] = oid
+    return sorted(dedup.items(), key=lambda x: x[0])
+
+
+@dataclass
+class AssignmentRow:
+    line: int
+    user_key: str
+    department: str
+
+
+@dataclass
+class MembershipChange:
+    user_id: int
+    name: str
+    action: str  # added | moved | unchanged | removed
+    before: List[int]
+    after: Optional[int]
+
+
+@dataclass
+class RebuildPlan:
+    mode: str
+    start_date: str
+    payload: Dict[str, Any]
+    changes: List[MembershipChange] = field(default_factory=list)
+    missing_users: List[AssignmentRow] = field(default_factory=list)
+    ambiguous_users: List[AssignmentRow] = field(default_factory=list)
+    unknown_departments: List[AssignmentRow] = field(default_factory=list)
+    conflicts: List[AssignmentRow] = field(default_factory=list)
+
+    @property
+    def has_errors(self) -> bool:
+        return bool(self.ambiguous_users or self.unknown_departments or self.conflicts)
+
+    def count(self, action: str) -> int:
+        return sum(1 for c in self.changes if c.action == action)
+
+    @property
+    def is_noop(self) -> bool:
+        return all(c.action == "unchanged" for c in self.changes)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "startDate": self.start_date,
+            "summary": {
+                action: self.count(action) for action in ("added", "moved", "unchanged", "removed")
+            },
+            "totalRecords": len(self.payload["items"]),
+            "changes": [asdict(c) for c in self.changes],
+            "missingUsers": [asdict(r) for r in self.missing_users],
+            "ambiguousUsers": [asdict(r) for r in self.ambiguous_users],
+            "unknownDepartments": [asdict(r) for r in self.unknown_departments],
+            "conflicts": [asdict(r) for r in self.conflicts],
+        }
+
+
+def read_rows(path: Path) -> List[AssignmentRow]:
+    text = path.read_text(encoding="utf-8-sig")
+    return parse_rows(text, delimiter="\t" if path.suffix.lower() == ".tsv" else None)
+
+
+def parse_rows(text: str, delimiter: Optional[str] = None) -> List[AssignmentRow]:
+    if delimiter is None:
+        first = next((ln for ln in text.splitlines() if ln.strip()), "")
+        delimiter = "\t" if "\t" in first else ","
+    rows: List[AssignmentRow] = []
+    for line_no, cells in enumerate(csv.reader(io.StringIO(text), delimiter=delimiter), start=1):
+        cells = [c.strip() for c in cells]
+        if not any(cells):
+            continue
+        if not rows and cells[0].lower() in HEADER_CELLS:
+            continue
+        if len(cells) < 2 or not cells[0] or not cells[1]:
+            raise ValueError(f"第 {line_no} 行需要两列（人员, 部门）：{cells}")
+        rows.append(AssignmentRow(line_no, cells[0], cells[1]))
+    return rows
+
+
+class Resolver:
+    """把输入行中的人员/部门解析为 id（基于 DataStore 的哈希索引）。"""
+
+    def __init__(self, store: DataStore, match: str = "auto") -> None:
+        self.store = store
+        self.match = match
+        self.departments: Dict[str, int] = dict(load_departments(store.org_units))
+        self.by_plain_name: Dict[str, List[int]] = {}
+        for label, oid in self.departments.items():
+            plain = label.replace("（领导层）", "")
+            self.by_plain_name.setdefault(plain, []).append(oid)
+
+    def user_ids(self, key: str) -> List[int]:
+        if self.match in ("auto", "employeeNo"):
+            user = self.store.users.get_by_employee_no(key)
+            if user is not None and user.id is not None:
+                return [user.id]
+            if self.match == "employeeNo":
+                return []
+        return self.store.users.ids_by_name(key)
+
+    def department_id(self, key: str) -> Optional[int]:
+        oid = to_int(key)
+        if oid is not None:
+            org = self.store.org_units.get(oid)
+            return oid if org is not None and org.active else None
+        if key in self.departments:
+            return self.departments[key]
+        candidates = self.by_plain_name.get(key, [])
+        return candidates[0] if len(candidates) == 1 else None
+
+
+def _day_before(iso: str) -> str:
+    return (datetime.strptime(iso, "%Y-%m-%d").date() - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def plan_rebuild(
+    store: DataStore,
+    rows: Iterable[AssignmentRow],
+    *,
+    mode: str = "append",
+    start_date: Optional[str] = None,
+    close_previous: bool = False,
+    match: str = "auto",
+) -> RebuildPlan:
+    """在内存中计算新的 user_org_memberships.json，不写盘。"""
+    if mode not in ("append", "replace"):
+        raise ValueError(f"unknown mode: {mode}")
+    start = start_date or today_iso()
+    resolver = Resolver(store, match=match)
+    current = store.memberships
+    plan = RebuildPlan(mode=mode, start_date=start, payload={})
+
+    # userId -> (orgId, row)，同一人重复出现且部门一致时只保留一次
+    assignments: Dict[int, Tuple[int, AssignmentRow]] = {}
+    for row in rows:
+        ids = resolver.user_ids(row.user_key)
+        if not ids:
+            plan.missing_users.append(row)
+            continue
+        if len(ids) > 1:
+            plan.ambiguous_users.append(row)
+            continue
+        org_id = resolver.department_id(row.department)
+        if org_id is None:
+            plan.unknown_departments.append(row)
+            continue
+        uid = ids[0]
+        if uid in assignments and assignments[uid][0] != org_id:
+            plan.conflicts.append(row)
+            continue
+        assignments.setdefault(uid, (org_id, row))
+
+    def user_name(uid: int) -> str:
+        user = store.users.get(uid)
+        return user.name if user is not None else ""
+
+    def new_record(uid: int, org_id: int) -> Dict[str, Any]:
+        return {"userId": uid, "orgId": org_id, "isPrimary": True, "startDate": start, "endDate": None}
+
+    if mode == "replace":
+        items = []
+        for uid, (org_id, _row) in assignments.items():
+            before = [m.org_id for m in current.active_primary(uid) if m.org_id is not None]
+            action = "unchanged" if before == [org_id] else ("moved" if before else "added")
+            plan.changes.append(MembershipChange(uid, user_name(uid), action, before, org_id))
+            items.append(new_record(uid, org_id))
+        for uid in sorted(set(current.by_user) - set(assignments)):
+            before = [m.org_id for m in current.for_user(uid) if m.org_id is not None]
+            plan.changes.append(MembershipChange(uid, user_name(uid), "removed", before, None))
+        plan.payload = {"meta": {"lastId": len(items)}, "items": items}
+        return plan
+
+    payload = copy.deepcopy(current.payload)
+    working = MembershipsCollection(current.path, payload)
+    for uid, (org_id, _row) in assignments.items():
+        active = working.active_primary(uid)
+        before = [m.org_id for m in active if m.org_id is not None]
+        if any(m.org_id == org_id for m in active):
+            plan.changes.append(MembershipChange(uid, user_name(uid), "unchanged", before, org_id))
+            continue
+        if not active:
+            working.add(new_record(uid, org_id))
+            plan.changes.append(MembershipChange(uid, user_name(uid), "added", before, org_id))
+            continue
+        for record in active:
+            if close_previous and (record.start_date or "") < start:
+                record.raw["endDate"] = _day_before(start)
+                record.end_date = record.raw["endDate"]
+            else:
+                record.raw["orgId"] = org_id
+                record.org_id = org_id
+        if close_previous and not working.active_primary(uid):
+            working.add(new_record(uid, org_id))
+        plan.changes.append(MembershipChange(uid, user_name(uid), "moved", before, org_id))
+    meta = payload.setdefault("meta", {})
+    meta["lastId"] = max(int(meta.get("lastId") or 0), len(payload["items"]))
+    plan.payload = payload
+    return plan
+
+
+def apply_plan(plan: RebuildPlan, target: Path, *, backup: bool = True) -> Optional[Dict[str, Any]]:
+    """在备份仓库登记一次快照并原子写入；返回快照条目（未备份时为 None）。"""
+    snapshot = snapshot_file(target, note=f"membership_batch {plan.mode}") if backup else None
+    write_collection(target, plan.payload)
+    return snapshot
+
+
+def format_report(plan: RebuildPlan, store: DataStore) -> List[str]:
+    def org_label(oid: Optional[int]) -> str:
+        if oid is None:
+            return "-"
+        org = store.org_units.get(oid)
+        return f"{org.name}({oid})" if org is not None else f"?({oid})"
+
+    lines = []
+    for change in sorted(plan.changes, key=lambda c: (c.action, c.user_id)):
+        if change.action == "unchanged":
+            continue
+        before = ",".join(org_label(o) for o in change.before) or "-"
+        lines.append(f"[{change.action}] id={change.user_id:<4} {change.name or '(unknown)'}: {before} -> {org_label(change.after)}")
+    for label, rows in (
+        ("missing", plan.missing_users),
+        ("ambiguous", plan.ambiguous_users),
+        ("unknown-dept", plan.unknown_departments),
+        ("conflict", plan.conflicts),
+    ):
+        for row in rows:
+            lines.append(f"[{label}] line {row.line}: {row.user_key}, {row.department}")
+    lines.append(
+        "新增 {a}，调整 {m}，未变 {u}，移除 {r}；写入后共 {t} 条记录。".format(
+            a=plan.count("added"),
+            m=plan.count("moved"),
+            u=plan.count("unchanged"),
+            r=plan.count("removed"),
+            t=len(plan.payload["items"]),
+        )
+    )
+    return lines
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="按 CSV/TSV 批量重建 user_org_memberships.json")
+    parser.add_argument("input", type=Path, help="CSV/TSV 文件：人员（姓名或工号）, 部门")
+    parser.add_argument("--mode", choices=["append", "replace"], default="append", help="append（默认）| replace")
+    parser.add_argument("--start-date", default=None, help="新记录的 startDate（默认今天）")
+    parser.add_argument("--close-previous", action="store_true", help="append 模式下结束旧主属并追加新记录，保留历史")
+    parser.add_argument("--match", choices=["auto", "name", "employeeNo"], default="auto", help="人员列的匹配方式")
+    parser.add_argument("--dry-run", action="store_true", help="只输出差异，不写文件")
+    parser.add_argument("--report", type=Path, default=None, help="把差异报告另存为 JSON")
+    parser.add_argument("--no-backup", action="store_true", help="写入前不备份原文件")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.start_date:
+        try:
+            datetime.strptime(args.start_date, "%Y-%m-%d")
+        except ValueError:
+            print("[ERROR] --start-date 必须为 YYYY-MM-DD")
+            return 2
+    store = DataStore()
+    try:
+        rows = read_rows(args.input)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 读取 {args.input} 失败：{e}")
+        return 2
+
+    plan = plan_rebuild(
+        store,
+        rows,
+        mode=args.mode,
+        start_date=args.start_date,
+        close_previous=args.close_previous,
+        match=args.match,
+    )
+    for line in format_report(plan, store):
+        print(line)
+    if args.report:
+        args.report.write_text(json.dumps(plan.report(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"[INFO] 差异报告已写入 {args.report}")
+
+    if plan.has_errors:
+        print("[ERROR] 存在不唯一的姓名、无法识别的部门或冲突的分配，请修正后重试；未写入任何文件。")
+        return 2
+    if args.dry_run:
+        print("[INFO] --dry-run：未写入文件。")
+        return 0
+    if args.mode == "append" and plan.is_noop:
+        print("[INFO] 没有需要写入的变化。")
+        return 0
+
+    snapshot = apply_plan(plan, store.memberships.path, backup=not args.no_backup)
+    if snapshot:
+        print(f"[INFO] 已备份原文件为快照 #{snapshot['id']}（python tools/backup_store.py list）")
+    print(f"[INFO] 已写入 {store.memberships.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+由 data/org_units.json 预计算组织树闭包，写入派生索引 data/indexes/org_closure.json。
+
+与 apps/worker 的 org_closure 表对应（ancestor, descendant, depth，含自身 depth=0），另外给出：
+- 每个节点的层级 depth（根为 0）、子树大小；
+- 嵌套区间 pre/post（DFS 进入/退出时的序号，共用一个计数器）：
+  d 在 a 的子树内 ⇔ pre[a] <= pre[d] 且 post[d] <= post[a]，判断子树归属不再需要沿父指针上溯。
+子节点按 id 升序遍历；parentId 指向不存在组织的节点视为独立的树根（与 overview.js getChain 在此处停止一致），
+环上的节点会被断开并记入 problems。
+
+索引记录源文件的 sha256；org_units.json 未变化时 `build` 直接跳过。变化时先比较各组织的 parentId：
+结构未变（改名、停用等）直接沿用已有的闭包与区间，只更新指纹；新增、删除组织或调整 parentId 时整体重新计算，
+不做局部的增量更新（全量计算为 O(组织数 × 深度)）。`OrgClosure.ensure()` 遵循同样的规则。
+
+用法
+  python tools/org_closure.py build [--force]
+  python tools/org_closure.py show 5        # 祖先链、直接下级与子树
+  python tools/org_closure.py check         # 索引过期时返回 1
+
+在其它脚本中：
+  from org_closure import OrgClosure
+  closure = OrgClosure.ensure(store)
+  closure.ancestors(org_id)                 # [自身, 父, ..., 根]
+  closure.is_descendant(ancestor, org_id)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from data_store import DATA_DIR, ORGS_FILENAME, DataStore, OrgUnitsCollection
+from json_writer import write_json
+
+INDEX_DIRNAME = "indexes"
+INDEX_FILENAME = "org_closure.json"
+INDEX_VERSION = 1
+
+
+def index_path_for(data_dir: Path) -> Path:
+    return Path(data_dir) / INDEX_DIRNAME / INDEX_FILENAME
+
+
+def source_sha256(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def parent_map(orgs: OrgUnitsCollection) -> Dict[int, Optional[int]]:
+    """闭包只取决于各组织的 id 与 parentId。"""
+    return {oid: org.parent_id for oid, org in orgs.by_id.items()}
+
+
+def compute(orgs: OrgUnitsCollection) -> Dict[str, Any]:
+    """计算节点信息与闭包行；不读写文件。"""
+    children: Dict[int, List[int]] = {}
+    starts: List[int] = []
+    for oid in sorted(orgs.by_id):
+        parent = orgs.by_id[oid].parent_id
+        if parent is None or parent not in orgs.by_id:
+            starts.append(oid)
+        else:
+            children.setdefault(parent, []).append(oid)
+
+    nodes: Dict[int, Dict[str, Any]] = {}
+    closure: List[Tuple[int, int, int]] = []
+    problems: List[str] = []
+    counter = 0
+
+    def visit(root: int) -> None:
+        nonlocal counter
+        # 显式栈，避免深树触发递归上限；path 为当前祖先链（根在前）
+        path: List[int] = []
+        stack: List[Tuple[int, bool]] = [(root, False)]
+        while stack:
+            oid, leaving = stack.pop()
+            if leaving:
+                node = nodes[oid]
+                node["post"] = counter
+                node["size"] = (counter - node["pre"] + 1) // 2
+                counter += 1
+                path.pop()
+                continue
+            nodes[oid] = {
+                "id": oid,
+                "parentId": orgs.by_id[oid].parent_id,
+                "depth": len(path),
+                "pre": counter,
+                "post": None,
+                "size": 1,
+            }
+            counter += 1
+            path.append(oid)
+            for depth, ancestor in enumerate(reversed(path)):
+                closure.append((ancestor, oid, depth))
+            stack.append((oid, True))
+            for child in reversed(children.get(oid, [])):
+                stack.append((child, False))
+
+    for root in starts:
+        visit(root)
+    # 环上的节点从任何树根都到达不了：按 id 断开，作为独立的树根
+    for oid in sorted(orgs.by_id):
+        if oid not in nodes:
+            problems.append(f"org {oid} 位于 parentId 环上，已断开")
+            children_of_cycle = children.get(orgs.by_id[oid].parent_id or -1, [])
+            if oid in children_of_cycle:
+                children_of_cycle.remove(oid)
+            visit(oid)
+
+    closure.sort()
+    return {
+        "roots": [oid for oid in sorted(orgs.by_id) if orgs.by_id[oid].parent_id is None],
+        "nodes": [nodes[oid] for oid in sorted(nodes)],
+        "closure": [list(row) for row in closure],
+        "problems": problems,
+    }
+
+
+class OrgClosure:
+    """读取派生索引并提供 O(1) / O(子树) 的组织树查询。"""
+
+    def __init__(self, payload: Dict[str, Any]) -> None:
+        self.payload = payload
+        self.meta: Dict[str, Any] = payload.get("meta", {})
+        self.roots: List[int] = list(payload["roots"])
+        self.nodes: Dict[int, Dict[str, Any]] = {int(n["id"]): n for n in payload["nodes"]}
+        self._ancestors: Dict[int, List[Any]] = {}
+        self._descendants: Dict[int, List[int]] = {}
+        for ancestor, descendant, depth in payload["closure"]:
+            self._ancestors.setdefault(descendant, []).append((depth, ancestor))
+            self._descendants.setdefault(ancestor, []).append(descendant)
+        for oid, rows in self._ancestors.items():
+            self._ancestors[oid] = [a for _d, a in sorted(rows)]
+
+    # --- 构建 / 读取 ---
+
+    @classmethod
+    def build(cls, orgs: OrgUnitsCollection) -> "OrgClosure":
+        payload = compute(orgs)
+        payload["meta"] = {
+            "version": INDEX_VERSION,
+            "source": ORGS_FILENAME,
+            "sourceSha256": source_sha256(orgs.path),
+            "builtAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+            "nodes": len(payload["nodes"]),
+            "rows": len(payload["closure"]),
+        }
+        return cls(payload)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["OrgClosure"]:
+        try:
+            payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if payload.get("meta", {}).get("version") != INDEX_VERSION:
+            return None
+        return cls(payload)
+
+    def save(self, path: Path) -> None:
+        write_json(path, self.payload)
+
+    def is_current(self, source: Path) -> bool:
+        return self.meta.get("sourceSha256") == source_sha256(source)
+
+    def same_structure(self, orgs: OrgUnitsCollection) -> bool:
+        return {oid: node["parentId"] for oid, node in self.nodes.items()} == parent_map(orgs)
+
+    def restamped(self, source: Path) -> "OrgClosure":
+        """结构未变时沿用闭包与区间，只更新源文件指纹。"""
+        meta = {**self.meta, "sourceSha256": source_sha256(source), "checkedAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")}
+        return OrgClosure({**self.payload, "meta": meta})
+
+    @classmethod
+    def ensure(cls, store: DataStore, *, force: bool = False, save: bool = True) -> "OrgClosure":
+        """返回与 org_units.json 一致的闭包；索引缺失或过期时更新（save=True 时写回）。
+
+        过期但组织结构未变时沿用旧闭包，否则整体重建；force=True 总是重建。
+        """
+        path = index_path_for(store.data_dir)
+        source = store.data_dir / ORGS_FILENAME
+        current = None if force else cls.load(path)
+        if current is not None and current.is_current(source):
+            return current
+        orgs = store.org_units
+        closure = current.restamped(source) if current is not None and current.same_structure(orgs) else cls.build(orgs)
+        if save:
+            closure.save(path)
+        return closure
+
+    # --- 查询 ---
+
+    def __contains__(self, org_id: Any) -> bool:
+        return org_id in self.nodes
+
+    def ancestors(self, org_id: Optional[int]) -> List[int]:
+        """[自身, 父, ..., 根]；等价于 overview.js 的 getChain。未知组织返回 []。"""
+        if org_id is None:
+            return []
+        return self._ancestors.get(org_id, [])
+
+    def descendants(self, org_id: int, *, include_self: bool = True) -> List[int]:
+        result = self._descendants.get(org_id, [])
+        return result if include_self else [oid for oid in result if oid != org_id]
+
+    def children(self, org_id: int) -> List[int]:
+        return [oid for oid in self._descendants.get(org_id, []) if self.nodes[oid]["depth"] == self.nodes[org_id]["depth"] + 1]
+
+    def depth(self, org_id: int) -> Optional[int]:
+        node = self.nodes.get(org_id)
+        return node["depth"] if node else None
+
+    def interval(self, org_id: int) -> Optional[Tuple[int, int]]:
+        node = self.nodes.get(org_id)
+        return (node["pre"], node["post"]) if node else None
+
+    def is_descendant(self, ancestor: int, org_id: int) -> bool:
+        """org_id 是否在 ancestor 的子树内（含自身）。"""
+        a, d = self.nodes.get(ancestor), self.nodes.get(org_id)
+        if a is None or d is None:
+            return False
+        return a["pre"] <= d["pre"] and d["post"] <= a["post"]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="组织树闭包索引（data/indexes/org_closure.json）")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="org_units.json 有变化时重建索引")
+    p.add_argument("--force", action="store_true", help="无论是否变化都重建")
+    p = sub.add_parser("show", help="查看某个组织的祖先链与子树")
+    p.add_argument("org_id", type=int)
+    sub.add_parser("check", help="索引过期或缺失时返回 1")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    store = DataStore(args.data_dir, use_cache=False)
+    path = index_path_for(store.data_dir)
+
+    if args.command == "build":
+        existing = None if args.force else OrgClosure.load(path)
+        if existing is not None and existing.is_current(store.data_dir / ORGS_FILENAME):
+            print(f"[INFO] {path} 已是最新（{existing.meta['nodes']} 个组织），跳过。")
+            return 0
+        reused = existing is not None and existing.same_structure(store.org_units)
+        closure = OrgClosure.ensure(store, force=args.force)
+        for problem in closure.payload["problems"]:
+            print(f"[WARN] {problem}")
+        how = "组织结构未变，沿用闭包" if reused else f"{closure.meta['rows']} 条闭包记录"
+        print(f"[updated] {path}：{closure.meta['nodes']} 个组织，{how}")
+        return 0
+
+    if args.command == "check":
+        existing = OrgClosure.load(path)
+        if existing is None or not existing.is_current(store.data_dir / ORGS_FILENAME):
+            print(f"[WARN] {path} 缺失或已过期，请运行 build。")
+            return 1
+        print("OK")
+        return 0
+
+    if args.command == "show":
+        closure = OrgClosure.ensure(store, save=False)
+        if args.org_id not in closure:
+            print(f"[ERROR] 组织 {args.org_id} 不存在。")
+            return 2
+
+        def label(oid: int) -> str:
+            org = store.org_units.get(oid)
+            return f"{org.name if org else '?'}({oid})"
+
+        print("祖先链：" + " -> ".join(label(o) for o in closure.ancestors(args.org_id)))
+        print(f"层级 {closure.depth(args.org_id)}，区间 {closure.interval(args.org_id)}")
+        print("直接下级：" + ("、".join(label(o) for o in closure.children(args.org_id)) or "无"))
+        print(f"子树共 {len(closure.descendants(args.org_id))} 个组织")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
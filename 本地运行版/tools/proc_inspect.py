@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 /proc 的端口与进程查询（仅 Linux），取代 start_local.py 里对 lsof / ss / netstat 的调用。
+
+- /proc/net/tcp、/proc/net/tcp6 中状态为 LISTEN（0A）的条目给出 端口 → socket inode；
+- 一次遍历 /proc/<pid>/fd 的 socket:[inode] 链接得到 inode → pid，同时读 /proc/<pid>/stat 建立父子关系，
+  因此一次调用即可拿到监听某端口的进程及其完整进程树；
+- terminate_tree 先对整棵树发 SIGTERM，在超时内轮询退出（僵尸进程视为已退出），仍存活的再 SIGKILL。
+
+不 fork 子进程，单次查询在毫秒级，适合守护进程与压测脚本高频调用；最小化容器里没有 lsof / ss 也能用。
+只能看到当前网络命名空间的 socket；读不到其它用户进程的 fd 时（非 root）这些进程不会出现在结果中。
+
+用法
+  python tools/proc_inspect.py ports                   # 列出所有监听端口及其进程
+  python tools/proc_inspect.py ports --port 8080       # 只看 8080，附带进程树
+  python tools/proc_inspect.py kill --port 8080 [--timeout 5]
+
+在其它脚本中：
+  from proc_inspect import listening_pids, terminate_tree
+  if available():
+      left = terminate_tree(listening_pids(8080), timeout=5.0)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+PROC = Path("/proc")
+TCP_TABLES = (("tcp", socket.AF_INET), ("tcp6", socket.AF_INET6))
+TCP_LISTEN = "0A"
+
+
+def available() -> bool:
+    return (PROC / "net" / "tcp").exists()
+
+
+# --- /proc/net/tcp ---
+
+
+@dataclass
+class Listener:
+    port: int
+    address: str
+    inode: int
+    pids: List[int] = field(default_factory=list)
+
+
+def _decode_address(hex_addr: str, family: int) -> str:
+    # 地址按 32 位字以主机字节序（小端）存放；端口是大端十六进制
+    raw = bytes.fromhex(hex_addr)
+    raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    return socket.inet_ntop(family, raw)
+
+
+def listening_sockets(port: Optional[int] = None) -> List[Listener]:
+    """当前网络命名空间中处于 LISTEN 的 TCP socket（不含 pid，见 snapshot）。"""
+    listeners: List[Listener] = []
+    for table, family in TCP_TABLES:
+        try:
+            lines = (PROC / "net" / table).read_text().splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 10 or fields[3] != TCP_LISTEN:
+                continue
+            hex_addr, hex_port = fields[1].split(":")
+            local_port = int(hex_port, 16)
+            if port is not None and local_port != port:
+                continue
+            listeners.append(Listener(local_port, _decode_address(hex_addr, family), int(fields[9])))
+    return listeners
+
+
+def port_listening(port: int) -> bool:
+    """是否有 socket 在监听 port；只读 /proc/net/tcp{,6}，不扫描进程。"""
+    return bool(listening_sockets(port))
+
+
+# --- /proc/<pid> ---
+
+
+def _pids() -> List[int]:
+    return [int(entry.name) for entry in os.scandir(PROC) if entry.name.isdigit()]
+
+
+def _stat_fields(pid: int) -> Optional[List[str]]:
+    try:
+        stat = (PROC / str(pid) / "stat").read_text()
+    except OSError:
+        return None
+    # comm 可能含空格和括号，从最后一个 ')' 之后解析；返回的 fields[0] 为状态，fields[1] 为 ppid
+    return stat[stat.rfind(")") + 2:].split()
+
+
+def children_map() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for pid in _pids():
+        fields = _stat_fields(pid)
+        if fields:
+            children.setdefault(int(fields[1]), []).append(pid)
+    return children
+
+
+def process_tree(pid: int, children: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    """pid 及其全部子孙进程，父进程在前（读不到 /proc 时只返回 pid 本身）。"""
+    if children is None:
+        if not PROC.is_dir():
+            return [pid]
+        children = children_map()
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        if current in tree:
+            continue
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def _socket_inodes(pid: int) -> Set[int]:
+    inodes: Set[int] = set()
+    fd_dir = f"/proc/{pid}/fd"
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return inodes
+    for fd in fds:
+        try:
+            target = os.readlink(f"{fd_dir}/{fd}")
+        except OSError:
+            continue
+        if target.startswith("socket:["):
+            inodes.add(int(target[8:-1]))
+    return inodes
+
+
+@dataclass
+class Snapshot:
+    """一次遍历 /proc 得到的监听端口与进程父子关系。"""
+
+    listeners: List[Listener]
+    children: Dict[int, List[int]]
+
+    def pids_for_port(self, port: int) -> List[int]:
+        return sorted({pid for listener in self.listeners if listener.port == port for pid in listener.pids})
+
+    def tree(self, pid: int) -> List[int]:
+        return process_tree(pid, self.children)
+
+
+def snapshot(port: Optional[int] = None) -> Snapshot:
+    """监听 socket（可只取某个端口）及持有它们的 pid，外加完整的父子关系。"""
+    listeners = listening_sockets(port)
+    by_inode = {listener.inode: listener for listener in listeners}
+    children: Dict[int, List[int]] = {}
+    for pid in _pids():
+        fields = _stat_fields(pid)
+        if not fields:
+            continue
+        children.setdefault(int(fields[1]), []).append(pid)
+        if by_inode:
+            for inode in _socket_inodes(pid) & by_inode.keys():
+                by_inode[inode].pids.append(pid)
+    return Snapshot(listeners, children)
+
+
+def listening_pids(port: int) -> List[int]:
+    """监听 port 的进程（同一 socket 可能被 fork 出的多个进程共同持有）。"""
+    if not port_listening(port):
+        return []
+    return snapshot(port).pids_for_port(port)
+
+
+# --- 结束进程树 ---
+
+
+def _alive(pid: int) -> bool:
+    fields = _stat_fields(pid)
+    return bool(fields) and fields[0] not in ("Z", "X")
+
+
+def _signal_all(pids: Iterable[int], sig: int) -> None:
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+
+def terminate_tree(pids: Iterable[int], *, timeout: float = 5.0, interval: float = 0.05) -> List[int]:
+    """结束 pids 及其子孙：先 SIGTERM，timeout 秒内未退出的 SIGKILL。返回 SIGKILL 后仍存活的 pid。
+
+    先收集整棵树再发信号，避免父进程退出后子进程被过继给 init 而漏掉。
+    """
+    children = children_map()
+    targets: List[int] = []
+    for pid in pids:
+        targets.extend(p for p in process_tree(pid, children) if p not in targets and p != os.getpid())
+    if not targets:
+        return []
+    # 子进程先收到信号，npm 之类的包装进程不会在子进程退出前误报错误
+    _signal_all(reversed(targets), signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = [pid for pid in targets if _alive(pid)]
+        if not remaining or time.monotonic() >= deadline:
+            break
+        time.sleep(interval)
+    if not remaining:
+        return []
+    _signal_all(remaining, signal.SIGKILL)
+    deadline = time.monotonic() + 1.0
+    while remaining and time.monotonic() < deadline:
+        time.sleep(interval)
+        remaining = [pid for pid in remaining if _alive(pid)]
+    return remaining
+
+
+# --- CLI ---
+
+
+def _comm(pid: int) -> str:
+    try:
+        return (PROC / str(pid) / "comm").read_text().strip()
+    except OSError:
+        return "?"
+
+
+def cmd_ports(args: argparse.Namespace) -> int:
+    snap = snapshot(args.port)
+    if not snap.listeners:
+        print(f"[INFO] 端口 {args.port} 无监听。" if args.port else "[INFO] 没有监听中的 TCP 端口。")
+        return 1 if args.port else 0
+    for listener in sorted(snap.listeners, key=lambda item: (item.port, item.address)):
+        owners = ", ".join(f"{pid}({_comm(pid)})" for pid in sorted(listener.pids)) or "未知（无权限读取或在其它命名空间）"
+        print(f"{listener.address}:{listener.port}\t{owners}")
+        if args.port is not None:
+            for pid in sorted(listener.pids):
+                tree = snap.tree(pid)[1:]
+                if tree:
+                    print("  子进程: " + ", ".join(f"{child}({_comm(child)})" for child in tree))
+    return 0
+
+
+def cmd_kill(args: argparse.Namespace) -> int:
+    pids = listening_pids(args.port)
+    if not pids:
+        print(f"[INFO] 端口 {args.port} 没有可结束的监听进程。")
+        return 0
+    print(f"[INFO] 结束端口 {args.port} 的监听进程 {pids} 及其子进程...")
+    left = terminate_tree(pids, timeout=args.timeout)
+    if left:
+        print(f"[ERROR] 以下进程仍未退出: {left}")
+        return 1
+    print("[INFO] 已全部退出。")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="基于 /proc 的端口与进程查询（Linux）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ports = sub.add_parser("ports", help="列出监听端口及持有进程")
+    ports.add_argument("--port", type=int, default=None)
+    ports.set_defaults(func=cmd_ports)
+    kill = sub.add_parser("kill", help="结束监听某端口的进程树（SIGTERM，超时后 SIGKILL）")
+    kill.add_argument("--port", type=int, required=True)
+    kill.add_argument("--timeout", type=float, default=5.0, help="等待 SIGTERM 生效的秒数（默认 5）")
+    kill.set_defaults(func=cmd_kill)
+    args = parser.parse_args(argv)
+    if not available():
+        print("[ERROR] 当前系统没有 /proc/net/tcp（仅支持 Linux）。")
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报表接口的响应缓存，挂在 tools/cluster_proxy.py 上（`python start_local.py --cache-reports`）。
+
+只缓存 REPORT_PATHS 的 GET 200 响应，键为 (令牌 sub, 路径, 排序后的查询串)：
+- 令牌按服务端同样的 HS256 密钥（环境变量 JWT_SECRET，默认与 server/config.js 一致）校验签名与过期时间，
+  校验不过的请求原样转发、不进缓存，因此伪造的 sub 读不到别人的缓存；
+- 条目有 TTL（且不超过令牌过期时间），总条数与总字节数超限时按 LRU 淘汰；
+- 失效：后台线程用 data_watcher 的监视器（inotify / 轮询）观察 data/：
+  - work_items/user/<id>/<yyyy-mm>.json 变化 → 失效查询区间与该月相交的条目；
+  - work_items/user/<id>.json（单文件布局）变化 → 按 WorkItemRanges 取该用户改动前后 workDate 范围的并集失效；
+  - users / org_units / roles / role_grants / user_org_memberships / settings 变化（可见范围、权限可能变了）
+    或 inotify 溢出 → 全部失效；
+- 请求进行中发生失效时（generation 变化），响应照常返回但不写入缓存，避免缓存旧数据；
+- 监视线程读数据出错（文件写到一半、格式损坏）时记录警告并全部失效，然后继续监视。
+
+审计：未命中时代理带 `X-Report-Cache-Audit: 1` 转发，server 在响应头 X-Audit-Entry 中回传它写入的
+report_* 审计记录（URL 编码的 JSON）；条目连同该记录一起缓存，命中时由后台线程按同样的格式追加到
+audit_logs.json（持有与 server appendAuditLog 相同的 `audit_logs.json.lock`）。没有回传审计记录的响应不缓存。
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from data_store import (
+    DATA_DIR,
+    MEMBERSHIPS_FILENAME,
+    ORGS_FILENAME,
+    ROLE_GRANTS_FILENAME,
+    ROLES_FILENAME,
+    USERS_FILENAME,
+    WORK_ITEMS_DIRNAME,
+    read_collection,
+    to_int,
+)
+from data_watcher import RESCAN, WorkItemRanges, open_watcher
+from json_writer import file_lock, write_json
+
+REPORT_PATHS = ("/api/reports/daily-overview", "/api/reports/weekly-overview", "/api/reports/weekly")
+DAILY_OVERVIEW_PATH = "/api/reports/daily-overview"
+AUDIT_FILENAME = "audit_logs.json"
+DEFAULT_JWT_SECRET = "local-dev-secret"  # 与 server/config.js getJwtSecret 的默认值一致
+GLOBAL_FILES = {
+    USERS_FILENAME,
+    ORGS_FILENAME,
+    ROLES_FILENAME,
+    ROLE_GRANTS_FILENAME,
+    MEMBERSHIPS_FILENAME,
+    "settings.json",
+}
+USER_FILE_RE = re.compile(rf"^{WORK_ITEMS_DIRNAME}/user/(\d+)(?:\.json|/(\d{{4}}-\d{{2}}|undated|manifest)\.json)$")
+WEEK_RE = re.compile(r"^(\d{4})W(\d{2})$")
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+Range = Tuple[str, str]
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_jwt(token: str, secret: str, now: Optional[float] = None) -> Optional[Dict]:
+    """校验 HS256 令牌（jsonwebtoken 默认算法），返回 payload；无效或过期返回 None。"""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        if header.get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature_b64)):
+            return None
+        payload = json.loads(_b64decode(payload_b64))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("sub") is None:
+        return None
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and exp <= (now if now is not None else time.time()):
+        return None
+    return payload
+
+
+def _iso_week(week: str) -> Optional[Range]:
+    # 与 server/middlewares/permissions.js parseISOWeek 相同：1 月 4 日所在周的周一 + (w-1) 周
+    match = WEEK_RE.match(week)
+    if not match or not 1 <= int(match.group(2)) <= 53:
+        return None
+    jan4 = date(int(match.group(1)), 1, 4)
+    start = jan4 - timedelta(days=jan4.isoweekday() - 1) + timedelta(weeks=int(match.group(2)) - 1)
+    return start.isoformat(), (start + timedelta(days=6)).isoformat()
+
+
+def query_range(query: Dict[str, str], path: str = "") -> Optional[Range]:
+    """报表查询覆盖的 workDate 区间；无法判断时返回 None（任何工作项变化都会让它失效）。"""
+    if "week" in query:
+        return _iso_week(query["week"])
+    if DATE_RE.match(query.get("date", "")):
+        if path == DAILY_OVERVIEW_PATH:
+            # buildDailyOverview 同时读取次日的工作项（「明日计划」）
+            try:
+                following = date.fromisoformat(query["date"]) + timedelta(days=1)
+            except ValueError:
+                return None
+            return query["date"], following.isoformat()
+        return query["date"], query["date"]
+    if DATE_RE.match(query.get("from", "")) and DATE_RE.match(query.get("to", "")):
+        return query["from"], query["to"]
+    return None
+
+
+def month_range(month: str) -> Range:
+    year, mon = int(month[:4]), int(month[5:7])
+    first = date(year, mon, 1)
+    last = (date(year + mon // 12, mon % 12 + 1, 1)) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+@dataclass
+class Entry:
+    response: bytes
+    expires: float
+    range: Optional[Range]
+    audit: Dict[str, Any]
+
+
+def parse_audit_header(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """server 回传的 X-Audit-Entry（URL 编码的 JSON）；缺失或无法解析返回 None。"""
+    if not value:
+        return None
+    try:
+        entry = json.loads(unquote(value))
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) and entry.get("action") else None
+
+
+class AuditWriter:
+    """命中缓存时代替 server 追加审计记录；后台线程批量写入，与 appendAuditLog 共用 `<file>.lock`。"""
+
+    def __init__(self, path: Path, on_event=None) -> None:
+        self.path = path
+        self.on_event = on_event
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        # 与 appendAuditLog 相同：createdAt 取追加时刻，其余字段照抄
+        self._queue.put({"createdAt": datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"), **entry})
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        with file_lock(self.path):
+            data = read_collection(self.path)
+            for entry in batch:
+                data["meta"]["lastId"] = (to_int(data["meta"].get("lastId")) or 0) + 1
+                data["items"].append({"id": data["meta"]["lastId"], **entry})
+            write_json(self.path, data, lock=False)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [entry for entry in batch if entry is not None]
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                if self.on_event is not None:
+                    self.on_event(f"[cache] [WARN] 追加 {len(batch)} 条审计记录失败：{e}")
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="report-cache-audit", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """写完已排队的记录后退出。"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+
+class ReportCache:
+    def __init__(
+        self,
+        *,
+        data_dir: Optional[Path] = None,
+        ttl: float = 300.0,
+        max_entries: int = 512,
+        max_bytes: int = 64 * 1024 * 1024,
+        secret: Optional[str] = None,
+        poll: Optional[float] = None,
+        on_event=None,
+    ) -> None:
+        self.data_dir = Path(data_dir or os.environ.get("DATA_DIR") or DATA_DIR)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.secret = secret or os.environ.get("JWT_SECRET") or DEFAULT_JWT_SECRET
+        self.poll = poll
+        self.on_event = on_event
+        self.entries: "OrderedDict[Tuple, Entry]" = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+        self._loop = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.audit = AuditWriter(self.data_dir / AUDIT_FILENAME, on_event=on_event)
+
+    # --- 键与读写（只在代理的事件循环线程中调用） ---
+
+    def key_for(self, method: str, target: str, authorization: Optional[str]) -> Optional[Tuple[Tuple, float, Optional[Range]]]:
+        """可缓存时返回 (key, 令牌过期时间, 查询区间)，否则 None。"""
+        if method != "GET" or not authorization or not authorization.startswith("Bearer "):
+            return None
+        parts = urlsplit(target)
+        if parts.path not in REPORT_PATHS:
+            return None
+        payload = verify_jwt(authorization[7:].strip(), self.secret)
+        if payload is None:
+            return None
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        key = (str(payload["sub"]), parts.path, tuple(sorted(query.items())))
+        exp = payload.get("exp")
+        return key, float(exp) if isinstance(exp, (int, float)) else float("inf"), query_range(query, parts.path)
+
+    def get(self, key: Tuple) -> Optional[Entry]:
+        """命中时返回条目（调用方应答 entry.response 并调用 record_hit）。"""
+        entry = self.entries.get(key)
+        if entry is None or entry.expires <= time.time():
+            if entry is not None:
+                self._drop(key)
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def record_hit(self, entry: Entry) -> None:
+        """命中的请求不经过 server，由这里补写它本该写的审计记录。"""
+        self.audit.append(entry.audit)
+
+    def put(
+        self,
+        key: Tuple,
+        response: bytes,
+        *,
+        token_exp: float,
+        range_: Optional[Range],
+        generation: int,
+        audit: Optional[str],
+    ) -> None:
+        """audit 为 server 回传的 X-Audit-Entry 原值；缺失或无法解析时不缓存。"""
+        audit_entry = parse_audit_header(audit)
+        if audit_entry is None or generation != self.generation or len(response) > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = Entry(response, min(time.time() + self.ttl, token_exp), range_, audit_entry)
+        self.size += len(response)
+        self.stats["stores"] += 1
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: Tuple) -> None:
+        entry = self.entries.pop(key)
+        self.size -= len(entry.response)
+
+    def invalidate(self, ranges: Optional[Iterable[Range]]) -> None:
+        """ranges 为 None 时全部失效；否则失效查询区间与任一 range 相交（或区间未知）的条目。"""
+        self.generation += 1
+        if ranges is None:
+            dropped = len(self.entries)
+            self.entries.clear()
+            self.size = 0
+        else:
+            ranges = list(ranges)
+            doomed = [
+                key
+                for key, entry in self.entries.items()
+                if entry.range is None or any(start <= entry.range[1] and end >= entry.range[0] for start, end in ranges)
+            ]
+            for key in doomed:
+                self._drop(key)
+            dropped = len(doomed)
+        self.stats["invalidations"] += dropped
+
+    def status(self) -> Dict:
+        return {"entries": len(self.entries), "bytes": self.size, "ttl": self.ttl, **self.stats}
+
+    # --- 失效监视（后台线程） ---
+
+    def _affected(self, changed: Set[str], ranges: WorkItemRanges) -> Optional[Set[Range]]:
+        """把变化的文件换算成受影响的 workDate 区间；需要全部失效时返回 None。"""
+        affected: Set[Range] = set()
+        for rel in changed:
+            if rel == RESCAN or rel in GLOBAL_FILES:
+                return None
+            match = USER_FILE_RE.match(rel)
+            if not match:
+                continue
+            user_id, partition = int(match.group(1)), match.group(2)
+            if partition and partition[0].isdigit():
+                affected.add(month_range(partition))
+                continue
+            if partition == "undated":
+                return None
+            before = ranges.get(user_id)
+            ranges.refresh_user(self.data_dir, user_id)
+            if partition == "manifest":
+                # 分区内容的变化由对应的 <yyyy-mm>.json 事件处理；manifest 自身只需更新 ranges
+                continue
+            after = ranges.get(user_id)
+            dates = [d for e in (before, after) if e for d in (e["minDate"], e["maxDate"]) if d]
+            if dates:
+                affected.add((min(dates), max(dates)))
+        return affected
+
+    def _load_ranges(self) -> WorkItemRanges:
+        ranges = WorkItemRanges.load(self.data_dir)
+        if ranges is None or not ranges.is_current(self.data_dir):
+            ranges = WorkItemRanges.empty()
+            ranges.refresh_all(self.data_dir)
+        return ranges
+
+    def _watch(self) -> None:
+        try:
+            ranges = self._load_ranges()
+        except (OSError, ValueError) as e:
+            self._warn(f"读取工作项范围失败：{e}")
+            ranges = WorkItemRanges.empty()
+        watcher = open_watcher(self.data_dir, poll=self.poll)
+        try:
+            while not self._stop.is_set():
+                changed = watcher.wait(0.5)
+                if not changed:
+                    continue
+                try:
+                    affected = self._affected(changed, ranges)
+                except Exception as e:
+                    # 读到了写到一半或损坏的文件：无法判断影响范围，全部失效，继续监视
+                    self._warn(f"处理数据变化失败：{e}")
+                    affected = None
+                if affected is not None and not affected:
+                    continue
+                if self._loop is not None:
+                    self._loop.call_soon_threadsafe(self.invalidate, affected)
+                if self.on_event is not None:
+                    scope = "全部" if affected is None else ", ".join(f"{a}~{b}" for a, b in sorted(affected))
+                    self.on_event(f"[cache] 数据变化，失效 {scope}")
+        finally:
+            watcher.close()
+
+    def _warn(self, message: str) -> None:
+        if self.on_event is not None:
+            self.on_event(f"[cache] [WARN] {message}")
+
+    def start(self, loop) -> None:
+        """在代理事件循环启动后调用：记录 loop 并启动监视线程。"""
+        self._loop = loop
+        self.audit.start()
+        self._thread = threading.Thread(target=self._watch, name="report-cache-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+        self.audit.stop()
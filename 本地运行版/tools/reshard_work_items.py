@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工作项存储重新分片：data/work_items/user/<id>.json ⇄ user/<id>/<yyyy-mm>.json + manifest.json。
+
+单文件布局下，改一条工作项就要重写该用户的整个文件，按日期区间查询也要解析全部历史。
+分区布局按 workDate 的月份拆分，manifest.json 记录每个分区的条数与日期范围：
+  {"version": 1, "meta": {"lastId": ...}, "partitions": {"2025-10": {"count": 42, "minDate": "2025-10-08", "maxDate": "2025-10-31"}}}
+workDate 不是 YYYY-MM-DD 的条目放在 undated 分区。server/data/store.js 与 data_store 以 manifest 是否存在判断布局，
+同一数据目录中两种布局可以并存，因此可以按用户逐个迁移；新用户仍使用单文件，重新执行 split 即可迁移。
+
+迁移顺序保证中途中断时数据仍然可读：
+- split：先写分区，再写 manifest（此刻起读写都走分区），校验与原文件一致；全部用户处理完后，
+  把退役的原文件一次性存入 backups/ 再删除（中断时遗留的原文件由下次 split 清理）；
+- merge：先写回单文件，校验一致后删除 manifest（此刻起读写都走单文件），再删除分区与目录。
+每个用户迁移期间同时持有 <id>.json 与 manifest.json 的锁；server 的 withWorkItemLock 与其它工具
+（UserStore.lock）拿到锁后会重新判断布局，因此服务运行时也可以迁移。
+
+用法
+  python tools/reshard_work_items.py status
+  python tools/reshard_work_items.py split [--user 5 --user 6] [--dry-run]
+  python tools/reshard_work_items.py merge [--user 5] [--dry-run]
+  python tools/reshard_work_items.py verify          # manifest 与分区文件、条目月份、id 唯一性
+  python tools/reshard_work_items.py reindex [--user 5]   # 按磁盘上的分区文件重建 manifest
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backup_store import snapshot_files
+from data_store import (
+    DATA_DIR,
+    WORK_ITEMS_DIRNAME,
+    WORK_ITEMS_MANIFEST,
+    partition_key,
+    read_collection,
+    read_work_item_manifest,
+    read_work_items,
+    to_int,
+    work_item_user_ids,
+)
+from json_writer import file_lock, write_json
+
+MANIFEST_VERSION = 1
+
+
+def _item_id(item: Dict[str, Any]) -> Optional[int]:
+    return to_int(item.get("id"))
+
+
+def _canonical(items: List[Dict[str, Any]]) -> List[str]:
+    """与顺序无关的比较形式。"""
+    return sorted(json.dumps(item, ensure_ascii=False, sort_keys=True) for item in items)
+
+
+def _by_id(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # 单文件中的条目按追加顺序排列，即 id 升序；无 id 的放在最后
+    return sorted(items, key=lambda item: (_item_id(item) is None, _item_id(item) or 0))
+
+
+def describe_partition(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    dates = sorted(d for d in (item.get("workDate") for item in items) if isinstance(d, str))
+    return {
+        "count": len(items),
+        "minDate": dates[0] if dates else None,
+        "maxDate": dates[-1] if dates else None,
+    }
+
+
+def group_by_month(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault(partition_key(item.get("workDate")), []).append(item)
+    return groups
+
+
+def _partition_meta(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"lastId": max((_item_id(i) or 0 for i in items), default=0)}
+
+
+class UserStore:
+    """单个用户的两种布局及其文件位置。"""
+
+    def __init__(self, user_dir: Path, user_id: int) -> None:
+        self.user_dir = user_dir
+        self.user_id = user_id
+        self.legacy_path = user_dir / f"{user_id}.json"
+        self.part_dir = user_dir / str(user_id)
+        self.manifest_path = self.part_dir / WORK_ITEMS_MANIFEST
+
+    @property
+    def partitioned(self) -> bool:
+        return self.manifest_path.exists()
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        return read_work_item_manifest(self.user_dir, self.user_id)
+
+    def _lock_target(self) -> Path:
+        return self.manifest_path if self.partitioned else self.legacy_path
+
+    @contextmanager
+    def lock(self, **kwargs) -> Iterator[Path]:
+        """与 server 的 withWorkItemLock 同一把锁：分区布局锁 manifest.json，否则锁 <id>.json。
+
+        拿到锁后布局已被 split/merge 改变时换锁重试。持锁期间写该用户的文件须用
+        write_json(..., lock=False)（锁不可重入）。
+        """
+        while True:
+            target = self._lock_target()
+            with file_lock(target, **kwargs):
+                if target == self._lock_target():
+                    yield target
+                    return
+
+    @contextmanager
+    def migration_lock(self, **kwargs) -> Iterator[None]:
+        """split/merge 会切换布局，两把锁都持有（固定先 <id>.json 后 manifest.json）。
+
+        放锁后若不是分区布局，删掉分区目录（manifest 锁会创建它；merge 后只剩空目录）；
+        等锁的进程可能刚在里面建了锁文件，删不掉就留到下次。
+        """
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(file_lock(self.legacy_path, **kwargs))
+                stack.enter_context(file_lock(self.manifest_path, **kwargs))
+                yield
+        finally:
+            if not self.partitioned:
+                try:
+                    self.part_dir.rmdir()
+                except OSError:
+                    pass
+
+    def partition_path(self, key: str) -> Path:
+        return self.part_dir / f"{key}.json"
+
+    def partition_files(self) -> Dict[str, Path]:
+        """磁盘上实际存在的分区文件（不论是否登记在 manifest 中）。"""
+        if not self.part_dir.is_dir():
+            return {}
+        return {p.stem: p for p in self.part_dir.glob("*.json") if p.name != WORK_ITEMS_MANIFEST}
+
+    def write_manifest(self, meta: Dict[str, Any], partitions: Dict[str, Dict[str, Any]], *, lock: bool = True) -> None:
+        write_json(
+            self.manifest_path,
+            {"version": MANIFEST_VERSION, "meta": meta, "partitions": {k: partitions[k] for k in sorted(partitions)}},
+            lock=lock,
+        )
+
+
+def split_user(store: UserStore, *, dry_run: bool = False) -> Dict[str, Any]:
+    """迁移为分区布局。原文件不在这里删除：结果中的 retired 交给调用方统一备份后删除（见 retire_legacy）。"""
+    with store.migration_lock():
+        return _split_user(store, dry_run=dry_run)
+
+
+def _split_user(store: UserStore, *, dry_run: bool) -> Dict[str, Any]:
+    if store.partitioned:
+        if store.legacy_path.exists():
+            # 上次 split 在删除原文件前中断
+            same = _canonical(read_collection(store.legacy_path)["items"]) == _canonical(read_work_items(store.user_dir, store.user_id)["items"])
+            if not same:
+                return {"status": "conflict", "detail": "分区与残留的单文件内容不一致，请人工确认后删除其一"}
+            return {"status": "cleaned", "detail": "删除上次中断遗留的单文件", "retired": None if dry_run else store.legacy_path}
+        return {"status": "skipped", "detail": "已是分区布局"}
+    if not store.legacy_path.exists():
+        return {"status": "skipped", "detail": "没有工作项文件"}
+
+    collection = read_collection(store.legacy_path)
+    groups = group_by_month(collection["items"])
+    result = {"status": "split", "items": len(collection["items"]), "partitions": len(groups)}
+    if dry_run:
+        return result
+
+    partitions: Dict[str, Dict[str, Any]] = {}
+    for key, items in groups.items():
+        write_json(store.partition_path(key), {"meta": _partition_meta(items), "items": items}, lock=False)
+        partitions[key] = describe_partition(items)
+    # 残留的、不属于本次结果的分区文件（例如更早一次中断的 split）
+    for key, path in store.partition_files().items():
+        if key not in partitions:
+            path.unlink()
+    store.write_manifest(dict(collection.get("meta") or {"lastId": 0}), partitions, lock=False)
+
+    if _canonical(read_work_items(store.user_dir, store.user_id)["items"]) != _canonical(collection["items"]):
+        raise RuntimeError(f"user {store.user_id}: 分区内容与原文件不一致，已保留原文件")
+    result["retired"] = store.legacy_path
+    return result
+
+
+def retire_legacy(paths: List[Path]) -> None:
+    """split 之后不再被读写的原文件：一次性登记到 backups/（只重写一次索引），再删除。"""
+    if not paths:
+        return
+    snapshot_files(paths, note="reshard split")
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def merge_user(store: UserStore, *, dry_run: bool = False) -> Dict[str, Any]:
+    with store.migration_lock():
+        return _merge_user(store, dry_run=dry_run)
+
+
+def _merge_user(store: UserStore, *, dry_run: bool) -> Dict[str, Any]:
+    manifest = store.manifest()
+    if manifest is None:
+        return {"status": "skipped", "detail": "已是单文件布局"}
+    collection = read_work_items(store.user_dir, store.user_id)
+    result = {"status": "merged", "items": len(collection["items"]), "partitions": len(manifest.get("partitions", {}))}
+    if dry_run:
+        return result
+
+    items = _by_id(collection["items"])
+    write_json(store.legacy_path, {"meta": collection["meta"], "items": items}, lock=False)
+    if _canonical(read_collection(store.legacy_path)["items"]) != _canonical(collection["items"]):
+        raise RuntimeError(f"user {store.user_id}: 合并结果与分区不一致，已保留分区")
+    store.manifest_path.unlink()
+    for path in store.partition_files().values():
+        path.unlink()
+    return result
+
+
+def reindex_user(store: UserStore) -> Dict[str, Any]:
+    if not store.partition_files() and not store.partitioned:
+        return {"status": "skipped", "detail": "不是分区布局"}
+    with store.lock():
+        return rebuild_manifest(store)
+
+
+def rebuild_manifest(store: UserStore) -> Dict[str, Any]:
+    """按磁盘上的分区文件重建 manifest；调用方须持有 store.lock()。"""
+    files = store.partition_files()
+    manifest = store.manifest() or {}
+    meta = dict(manifest.get("meta") or {"lastId": 0})
+    partitions: Dict[str, Dict[str, Any]] = {}
+    last_id = to_int(meta.get("lastId")) or 0
+    for key, path in sorted(files.items()):
+        items = read_collection(path)["items"]
+        if not items:
+            path.unlink()
+            continue
+        partitions[key] = describe_partition(items)
+        last_id = max(last_id, _partition_meta(items)["lastId"])
+    meta["lastId"] = last_id
+    store.write_manifest(meta, partitions, lock=False)
+    return {"status": "reindexed", "partitions": len(partitions)}
+
+
+def verify_user(store: UserStore) -> List[str]:
+    uid = store.user_id
+    manifest = store.manifest()
+    if manifest is None:
+        if store.partition_files():
+            return [f"user {uid}: 存在分区文件但没有 manifest（split 中断？重新执行 split 即可）"]
+        return []
+
+    problems: List[str] = []
+    if manifest.get("version") != MANIFEST_VERSION:
+        problems.append(f"user {uid}: manifest version {manifest.get('version')!r} 不受支持")
+    if store.legacy_path.exists():
+        problems.append(f"user {uid}: 分区与单文件同时存在（以分区为准，执行 split 清理）")
+
+    listed = manifest.get("partitions", {})
+    files = store.partition_files()
+    for key in sorted(set(files) - set(listed)):
+        problems.append(f"user {uid}: 分区 {key} 未登记在 manifest 中（执行 reindex）")
+    seen: Dict[int, str] = {}
+    max_id = 0
+    for key in sorted(listed):
+        if key not in files:
+            problems.append(f"user {uid}: 分区 {key} 文件缺失")
+            continue
+        items = read_collection(files[key])["items"]
+        actual = describe_partition(items)
+        if actual != {k: listed[key].get(k) for k in actual}:
+            problems.append(f"user {uid}: 分区 {key} manifest {listed[key]} 与实际 {actual} 不一致（执行 reindex）")
+        for item in items:
+            if partition_key(item.get("workDate")) != key:
+                problems.append(f"user {uid}: 分区 {key} 中的条目 {item.get('id')} workDate={item.get('workDate')!r} 不属于该分区")
+            item_id = _item_id(item)
+            if item_id is None:
+                continue
+            if item_id in seen:
+                problems.append(f"user {uid}: id {item_id} 同时出现在分区 {seen[item_id]} 与 {key}")
+            seen[item_id] = key
+            max_id = max(max_id, item_id)
+    if (to_int((manifest.get("meta") or {}).get("lastId")) or 0) < max_id:
+        problems.append(f"user {uid}: manifest meta.lastId 小于分区中的最大 id {max_id}")
+    return problems
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="工作项存储按用户+月份重新分片")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="两种布局的用户数与文件规模")
+    for name, text in (("split", "拆分为月份分区"), ("merge", "合并回单文件"), ("reindex", "按分区文件重建 manifest"), ("verify", "检查分区布局")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("--user", type=int, action="append", default=None, help="只处理指定用户（可重复）")
+        if name in ("split", "merge"):
+            p.add_argument("--dry-run", action="store_true", help="只统计，不写文件")
+    return parser.parse_args(argv)
+
+
+def _status(user_dir: Path, user_ids: List[int]) -> int:
+    legacy: List[Tuple[int, int]] = []
+    partitioned = 0
+    partitions = 0
+    for uid in user_ids:
+        store = UserStore(user_dir, uid)
+        manifest = store.manifest()
+        if manifest is not None:
+            partitioned += 1
+            partitions += len(manifest.get("partitions", {}))
+        elif store.legacy_path.exists():
+            legacy.append((store.legacy_path.stat().st_size, uid))
+    print(f"单文件 {len(legacy)} 个用户，共 {sum(s for s, _ in legacy) / 1024:.1f} KB")
+    if legacy:
+        size, uid = max(legacy)
+        print(f"  最大：user {uid}（{size / 1024:.1f} KB）")
+    print(f"分区 {partitioned} 个用户，共 {partitions} 个分区")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    user_dir = Path(args.data_dir) / WORK_ITEMS_DIRNAME / "user"
+    if not user_dir.is_dir():
+        print(f"[ERROR] {user_dir} 不存在。")
+        return 2
+    user_ids = args.user if getattr(args, "user", None) else work_item_user_ids(user_dir)
+
+    if args.command == "status":
+        return _status(user_dir, user_ids)
+
+    if args.command == "verify":
+        problems: List[str] = []
+        for uid in user_ids:
+            problems.extend(verify_user(UserStore(user_dir, uid)))
+        for line in problems:
+            print(f"[ERROR] {line}")
+        print("OK" if not problems else f"{len(problems)} problems.")
+        return 1 if problems else 0
+
+    counts: Dict[str, int] = {}
+    failed = 0
+    retired: List[Path] = []
+    for uid in user_ids:
+        store = UserStore(user_dir, uid)
+        try:
+            if args.command == "split":
+                result = split_user(store, dry_run=args.dry_run)
+            elif args.command == "merge":
+                result = merge_user(store, dry_run=args.dry_run)
+            else:
+                result = reindex_user(store)
+        except (RuntimeError, ValueError, OSError) as e:
+            print(f"[ERROR] user {uid}: {e}")
+            failed += 1
+            continue
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if result.get("retired") is not None:
+            retired.append(result["retired"])
+        if result["status"] in ("conflict", "cleaned"):
+            print(f"[WARN] user {uid}: {result['detail']}")
+        elif result["status"] in ("split", "merged"):
+            print(f"[INFO] user {uid}: {result['items']} 条，{result['partitions']} 个分区")
+
+    try:
+        retire_legacy(retired)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 备份/删除原文件失败（分区已生效，重新执行 split 即可清理）：{e}")
+        failed += 1
+
+    summary = "，".join(f"{k} {v}" for k, v in sorted(counts.items())) or "无用户"
+    prefix = "[DRY-RUN] " if getattr(args, "dry_run", False) else ""
+    print(f"{prefix}Completed. {summary}" + (f"，失败 {failed}" if failed else ""))
+    return 1 if failed or counts.get("conflict") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
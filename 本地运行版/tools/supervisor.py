@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Node 服务的守护进程（由 `python start_local.py --supervise` 使用）。
+
+- 就绪与存活：周期性 GET /api/health（HTTP 探测，而不只是 TCP 连接）；启动后 startup_grace 秒内未就绪、
+  或连续 failure_threshold 次探测失败，视为挂起，结束整个进程树后重启；
+- 进程退出（崩溃、OOM 被杀）或启动回调失败（抛异常 / sys.exit，例如端口无法释放，记为 start_failed）后按指数退避重启（backoff_initial 起每次翻倍，上限 backoff_max，
+  稳定运行 stable_after 秒后退避清零）；
+- 崩溃循环：crash_window 秒内重启 crash_limit 次即进入 crash_loop 状态，冷却 crash_cooldown 秒后再试；
+- 资源：Linux 上从 /proc 采样服务进程树（npm 与其 node 子进程）的 CPU%、RSS 与打开的 fd 数；
+- 状态：127.0.0.1:status_port 上的 GET /（或 /status）返回 JSON；事件与采样以 JSON 行追加到 logs/supervisor.log
+  （超过 LOG_MAX_BYTES 时轮转为 .1）。
+
+在其它脚本中：
+  from supervisor import Supervisor
+  sup = Supervisor(lambda: start_server_background(port, quiet=True), port=port, kill=kill_tree)
+  sup.run()            # 阻塞，Ctrl+C / SIGTERM 停止
+  sup.start_thread()   # 或在后台线程运行（UI），sup.stop() 停止
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional
+
+from proc_inspect import PROC, available, process_tree, terminate_tree
+
+ROOT = Path(__file__).resolve().parent.parent
+LOG_PATH = ROOT / "logs" / "supervisor.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+HEALTH_PATH = "/api/health"
+
+
+def utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+# --- /proc 采样 ---
+
+
+class ProcSampler:
+    """按两次采样之间的 utime+stime 增量计算 CPU%（100% = 一个核）。"""
+
+    def __init__(self) -> None:
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._last: Optional[tuple] = None
+
+    @staticmethod
+    def available() -> bool:
+        return (PROC / "self" / "stat").exists()
+
+    def sample(self, pid: int) -> Optional[Dict[str, Any]]:
+        if not self.available():
+            return None
+        cpu_ticks = rss_pages = fds = 0
+        pids = process_tree(pid)
+        alive = []
+        for p in pids:
+            base = PROC / str(p)
+            try:
+                stat = (base / "stat").read_text()
+                fields = stat[stat.rfind(")") + 2:].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])
+                rss_pages += int((base / "statm").read_text().split()[1])
+                fds += len(os.listdir(base / "fd"))
+                alive.append(p)
+            except (OSError, IndexError, ValueError):
+                continue
+        now = time.monotonic()
+        cpu = None
+        if self._last is not None and self._last[0] == pid and now > self._last[1]:
+            cpu = round(100.0 * (cpu_ticks - self._last[2]) / self.ticks / (now - self._last[1]), 1)
+        self._last = (pid, now, cpu_ticks)
+        return {"pids": alive, "cpuPercent": cpu, "rssBytes": rss_pages * self.page, "openFds": fds}
+
+
+def kill_tree(proc: subprocess.Popen, timeout: float = 5.0) -> None:
+    """先对整棵进程树发 SIGTERM，超时后 SIGKILL（见 proc_inspect.terminate_tree）；非 Linux 交给 Popen.terminate/kill。"""
+    if proc.poll() is not None:
+        return
+    if os.name == "posix" and available():
+        terminate_tree([proc.pid], timeout=timeout)
+    else:
+        proc.terminate()
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    proc.wait()
+
+
+# --- 守护 ---
+
+
+class Supervisor:
+    def __init__(
+        self,
+        start: Callable[[], subprocess.Popen],
+        *,
+        port: int,
+        kill: Callable[[subprocess.Popen], None] = kill_tree,
+        host: str = "127.0.0.1",
+        status_port: Optional[int] = None,
+        log_path: Optional[Path] = LOG_PATH,
+        probe_interval: float = 5.0,
+        probe_timeout: float = 3.0,
+        failure_threshold: int = 3,
+        startup_grace: float = 45.0,
+        sample_interval: float = 15.0,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        stable_after: float = 120.0,
+        crash_limit: int = 5,
+        crash_window: float = 300.0,
+        crash_cooldown: float = 600.0,
+        on_event: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self._start = start
+        self._kill = kill
+        self.port = port
+        self.host = host
+        self.status_port = status_port
+        self.log_path = log_path
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.startup_grace = startup_grace
+        self.sample_interval = sample_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.crash_limit = crash_limit
+        self.crash_window = crash_window
+        self.crash_cooldown = crash_cooldown
+        self.on_event = on_event
+
+        self.proc: Optional[subprocess.Popen] = None
+        self.sampler = ProcSampler()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._restarts: Deque[float] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._http: Optional[ThreadingHTTPServer] = None
+        self.state: Dict[str, Any] = {
+            "state": "stopped",
+            "pid": None,
+            "startedAt": None,
+            "readyAt": None,
+            "restarts": 0,
+            "lastExit": None,
+            "health": {"ok": None, "consecutiveFailures": 0, "latencyMs": None, "checkedAt": None},
+            "metrics": None,
+        }
+
+    # --- 日志与状态 ---
+
+    def _log(self, event: str, **fields: Any) -> None:
+        record = {"at": utc_now_iso(), "event": event, **fields}
+        if self.log_path is not None:
+            try:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                if self.log_path.exists() and self.log_path.stat().st_size > LOG_MAX_BYTES:
+                    os.replace(self.log_path, self.log_path.with_name(self.log_path.name + ".1"))
+                with open(self.log_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError:
+                pass
+        if self.on_event is not None and event != "sample":
+            detail = " ".join(f"{k}={v}" for k, v in fields.items() if k != "metrics")
+            self.on_event(f"[supervisor] {event} {detail}".rstrip())
+
+    def _set(self, **fields: Any) -> None:
+        with self._lock:
+            self.state.update(fields)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.state))
+
+    def _serve_status(self) -> None:
+        if not self.status_port:
+            return
+        supervisor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path not in ("/", "/status"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(supervisor.snapshot(), ensure_ascii=False, indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", self.status_port), Handler)
+        threading.Thread(target=self._http.serve_forever, name="supervisor-status", daemon=True).start()
+
+    # --- 探测 ---
+
+    def probe(self) -> bool:
+        started = time.perf_counter()
+        ok = False
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.probe_timeout)
+            try:
+                conn.request("GET", HEALTH_PATH)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            finally:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            ok = False
+        with self._lock:
+            health = self.state["health"]
+            health["ok"] = ok
+            health["consecutiveFailures"] = 0 if ok else health["consecutiveFailures"] + 1
+            health["latencyMs"] = round((time.perf_counter() - started) * 1000, 1)
+            health["checkedAt"] = utc_now_iso()
+        return ok
+
+    # --- 主循环 ---
+
+    def _wait(self, seconds: float) -> bool:
+        """等待 seconds 秒；被 stop() 打断时返回 True。"""
+        return self._stop.wait(seconds)
+
+    def _run_once(self) -> str:
+        """启动一次服务并守护到它退出或被判定挂起；返回原因（exit | unhealthy | start_failed | stopped）。"""
+        self.proc = None
+        try:
+            self.proc = self._start()
+        except (Exception, SystemExit) as e:
+            # start_server_background → ensure_port_available 在端口无法释放时 sys.exit(1)；不能让守护线程随之退出
+            error = f"SystemExit({e.code})" if isinstance(e, SystemExit) else f"{type(e).__name__}: {e}"
+            self._set(lastExit={"code": None, "error": error, "at": utc_now_iso(), "uptime": 0.0})
+            self._log("start_failed", error=error)
+            return "start_failed"
+        started = time.monotonic()
+        with self._lock:
+            self.state.update(state="starting", pid=self.proc.pid, startedAt=utc_now_iso(), readyAt=None)
+            self.state["health"]["consecutiveFailures"] = 0
+        self._log("start", pid=self.proc.pid)
+        ready = False
+        next_sample = 0.0
+        while not self._stop.is_set():
+            code = self.proc.poll()
+            if code is not None:
+                self._set(lastExit={"code": code, "at": utc_now_iso(), "uptime": round(time.monotonic() - started, 1)})
+                self._log("exit", pid=self.proc.pid, code=code)
+                return "exit"
+            now = time.monotonic()
+            if now >= next_sample:
+                metrics = self.sampler.sample(self.proc.pid)
+                self._set(metrics=metrics)
+                if metrics is not None:
+                    self._log("sample", pid=self.proc.pid, metrics=metrics, health=self.state["health"]["ok"])
+                next_sample = now + self.sample_interval
+            if self.probe():
+                if not ready:
+                    ready = True
+                    self._set(state="running", readyAt=utc_now_iso())
+                    self._log("ready", pid=self.proc.pid, seconds=round(now - started, 1))
+            elif not ready and now - started > self.startup_grace:
+                self._log("unhealthy", pid=self.proc.pid, reason=f"not ready after {self.startup_grace:g}s")
+                return "unhealthy"
+            elif ready and self.state["health"]["consecutiveFailures"] >= self.failure_threshold:
+                self._log("unhealthy", pid=self.proc.pid, reason=f"{self.failure_threshold} failed probes")
+                return "unhealthy"
+            if self._wait(self.probe_interval if ready else 0.5):
+                break
+        return "stopped"
+
+    def run(self) -> int:
+        self._serve_status()
+        self._log("supervisor_start", port=self.port, statusPort=self.status_port)
+        backoff = self.backoff_initial
+        try:
+            while not self._stop.is_set():
+                launched = time.monotonic()
+                reason = self._run_once()
+                if self.proc is not None:
+                    self._kill(self.proc)
+                if reason == "stopped":
+                    break
+                if time.monotonic() - launched >= self.stable_after:
+                    backoff = self.backoff_initial
+                now = time.monotonic()
+                self._restarts.append(now)
+                while self._restarts and now - self._restarts[0] > self.crash_window:
+                    self._restarts.popleft()
+                if len(self._restarts) >= self.crash_limit:
+                    self._set(state="crash_loop", pid=None, metrics=None)
+                    self._log("crash_loop", restarts=len(self._restarts), window=self.crash_window, cooldown=self.crash_cooldown)
+                    self._restarts.clear()
+                    backoff = self.backoff_initial
+                    if self._wait(self.crash_cooldown):
+                        break
+                else:
+                    self._set(state="backoff", pid=None, metrics=None)
+                    self._log("restart_scheduled", reason=reason, delay=backoff)
+                    if self._wait(backoff):
+                        break
+                    backoff = min(backoff * 2, self.backoff_max)
+                with self._lock:
+                    self.state["restarts"] += 1
+        finally:
+            if self.proc is not None:
+                self._kill(self.proc)
+            self._set(state="stopped", pid=None)
+            self._log("supervisor_stop")
+            if self._http is not None:
+                self._http.shutdown()
+                self._http.server_close()
+        return 0
+
+    def start_thread(self) -> None:
+        self._thread = threading.Thread(target=self.run, name="supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 15.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)